@@ -1,10 +1,19 @@
-from flask import Flask, send_from_directory
+import os
+from flask import Flask, Response, jsonify, send_from_directory
 from config import Config
 from extensions import db, init_firebase
+from db_routing import init_db_routing
 from user.routes import user_bp
 from logs.routes import logs_bp
 from food.routes import food_bp
 from exercise.routes import exercise_bp
+from food.search_index import init_food_index
+from food.barcode_index import init_barcode_index
+from food.scan_log import scan_recorder
+from user.target_writer import target_writer
+from food.images import IMMUTABLE_MAX_AGE, PLACEHOLDER_SVG, is_content_addressed, is_pending
+from warmup import is_ready, warm_up
+from instrumentation import init_instrumentation
 
 
 
@@ -15,20 +24,53 @@ def create_app():
 
     # Khởi tạo các phần mở rộng
     db.init_app(app)
+    init_db_routing(app)
     init_firebase(app)
+    init_food_index(app)
+    init_barcode_index(app)
+    scan_recorder.init_app(app)
+    target_writer.init_app(app)
 
     app.register_blueprint(user_bp)
     app.register_blueprint(logs_bp)
     app.register_blueprint(exercise_bp)
     app.register_blueprint(food_bp)
+    init_instrumentation(app)
+
+    @app.route('/healthz')
+    def healthz():
+        return jsonify({'status': 'ok'})
+
+    @app.route('/readyz')
+    def readyz():
+        # Chỉ nhận traffic khi warm-up (index, catalog, Firebase) đã xong
+        if not is_ready():
+            return jsonify({'status': 'starting'}), 503
+        return jsonify({'status': 'ready'})
+
+    @app.errorhandler(413)
+    def request_too_large(_error):
+        max_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+        return jsonify({'error': f'File quá lớn (tối đa {max_mb}MB)'}), 413
 
     @app.route('/static/uploads/<path:filename>')
     def uploaded_file(filename):
-        return send_from_directory('static/uploads', filename)
+        upload_folder = app.config['UPLOAD_FOLDER']
+        if is_pending(upload_folder, filename):
+            # Ảnh đang được xử lý nền: trả placeholder, không cho cache
+            return Response(PLACEHOLDER_SVG, mimetype='image/svg+xml', headers={'Cache-Control': 'no-store'})
+        if is_content_addressed(filename):
+            # Tên file là hash nội dung -> không bao giờ thay đổi, cho phép cache vĩnh viễn
+            response = send_from_directory(upload_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+            return response
+        return send_from_directory(upload_folder, filename)
 
     return app
 
 
 if __name__ == '__main__':
+    # Chỉ dùng khi phát triển; production chạy qua gunicorn (xem wsgi.py, gunicorn.conf.py)
     app = create_app()
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    warm_up(app)
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
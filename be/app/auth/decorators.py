@@ -1,7 +1,9 @@
+import time
 from functools import wraps
 from flask import request, jsonify, g, current_app as app
-from firebase_admin import auth as fb_auth
-from user.services import upsert_user_from_firebase
+from auth.token_cache import verify_firebase_token
+from instrumentation import observe_firebase_verify
+from user.context import get_user_context
 
 def firebase_required():
     def decorator(f):
@@ -14,19 +16,22 @@ def firebase_required():
 
             # 2. Tách idToken
             id_token = auth_header.split(' ', 1)[1]
+            started = time.perf_counter()
             try:
-                # 3. Verify token với Firebase Admin SDK
-                decoded = fb_auth.verify_id_token(id_token, clock_skew_seconds=60)
+                # 3. Verify token (cache claims theo hash token, key Firebase tải sẵn)
+                decoded = verify_firebase_token(id_token)
             except Exception:
+                observe_firebase_verify(time.perf_counter() - started, ok=False)
                 return jsonify({'error': 'Invalid Firebase ID token'}), 401
+            observe_firebase_verify(time.perf_counter() - started, ok=True)
 
-            # 4. Upsert hoặc tạo mới bản ghi User trong DB
-            #    upsert_user_from_firebase sẽ đọc các trường như uid, email, name, picture
-            #    rồi trả về object User của SQLAlchemy
-            user = upsert_user_from_firebase(decoded)
+            # 4. Lấy ngữ cảnh user (User, Profile, Settings, Goal) từ cache theo uid.
+            #    Chỉ ghi DB khi user mới hoặc claim trong token khác dữ liệu đã lưu.
+            ctx = get_user_context(decoded)
 
             # 5. Gán user vào flask.g để các hàm điều khiển (view) truy cập dễ dàng
-            g.current_user = user
+            g.current_user = ctx.user
+            g.user_context = ctx
 
             # 6. Tiến hành gọi hàm view gốc
             return f(*args, **kwargs)
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from google.auth import jwt as google_jwt
+from firebase_admin import auth as fb_auth
+
+# Public keys Firebase dùng để ký ID token
+FIREBASE_CERTS_URL = (
+    'https://www.googleapis.com/robot/v1/metadata/x509/'
+    'securetoken@system.gserviceaccount.com'
+)
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class FirebaseKeySet:
+    """
+    Bộ public key (kid -> cert PEM) của Firebase, tải trước khi khởi động
+    và làm mới trong background trước khi hết hạn (theo Cache-Control max-age).
+    """
+
+    def __init__(self, url=FIREBASE_CERTS_URL, fetch=None, refresh_margin=300, min_ttl=60):
+        self.url = url
+        self._fetch = fetch or self._http_fetch
+        self._refresh_margin = refresh_margin
+        self._min_ttl = min_ttl
+        self._lock = threading.Lock()
+        self._certs = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._refresher_pid = None
+
+    def preload(self):
+        self.refresh()
+
+    def refresh(self):
+        certs, max_age = self._fetch(self.url)
+        with self._lock:
+            self._certs = dict(certs)
+            self._fetched_at = time.time()
+            self._expires_at = self._fetched_at + max(max_age, self._min_ttl)
+        return self._certs
+
+    def refresh_if_stale(self):
+        # Chặn kid giả mạo ép tải lại key liên tục: tối đa 1 lần / min_ttl
+        if time.time() - self._fetched_at < self._min_ttl:
+            return self._certs
+        return self.refresh()
+
+    def get_certs(self):
+        self._ensure_refresher()
+        if not self._certs or time.time() >= self._expires_at:
+            return self.refresh()
+        return self._certs
+
+    def _ensure_refresher(self):
+        # Thread không sống qua fork: mỗi worker tự khởi động refresher của mình
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+        threading.Thread(target=self._refresh_loop, name='firebase-keyset', daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            delay = self._expires_at - self._refresh_margin - time.time()
+            time.sleep(max(delay, self._min_ttl))
+            try:
+                self.refresh()
+            except Exception:
+                # Giữ bộ key cũ; get_certs sẽ tải lại đồng bộ khi hết hạn
+                pass
+
+    @staticmethod
+    def _http_fetch(url):
+        resp = requests.get(url, timeout=10)
+        resp.raise_for_status()
+        match = _MAX_AGE_RE.search(resp.headers.get('Cache-Control', ''))
+        return resp.json(), int(match.group(1)) if match else 3600
+
+
+class TokenCache:
+    """
+    LRU có giới hạn: sha256(token) -> claims đã verify, sống tới `exp` của token.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def get(self, id_token, now=None):
+        key = self.key(id_token)
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if now >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, id_token, claims):
+        expires_at = float(claims.get('exp', 0))
+        if expires_at <= time.time():
+            return
+        key = self.key(id_token)
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FirebaseTokenVerifier:
+    """
+    Verify Firebase ID token bằng bộ key cục bộ, cache lại claims đã verify.
+    Token lặp lại (trường hợp phổ biến ở mobile) không phải kiểm tra chữ ký RSA nữa.
+    """
+
+    def __init__(self, project_id, keyset=None, cache=None, clock_skew_seconds=60):
+        self.project_id = project_id
+        self.issuer = f'https://securetoken.google.com/{project_id}'
+        self.keyset = keyset or FirebaseKeySet()
+        self.cache = cache or TokenCache()
+        self.clock_skew_seconds = clock_skew_seconds
+
+    def verify(self, id_token):
+        claims = self.cache.get(id_token)
+        if claims is not None:
+            return claims
+        claims = self._decode(id_token)
+        self.cache.set(id_token, claims)
+        return claims
+
+    def _decode(self, id_token):
+        header = google_jwt.decode_header(id_token)
+        if header.get('alg') != 'RS256':
+            raise ValueError('Firebase ID token has incorrect algorithm')
+
+        certs = self.keyset.get_certs()
+        if header.get('kid') not in certs:
+            # Firebase vừa xoay key: tải lại 1 lần trước khi từ chối
+            certs = self.keyset.refresh_if_stale()
+
+        claims = google_jwt.decode(
+            id_token,
+            certs=certs,
+            audience=self.project_id,
+            clock_skew_in_seconds=self.clock_skew_seconds,
+        )
+        if claims.get('iss') != self.issuer:
+            raise ValueError('Firebase ID token has incorrect issuer')
+        sub = claims.get('sub')
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise ValueError('Firebase ID token has invalid subject')
+        claims['uid'] = sub
+        return claims
+
+
+_verifier = None
+
+
+def init_token_verifier(app, project_id):
+    """
+    Tạo verifier dùng chung cho process và tải trước bộ public key.
+    """
+    global _verifier
+    if not project_id:
+        app.logger.warning('Firebase project id unknown, token cache disabled')
+        return
+    verifier = FirebaseTokenVerifier(
+        project_id,
+        cache=TokenCache(app.config.get('FIREBASE_TOKEN_CACHE_SIZE', 10000)),
+        clock_skew_seconds=app.config.get('FIREBASE_CLOCK_SKEW_SECONDS', 60),
+    )
+    try:
+        verifier.keyset.preload()
+    except Exception:
+        app.logger.warning('Could not preload Firebase signing keys, will retry on first request')
+    _verifier = verifier
+
+
+def verify_firebase_token(id_token):
+    """
+    Verify ID token (có cache). Khi chưa khởi tạo verifier (vd. dùng Auth emulator)
+    thì quay về fb_auth.verify_id_token của Firebase Admin SDK.
+    """
+    if _verifier is None:
+        return fb_auth.verify_id_token(id_token, clock_skew_seconds=60)
+    return _verifier.verify(id_token)
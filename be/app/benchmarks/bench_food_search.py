@@ -0,0 +1,98 @@
+"""
+So sánh các backend tìm kiếm món ăn (ilike / pg_trgm / memory) trên catalog lớn.
+
+    python benchmarks/bench_food_search.py --seed 1000000
+    python benchmarks/bench_food_search.py --cleanup
+
+Dữ liệu giả được đánh dấu brand='__bench__' để có thể xoá lại.
+Cần chạy migrations/001_food_search_pg_trgm.sql trước.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Cho phép import từ thư mục cha
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+from food.models import FoodItem
+from food.search_index import food_index
+from food.services import search_food_items
+
+BENCH_BRAND = '__bench__'
+QUERIES = ['pho', 'phở bò', 'banh mi', 'ga', 'com tam suon', 'bun', 'canh chua', 'xoi', 'tra sua', 'thit kho']
+
+SEED_SQL = text("""
+    INSERT INTO food_items (name, name_unsigned, brand, serving_size, serving_unit,
+                            calories, protein_g, carbs_g, fat_g, is_custom, is_recipe)
+    SELECT w1.name || ' ' || w2.name || ' ' || (i % 997),
+           w1.unsigned || ' ' || w2.unsigned || ' ' || (i % 997),
+           :brand, 100, 'g', 100 + i % 400, i % 30, i % 60, i % 25, FALSE, FALSE
+    FROM generate_series(1, :rows) AS i
+    JOIN (VALUES (0, 'Phở', 'pho'), (1, 'Bánh mì', 'banh mi'), (2, 'Cơm tấm', 'com tam'),
+                 (3, 'Bún', 'bun'), (4, 'Canh chua', 'canh chua'), (5, 'Xôi', 'xoi'),
+                 (6, 'Trà sữa', 'tra sua'), (7, 'Thịt kho', 'thit kho')) AS w1(k, name, unsigned)
+      ON w1.k = i % 8
+    JOIN (VALUES (0, 'bò', 'bo'), (1, 'gà', 'ga'), (2, 'sườn', 'suon'), (3, 'chay', 'chay'),
+                 (4, 'cá', 'ca'), (5, 'trứng', 'trung'), (6, 'tôm', 'tom')) AS w2(k, name, unsigned)
+      ON w2.k = (i / 8) % 7
+""")
+
+
+def seed(rows):
+    db.session.execute(SEED_SQL, {'rows': rows, 'brand': BENCH_BRAND})
+    db.session.commit()
+    db.session.execute(text('ANALYZE food_items'))
+    db.session.commit()
+
+
+def cleanup():
+    FoodItem.query.filter_by(brand=BENCH_BRAND).delete()
+    db.session.commit()
+
+
+def run_backend(app, backend, rounds):
+    app.config['FOOD_SEARCH_BACKEND'] = backend
+    if backend == 'memory' and not food_index.ready:
+        started = time.perf_counter()
+        food_index.build()
+        print(f'  memory index build: {time.perf_counter() - started:.1f}s ({len(food_index)} docs)')
+
+    timings = []
+    for _ in range(rounds):
+        for q in QUERIES:
+            started = time.perf_counter()
+            search_food_items(q, user_id=None)
+            timings.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f'{backend:>8}: p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms n={len(timings)}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=0, help='Số dòng giả cần thêm trước khi đo')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--backends', default='ilike,pg_trgm,memory')
+    parser.add_argument('--cleanup', action='store_true', help='Xoá dữ liệu giả rồi thoát')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.cleanup:
+            cleanup()
+            return
+        if args.seed:
+            seed(args.seed)
+        print(f'catalog size: {FoodItem.query.count()} rows')
+        for backend in args.backends.split(','):
+            run_backend(app, backend, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
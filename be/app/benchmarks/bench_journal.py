@@ -0,0 +1,57 @@
+"""
+Đo độ trễ lấy nhật ký ngày (get_aggregated_logs) và 1 trang timeline (get_timeline_page):
+3 truy vấn chạy tuần tự so với chạy song song trên thread pool (parallel_queries).
+
+    python benchmarks/bench_journal.py --user-id 1 --date 2025-06-01 --days 30
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# Cho phép import từ thư mục cha
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from extensions import db
+from logs.services import get_aggregated_logs
+from logs.timeline import get_timeline_page
+
+
+def measure(label, fn, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.rollback()
+        db.session.expunge_all()
+    print(f'{label:>22}: p50={statistics.median(timings):.2f}ms max={max(timings):.2f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--date', default=None, help='YYYY-MM-DD, mặc định hôm nay')
+    parser.add_argument('--days', type=int, default=30, help='Số ngày của khoảng timeline')
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    for_date = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else date.today()
+    start_day = for_date - timedelta(days=args.days - 1)
+
+    app = create_app()
+    with app.app_context():
+        for concurrent in (False, True):
+            suffix = 'parallel' if concurrent else 'sequential'
+            measure(f'day logs ({suffix})',
+                    lambda: get_aggregated_logs(args.user_id, for_date, concurrent=concurrent), args.rounds)
+            measure(f'timeline ({suffix})',
+                    lambda: get_timeline_page(args.user_id, start_day, for_date, limit=args.limit,
+                                              concurrent=concurrent), args.rounds)
+
+
+if __name__ == '__main__':
+    main()
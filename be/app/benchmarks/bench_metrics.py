@@ -0,0 +1,113 @@
+"""
+Đo số câu SQL và độ trễ khi lấy dữ liệu cho /api/v1/users/metrics:
+chuỗi truy vấn cũ (fetch_* riêng lẻ) so với fetch_daily_inputs (1 câu SQL).
+Kèm kiểm tra nhanh luồng đọc của /metrics (fetch_daily_inputs + compute_user_metrics) không phát sinh
+câu ghi nào (INSERT / UPDATE / DELETE); có câu ghi thì thoát với mã lỗi 1.
+Kiểm tra đầy đủ qua HTTP (firebase_required, user context, target_writer): tests/test_user_metrics.py.
+
+    python benchmarks/bench_metrics.py --user-id 1 --date 2025-06-01
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime
+
+# Cho phép import từ thư mục cha
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, func
+from app import create_app
+from extensions import db
+from user.models import Goal, UserProfile, UserSettings, WeightLog
+from user.services import compute_user_metrics, get_metrics_goal
+from user.nutrition import (
+    fetch_calories_consumed,
+    fetch_daily_inputs,
+    fetch_exercise_burned,
+    fetch_exercise_sessions,
+    fetch_macros_consumed,
+    fetch_water_intake,
+)
+
+
+def legacy_inputs(user_id, for_date):
+    wl = (WeightLog.query
+          .filter_by(user_id=user_id)
+          .filter(func.date(WeightLog.logged_at) <= for_date)
+          .order_by(WeightLog.logged_at.desc())
+          .first())
+    weight = float(wl.weight_kg) if wl else 0
+    UserProfile.query.get(user_id)
+    Goal.query.filter_by(user_id=user_id).first()
+    Goal.query.filter_by(user_id=user_id).first()
+    fetch_exercise_sessions(user_id, for_date)
+    fetch_calories_consumed(user_id, for_date)
+    fetch_exercise_burned(user_id, for_date, weight)
+    fetch_macros_consumed(user_id, for_date)
+    fetch_water_intake(user_id, for_date)
+    UserSettings.query.get(user_id)
+
+
+def metrics_read_path(user_id, for_date):
+    """Giống GET /api/v1/users/metrics (không qua HTTP / Firebase)."""
+    prof = UserProfile.query.get(user_id)
+    goal = get_metrics_goal(user_id)
+    inputs = fetch_daily_inputs(user_id, for_date)
+    data = {
+        'current_weight_kg': inputs['current_weight_kg'] or 0,
+        'goal_direction': goal.goal_direction if goal else 'giữ nguyên',
+        'weekly_rate': goal.weekly_rate if goal else 0.25,
+    }
+    return compute_user_metrics(user_id, data, prof, for_date, inputs)
+
+
+def measure(label, fn, rounds):
+    statements = []
+    writes = []
+
+    def count(_conn, _cursor, statement, *_args):
+        statements[-1] += 1
+        if statement.split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            writes.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    timings = []
+    try:
+        for _ in range(rounds):
+            statements.append(0)
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+            # Bỏ identity map để mỗi vòng đều phải truy vấn lại như 1 request mới
+            db.session.rollback()
+            db.session.expunge_all()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    print(f'{label:>8}: {statistics.median(statements):.0f} queries/call, '
+          f'p50={statistics.median(timings):.2f}ms max={max(timings):.2f}ms')
+    return writes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--date', default=None, help='YYYY-MM-DD, mặc định hôm nay')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    for_date = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else date.today()
+
+    app = create_app()
+    with app.app_context():
+        measure('before', lambda: legacy_inputs(args.user_id, for_date), args.rounds)
+        measure('after', lambda: fetch_daily_inputs(args.user_id, for_date), args.rounds)
+        writes = measure('metrics', lambda: metrics_read_path(args.user_id, for_date), args.rounds)
+    if writes:
+        print(f"❌ Luồng đọc /metrics phát sinh {len(writes)} câu ghi, ví dụ: {writes[0][:120]}")
+        sys.exit(1)
+    print("✅ Luồng đọc /metrics không ghi DB.")
+
+
+if __name__ == '__main__':
+    main()
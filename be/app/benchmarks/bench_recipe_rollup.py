@@ -0,0 +1,165 @@
+"""
+Đo thời gian tính lại công thức khi sửa 1 nguyên liệu được dùng bởi nhiều công thức:
+re-save từng công thức (cách cũ) so với recompute_dependent_recipes (UPDATE theo tầng).
+
+    python benchmarks/bench_recipe_rollup.py --recipes 10000 --nested 1000
+    python benchmarks/bench_recipe_rollup.py --cleanup
+
+Dữ liệu giả được đánh dấu brand='__bench__' để có thể xoá lại.
+Cần chạy migrations/004_recipe_ingredient_index.sql trước.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Cho phép import từ thư mục cha
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, text
+from app import create_app
+from extensions import db
+from food.models import FoodItem, FoodItemIngredient
+from food.recipe_nutrition import apply_recipe_totals, compute_recipe_totals, load_ingredient_foods
+from food.recipe_rollup import recompute_dependent_recipes
+
+BENCH_BRAND = '__bench__'
+
+# N công thức tầng 1 cùng dùng món gốc (+ 1 nguyên liệu phụ),
+# M công thức tầng 2 dùng 2 công thức tầng 1.
+SEED_SQL = text("""
+WITH base AS (
+    INSERT INTO food_items (name, name_unsigned, brand, serving_size, serving_unit,
+                            calories, protein_g, carbs_g, fat_g, is_custom, is_recipe)
+    VALUES ('bench base', 'bench base', :brand, 100, 'g', 200, 10, 20, 5, TRUE, FALSE),
+           ('bench side', 'bench side', :brand, 1, 'piece', 80, 6, 1, 5, TRUE, FALSE)
+    RETURNING food_item_id, name
+),
+level1 AS (
+    INSERT INTO food_items (name, name_unsigned, brand, serving_size, serving_unit,
+                            calories, protein_g, carbs_g, fat_g, is_custom, is_recipe)
+    SELECT 'bench recipe ' || i, 'bench recipe ' || i, :brand, 1, 'serving', 0, 0, 0, 0, TRUE, TRUE
+    FROM generate_series(1, :recipes) AS i
+    RETURNING food_item_id
+)
+INSERT INTO food_item_ingredients (recipe_id, ingredient_id, quantity, unit)
+SELECT l.food_item_id, b.food_item_id,
+       CASE WHEN b.name = 'bench base' THEN 150 ELSE 2 END,
+       CASE WHEN b.name = 'bench base' THEN 'g' ELSE 'piece' END
+FROM level1 l CROSS JOIN base b
+""")
+
+SEED_NESTED_SQL = text("""
+WITH level1 AS (
+    SELECT food_item_id, row_number() OVER (ORDER BY food_item_id) AS rn
+    FROM food_items WHERE brand = :brand AND is_recipe AND name LIKE 'bench recipe %'
+),
+level2 AS (
+    INSERT INTO food_items (name, name_unsigned, brand, serving_size, serving_unit,
+                            calories, protein_g, carbs_g, fat_g, is_custom, is_recipe)
+    SELECT 'bench combo ' || i, 'bench combo ' || i, :brand, 1, 'serving', 0, 0, 0, 0, TRUE, TRUE
+    FROM generate_series(1, :nested) AS i
+    RETURNING food_item_id
+),
+numbered AS (
+    SELECT food_item_id, row_number() OVER (ORDER BY food_item_id) AS rn FROM level2
+)
+INSERT INTO food_item_ingredients (recipe_id, ingredient_id, quantity, unit)
+SELECT l2.food_item_id, l1.food_item_id, 1, 'serving'
+FROM numbered l2
+JOIN level1 l1 ON l1.rn IN (l2.rn, l2.rn + 1)
+""")
+
+
+def seed(recipes, nested):
+    db.session.execute(SEED_SQL, {'recipes': recipes, 'brand': BENCH_BRAND})
+    if nested:
+        db.session.execute(SEED_NESTED_SQL, {'nested': nested, 'brand': BENCH_BRAND})
+    db.session.commit()
+    db.session.execute(text('ANALYZE food_items'))
+    db.session.execute(text('ANALYZE food_item_ingredients'))
+    db.session.commit()
+
+
+def cleanup():
+    bench_ids = db.session.query(FoodItem.food_item_id).filter(FoodItem.brand == BENCH_BRAND)
+    FoodItemIngredient.query.filter(
+        FoodItemIngredient.recipe_id.in_(bench_ids.scalar_subquery())
+    ).delete(synchronize_session=False)
+    FoodItem.query.filter_by(brand=BENCH_BRAND).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def legacy_resave(base_id):
+    """Cách cũ: lưu lại từng công thức dùng món gốc (chỉ tầng 1)."""
+    recipe_ids = [
+        r.recipe_id for r in
+        FoodItemIngredient.query.with_entities(FoodItemIngredient.recipe_id).filter_by(ingredient_id=base_id)
+    ]
+    for recipe_id in recipe_ids:
+        recipe = FoodItem.query.get(recipe_id)
+        ingredients = [
+            (ing.ingredient_id, ing.quantity, ing.unit)
+            for ing in FoodItemIngredient.query.filter_by(recipe_id=recipe_id)
+        ]
+        foods = load_ingredient_foods(i for i, _, _ in ingredients)
+        apply_recipe_totals(recipe, compute_recipe_totals(ingredients, foods))
+    db.session.flush()
+
+
+def measure(label, fn):
+    statements = [0]
+
+    def count(*_args):
+        statements[0] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        started = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+        db.session.rollback()
+    print(f'{label:>10}: {elapsed:.1f}ms, {statements[0]} statements')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=0, help='Số công thức tầng 1 cần tạo trước khi đo')
+    parser.add_argument('--nested', type=int, default=0, help='Số công thức tầng 2 (lồng công thức tầng 1)')
+    parser.add_argument('--skip-legacy', action='store_true')
+    parser.add_argument('--cleanup', action='store_true', help='Xoá dữ liệu giả rồi thoát')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.cleanup:
+            cleanup()
+            return
+        if args.recipes:
+            seed(args.recipes, args.nested)
+
+        base = FoodItem.query.filter_by(brand=BENCH_BRAND, name='bench base').first()
+        if not base:
+            print('Chưa có dữ liệu giả, chạy với --recipes N trước.')
+            return
+
+        def edit_base():
+            base.calories = float(base.calories) + 1
+
+        def incremental():
+            edit_base()
+            recompute_dependent_recipes([base.food_item_id])
+
+        def legacy():
+            edit_base()
+            legacy_resave(base.food_item_id)
+
+        measure('recompute', incremental)
+        if not args.skip_legacy:
+            measure('legacy', legacy)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,53 @@ class Config:
     # Flask-SQLAlchemy sẽ dùng biến này để kết nối
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool kết nối (áp dụng cho cả primary và replica)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        # Giới hạn thời gian mỗi câu lệnh (ms), 0 = không giới hạn.
+        # Script chạy lâu (importer, rebuild rollup) dùng chung config nên mặc định không giới hạn.
+        'connect_args': {'options': f"-c statement_timeout={int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))}"},
+    }
+    # Bản sao chỉ đọc cho các route GET (@replica_read). Không đặt thì mọi truy vấn chạy trên primary.
+    SQLALCHEMY_BINDS = {'replica': os.getenv('DATABASE_REPLICA_URL')} if os.getenv('DATABASE_REPLICA_URL') else {}
+    # Số thread chạy song song các truy vấn độc lập của 1 request (<= 1: chạy tuần tự)
+    DB_QUERY_WORKERS = int(os.getenv('DB_QUERY_WORKERS', 4))
+    # Sau khi user ghi dữ liệu, đọc từ primary trong N giây (read-your-writes)
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
     FIREBASE_CREDENTIALS    = os.getenv('FIREBASE_CREDENTIALS')
+    FIREBASE_TOKEN_CACHE_SIZE = int(os.getenv('FIREBASE_TOKEN_CACHE_SIZE', 10000))
+    FIREBASE_CLOCK_SKEW_SECONDS = int(os.getenv('FIREBASE_CLOCK_SKEW_SECONDS', 60))
+    # Thời gian cache User/Profile/Settings/Goal theo Firebase uid
+    USER_CONTEXT_TTL_SECONDS = int(os.getenv('USER_CONTEXT_TTL_SECONDS', 300))
+    # Chu kỳ (giây) so version dữ liệu user với DB (thay đổi do worker khác ghi)
+    USER_CONTEXT_CHECK_SECONDS = float(os.getenv('USER_CONTEXT_CHECK_SECONDS', 2))
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
+    # Giới hạn dung lượng request (Flask trả 413 trước khi đọc body)
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_UPLOAD_MB', 10)) * 1024 * 1024
+    # Số process xử lý ảnh upload (tạo rendition)
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+    # 'memory' (index trigram trong RAM) | 'pg_trgm' (Postgres) | 'ilike'
+    FOOD_SEARCH_BACKEND = os.getenv('FOOD_SEARCH_BACKEND', 'memory')
+    # Chu kỳ (giây) kiểm tra version bảng food_items để cập nhật index trong RAM của từng process
+    FOOD_INDEX_CHECK_SECONDS = int(os.getenv('FOOD_INDEX_CHECK_SECONDS', 15))
+    # Cache-Control max-age (giây) cho món ăn dùng chung (không phải custom)
+    FOOD_CACHE_MAX_AGE = int(os.getenv('FOOD_CACHE_MAX_AGE', 3600))
+    # Chu kỳ (giây) kiểm tra version của danh mục exercise_type
+    EXERCISE_CATALOG_TTL_SECONDS = int(os.getenv('EXERCISE_CATALOG_TTL_SECONDS', 60))
+    # Thời gian nhớ mã vạch không tồn tại (negative cache)
+    BARCODE_NEGATIVE_TTL_SECONDS = int(os.getenv('BARCODE_NEGATIVE_TTL_SECONDS', 60))
+    # Ghi barcode_scans theo lô: tối đa N dòng hoặc sau M giây
+    BARCODE_SCAN_BATCH_SIZE = int(os.getenv('BARCODE_SCAN_BATCH_SIZE', 500))
+    BARCODE_SCAN_FLUSH_SECONDS = float(os.getenv('BARCODE_SCAN_FLUSH_SECONDS', 1.0))
+    # Chu kỳ (giây) ghi trễ default_target_calories phát hiện từ GET /metrics
+    TARGET_CALORIES_FLUSH_SECONDS = float(os.getenv('TARGET_CALORIES_FLUSH_SECONDS', 5))
+    # Endpoint số liệu Prometheus GET /metrics; đặt METRICS_TOKEN để yêu cầu Bearer token
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # Số thao tác tối đa trong 1 request POST /api/v1/logs/batch
+    LOG_BATCH_MAX_ITEMS = int(os.getenv('LOG_BATCH_MAX_ITEMS', 500))
@@ -0,0 +1,61 @@
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import g, has_app_context
+
+# Trùng với giá trị mặc định của user_settings.timezone
+DEFAULT_TIMEZONE = 'Asia/Bangkok'
+
+
+def get_timezone(name):
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def user_timezone(user_id):
+    """
+    Múi giờ của user (UserSettings.timezone), ưu tiên lấy từ user context đã cache của request.
+    """
+    ctx = getattr(g, 'user_context', None) if has_app_context() else None
+    if ctx is not None and ctx.user.user_id == user_id:
+        return get_timezone(ctx.settings.timezone if ctx.settings else None)
+
+    from user.models import UserSettings
+    sett = UserSettings.query.get(user_id)
+    return get_timezone(sett.timezone if sett else None)
+
+
+def as_aware(ts, tz):
+    """
+    Gắn múi giờ cho timestamp: timestamp không có offset được hiểu là giờ địa phương của user.
+    """
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=tz)
+    return ts
+
+
+def local_date(ts, tz):
+    """Ngày địa phương (theo tz của user) của một timestamp."""
+    return as_aware(ts, tz).astimezone(tz).date()
+
+
+def local_today(tz):
+    """Ngày hôm nay theo múi giờ của user."""
+    return datetime.now(tz).date()
+
+
+def day_bounds(day, tz):
+    """
+    Khoảng UTC nửa mở [start, end) của một ngày địa phương.
+    Dùng dạng `col >= start AND col < end` để truy vấn dùng được index (user_id, logged_at).
+    """
+    return range_bounds(day, day, tz)
+
+
+def range_bounds(start_day, end_day, tz):
+    """Khoảng UTC nửa mở [start, end) từ đầu ngày start_day tới hết ngày end_day (giờ địa phương)."""
+    start = datetime.combine(start_day, time.min, tzinfo=tz)
+    end = datetime.combine(end_day + timedelta(days=1), time.min, tzinfo=tz)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
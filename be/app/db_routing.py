@@ -0,0 +1,163 @@
+"""
+Điều hướng truy vấn giữa DB chính (primary) và bản sao chỉ đọc (replica).
+
+- Route GET chỉ đọc đánh dấu bằng @replica_read: các câu SELECT trong request đó chạy trên replica.
+- Mọi câu ghi (flush, INSERT / UPDATE / DELETE, SELECT ... FOR UPDATE / FOR SHARE) luôn chạy trên primary,
+  và từ lúc có ghi, phần còn lại của request cũng dùng primary.
+- SQL thô (text()) coi như câu ghi, trừ khi được đánh dấu bằng replica_safe()
+  (SELECT nextval(...), hàm có side effect... không được chạy trên replica).
+- Read-your-writes: sau khi user commit thay đổi, các request đọc của user đó dùng primary
+  trong REPLICA_STICKY_SECONDS giây (đủ để replica bắt kịp). Mốc này lưu ở bảng replica_sticky
+  trên primary (migrations/009) nên mọi worker / máy chủ đều thấy.
+- Không cấu hình DATABASE_REPLICA_URL thì mọi thứ chạy trên primary như cũ.
+"""
+from functools import wraps
+
+from flask import g, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.sql.elements import TextClause
+
+REPLICA_BIND = 'replica'
+# execution option đánh dấu SQL thô chỉ đọc, được phép chạy trên replica
+REPLICA_SAFE_OPTION = 'replica_safe'
+
+
+def replica_safe(statement):
+    """Đánh dấu câu text() thuần đọc (không khoá, không gọi hàm có side effect) để chạy được trên replica."""
+    return statement.execution_options(**{REPLICA_SAFE_OPTION: True})
+
+
+# Chạy trước khi request được phép dùng replica nên luôn ở primary; replica_safe để không bị tính là câu ghi
+_STICKY_SQL = replica_safe(text(
+    'SELECT 1 FROM replica_sticky WHERE user_id = :user_id AND until > now()'
+))
+_MARK_STICKY_SQL = text("""
+INSERT INTO replica_sticky (user_id, until)
+VALUES (:user_id, now() + make_interval(secs => :window))
+ON CONFLICT (user_id) DO UPDATE SET until = EXCLUDED.until
+""")
+
+
+class StickyWrites:
+    """
+    user_id -> hạn đọc từ primary, lưu ở bảng UNLOGGED replica_sticky trên primary (dùng chung mọi worker).
+    mark() ghi trong cùng transaction với thay đổi của user; is_sticky() là 1 truy vấn khoá chính.
+    Chỉ bật khi có cấu hình replica.
+    """
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self.enabled = False
+
+    def mark(self, session, user_id):
+        session.execute(_MARK_STICKY_SQL, {'user_id': user_id, 'window': self.window})
+
+    def is_sticky(self, session, user_id):
+        return session.execute(_STICKY_SQL, {'user_id': user_id}).first() is not None
+
+
+sticky_writes = StickyWrites()
+
+
+def init_db_routing(app):
+    sticky_writes.window = app.config.get('REPLICA_STICKY_SECONDS', sticky_writes.window)
+    sticky_writes.enabled = bool(app.config.get('SQLALCHEMY_BINDS', {}).get(REPLICA_BIND))
+
+
+def _current_user_id():
+    # Đọc khoá chính từ identity: không nạp lại object đã bị expire sau commit
+    user = g.get('current_user')
+    if user is None:
+        return None
+    identity = inspect(user).identity
+    return identity[0] if identity else None
+
+
+def replica_read(f):
+    """Cho phép request đọc từ replica. Đặt dưới @firebase_required() để biết user hiện tại."""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        user_id = _current_user_id()
+        if user_id is None or not _is_sticky(user_id):
+            g.db_replica_read = True
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def _is_sticky(user_id):
+    if not sticky_writes.enabled:
+        return False
+    from extensions import db
+    return sticky_writes.is_sticky(db.session(), user_id)
+
+
+def _is_read_statement(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, TextClause):
+        return bool(clause.get_execution_options().get(REPLICA_SAFE_OPTION))
+    if not getattr(clause, 'is_select', False):
+        return False
+    # SELECT ... FOR UPDATE / FOR SHARE phải lấy khoá trên primary
+    return getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """Session của db: chọn engine replica cho câu đọc trong request @replica_read."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        # Chỉ dựa vào g (nằm trong app context): thread của parallel_queries chỉ có app context,
+        # cờ của request được chép sang g của thread đó
+        if not has_app_context() or not g.get('db_replica_read') or g.get('db_wrote'):
+            return False
+        if self._flushing or self.info.get('wrote'):
+            return False
+        return _is_read_statement(clause)
+
+
+def _mark_write(session):
+    session.info['wrote'] = True
+    if has_app_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, _flush_context):
+    _mark_write(session)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _on_execute(state):
+    if not _is_read_statement(state.statement):
+        _mark_write(state.session)
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _before_commit(session):
+    # Ghi mốc read-your-writes trong cùng transaction: commit thay đổi là có mốc
+    if not sticky_writes.enabled or not has_request_context():
+        return
+    # before_commit chạy trước lần flush cuối: tính cả thay đổi chưa flush
+    if not (session.info.get('wrote') or session.new or session.dirty or session.deleted):
+        return
+    user_id = _current_user_id()
+    if user_id is not None:
+        sticky_writes.mark(session, user_id)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _after_commit(session):
+    session.info.pop('wrote', None)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('wrote', None)
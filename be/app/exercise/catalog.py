@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import text
+from db_routing import replica_safe
+from extensions import db
+from exercise.models import ExerciseType
+
+# Hash nội dung bảng exercise_type, tính ngay trong DB (bảng nhỏ, 1 dòng kết quả)
+_VERSION_SQL = replica_safe(text("""
+SELECT md5(COALESCE(string_agg(
+    concat_ws('|', exercise_type_id, name, mets, category, icon_url), E'\\n'
+    ORDER BY exercise_type_id
+), ''))
+FROM exercise_type
+"""))
+
+# Bản chụp bất biến của catalog: đọc không cần khoá
+CatalogSnapshot = namedtuple('CatalogSnapshot', 'version items by_id by_category json_bytes')
+
+
+class ExerciseCatalog:
+    """
+    Danh mục loại bài tập dùng chung cho cả process.
+    Nạp 1 lần, giữ sẵn JSON đã encode và version (md5 nội dung bảng);
+    tối đa mỗi `ttl` giây kiểm tra version 1 lần và chỉ nạp lại khi bảng thay đổi.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def snapshot(self):
+        ttl = current_app.config.get('EXERCISE_CATALOG_TTL_SECONDS', 60)
+        if self._snapshot is None or time.monotonic() - self._checked_at >= ttl:
+            self._refresh()
+        return self._snapshot
+
+    def get(self, exercise_type_id):
+        """Loại bài tập theo id (dict id/name/mets/category/icon_url) hoặc None."""
+        return self.snapshot().by_id.get(int(exercise_type_id))
+
+    def by_category(self, category):
+        return self.snapshot().by_category.get(category, ())
+
+    def mets_for(self, exercise_type_id, default=1.0):
+        entry = self.get(exercise_type_id)
+        return entry['mets'] if entry and entry['mets'] else default
+
+    def invalidate(self):
+        """Buộc kiểm tra lại version ở lần đọc sau."""
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        with self._lock:
+            version = db.session.execute(_VERSION_SQL).scalar()
+            self._checked_at = time.monotonic()
+            if self._snapshot is not None and self._snapshot.version == version:
+                return
+            self._snapshot = self._load(version)
+
+    @staticmethod
+    def _load(version):
+        items = [
+            {
+                'id': t.exercise_type_id,
+                'name': t.name,
+                'mets': float(t.mets or 0),
+                'category': t.category,
+                'icon_url': t.icon_url,
+            }
+            for t in ExerciseType.query.order_by(ExerciseType.name).all()
+        ]
+        by_category = {}
+        for item in items:
+            by_category.setdefault(item['category'], []).append(item)
+        return CatalogSnapshot(
+            version=version,
+            items=tuple(items),
+            by_id={item['id']: item for item in items},
+            by_category={k: tuple(v) for k, v in by_category.items()},
+            json_bytes=json.dumps(items, ensure_ascii=False).encode('utf-8'),
+        )
+
+
+exercise_catalog = ExerciseCatalog()
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify, g
 from exercise.models import ExerciseType
-from exercise.services import create_exercise_log, fetch_exercise_types
+from exercise.services import create_exercise_log
+from exercise.catalog import exercise_catalog
+from http_cache import conditional_bytes
+from db_routing import replica_read
 
 exercise_bp = Blueprint('exercise', __name__, url_prefix='/api/v1/exercise')
 
@@ -20,9 +23,10 @@ def add_exercise_log():
     try:
         user_id = g.current_user.user_id
         log = create_exercise_log(user_id, ex_type_id, duration)
+        entry = exercise_catalog.get(log.exercise_type_id)
         return jsonify({
             'exercise_id': log.exercise_id,
-            'exercise_type': log.exercise_type.name,
+            'exercise_type': entry['name'] if entry else log.exercise_type.name,
             'duration_min': log.duration_min,
             'calories_burned': float(log.calories_burned),
             'logged_at': log.logged_at.isoformat(),
@@ -31,17 +35,11 @@ def add_exercise_log():
         return jsonify({'error': str(e)}), 500
 
 @exercise_bp.route('/types', methods=['GET'])
+@replica_read
 def get_exercise_types():
     """
     Trả về danh sách các loại bài tập (id, name, mets, category)
     """
-    types = fetch_exercise_types()
-    return jsonify([
-        {
-            'id': t.exercise_type_id,
-            'name': t.name,
-            'mets': float(t.mets or 0),
-            'category': t.category,
-        }
-        for t in types
-    ]), 200
\ No newline at end of file
+    # JSON đã encode sẵn trong catalog; ETag = version của bảng
+    catalog = exercise_catalog.snapshot()
+    return conditional_bytes(catalog.version, catalog.json_bytes, cache_control='public, max-age=300')
@@ -1,5 +1,7 @@
 from extensions import db
 from exercise.models import ExerciseLog, ExerciseType
+from summary.services import refresh_daily_summary
+from day_window import local_date, user_timezone
 
 def fetch_exercise_types():
     """Trả về tất cả các loại bài tập."""
@@ -16,6 +18,9 @@ def create_exercise_log(user_id: int, exercise_type_id: int, duration_min: int)
         duration_min=duration_min
     )
     db.session.add(log)
-    db.session.commit()        # trigger sẽ fill calories_burned trước khi commit
+    db.session.flush()         # trigger sẽ fill calories_burned, logged_at = now()
+    db.session.refresh(log)
+    refresh_daily_summary(user_id, local_date(log.logged_at, user_timezone(user_id)))
+    db.session.commit()
     db.session.refresh(log)
     return log
\ No newline at end of file
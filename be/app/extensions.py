@@ -1,9 +1,16 @@
+import os
 from flask_sqlalchemy import SQLAlchemy
 import firebase_admin
 from firebase_admin import credentials, auth as fb_auth
+from auth.token_cache import init_token_verifier
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+# Session chọn primary / replica theo từng câu lệnh (xem db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def init_firebase(app):
     cred = credentials.Certificate(app.config['FIREBASE_CREDENTIALS'])
-    firebase_admin.initialize_app(cred)
+    fb_app = firebase_admin.initialize_app(cred)
+    # Auth emulator phát token không ký: để Admin SDK tự verify
+    if not os.getenv('FIREBASE_AUTH_EMULATOR_HOST'):
+        init_token_verifier(app, fb_app.project_id)
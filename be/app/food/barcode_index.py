@@ -0,0 +1,118 @@
+import threading
+import time
+
+from extensions import db
+from food.models import FoodItem
+
+
+class BarcodeIndex:
+    """
+    Index barcode -> (food_item_id, owner) trong RAM cho GET /api/v1/foods/barcode/<code>.
+
+    - Dựng 1 lần khi khởi động, cập nhật ngay khi món ăn được tạo / sửa / xoá trong process này.
+    - Món do process khác ghi (worker khác, importer) được đưa vào theo version bảng (food/index_sync.py),
+      hoặc được tìm thấy qua DB ở lần tra đầu tiên.
+    - Mã không tồn tại được nhớ trong negative cache (có TTL) để lần quét lại không chạm DB.
+    """
+
+    def __init__(self, negative_ttl=60, negative_max_size=100000):
+        self._lock = threading.Lock()
+        self._entries = {}        # barcode -> (food_item_id, created_by hoặc None nếu món dùng chung)
+        self._codes = {}          # food_item_id -> barcode
+        self._misses = {}         # barcode -> hết hạn lúc
+        self.negative_ttl = negative_ttl
+        self.negative_max_size = negative_max_size
+        self.ready = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def build(self, batch_size=5000):
+        entries, codes = {}, {}
+        rows = (
+            db.session.query(FoodItem.barcode, FoodItem.food_item_id, FoodItem.is_custom, FoodItem.created_by)
+            .filter(FoodItem.barcode.isnot(None))
+            .yield_per(batch_size)
+        )
+        for barcode, food_item_id, is_custom, created_by in rows:
+            entries[barcode] = (food_item_id, created_by if is_custom else None)
+            codes[food_item_id] = barcode
+        with self._lock:
+            self._entries = entries
+            self._codes = codes
+            self._misses.clear()
+            self.ready = True
+
+    def lookup(self, barcode, user_id=None):
+        """
+        Trả về food_item_id của barcode mà user được xem, hoặc None.
+        Chỉ truy vấn DB khi mã chưa có trong index và chưa nằm trong negative cache.
+        """
+        entry = self._entries.get(barcode)
+        if entry is None:
+            if self._is_known_miss(barcode):
+                return None
+            entry = self._load(barcode)
+            if entry is None:
+                return None
+        food_item_id, owner = entry
+        if owner is not None and owner != user_id:
+            return None
+        return food_item_id
+
+    def upsert(self, food):
+        """Đồng bộ sau khi tạo / sửa món ăn (barcode có thể bị đổi hoặc xoá)."""
+        with self._lock:
+            self._remove_locked(food.food_item_id)
+            if food.barcode:
+                self._entries[food.barcode] = (food.food_item_id, food.created_by if food.is_custom else None)
+                self._codes[food.food_item_id] = food.barcode
+                self._misses.pop(food.barcode, None)
+
+    def remove(self, food_item_id):
+        with self._lock:
+            self._remove_locked(food_item_id)
+
+    def _remove_locked(self, food_item_id):
+        old = self._codes.pop(food_item_id, None)
+        if old is not None:
+            self._entries.pop(old, None)
+
+    def _is_known_miss(self, barcode):
+        expires_at = self._misses.get(barcode)
+        if expires_at is None:
+            return False
+        if time.monotonic() >= expires_at:
+            with self._lock:
+                self._misses.pop(barcode, None)
+            return False
+        return True
+
+    def _load(self, barcode):
+        row = (
+            db.session.query(FoodItem.food_item_id, FoodItem.is_custom, FoodItem.created_by)
+            .filter(FoodItem.barcode == barcode)
+            .first()
+        )
+        with self._lock:
+            if row is None:
+                if len(self._misses) >= self.negative_max_size:
+                    self._misses.clear()
+                self._misses[barcode] = time.monotonic() + self.negative_ttl
+                return None
+            entry = (row.food_item_id, row.created_by if row.is_custom else None)
+            self._entries[barcode] = entry
+            self._codes[row.food_item_id] = barcode
+            return entry
+
+
+barcode_index = BarcodeIndex()
+
+
+def init_barcode_index(app):
+    """Dựng index barcode khi khởi động ứng dụng."""
+    from food.index_sync import food_index_sync
+    barcode_index.negative_ttl = app.config.get('BARCODE_NEGATIVE_TTL_SECONDS', 60)
+    with app.app_context():
+        barcode_index.build()
+        food_index_sync.mark_built()
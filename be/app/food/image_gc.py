@@ -0,0 +1,138 @@
+"""
+Dọn ảnh upload không còn món ăn nào tham chiếu (mark-and-sweep).
+
+    python food/image_gc.py --dry-run          # chỉ liệt kê
+    python food/image_gc.py                    # xoá file mồ côi cũ hơn 24h
+    python food/image_gc.py --min-age-hours 1 --legacy
+
+Mark: đọc đường dẫn ảnh từ food_items.image_url theo thứ tự (server-side cursor).
+Sweep: duyệt thư mục shard ab/cd/ theo thứ tự, trộn với luồng tham chiếu ở trên,
+nên bộ nhớ chỉ phụ thuộc số file trong 1 shard chứ không phụ thuộc tổng số file.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+# Cho phép import từ thư mục cha
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+from food.images import TMP_DIR_NAME
+
+SHARD_RE = re.compile(r'^[0-9a-f]{2}$')
+
+# Đường dẫn tương đối trong uploads của ảnh đang được tham chiếu, sắp xếp theo byte (COLLATE "C")
+# để khớp với thứ tự duyệt thư mục (sorted() của Python).
+_IMAGE_PATH = "substring(image_url from '/static/uploads/(.*)$') COLLATE \"C\""
+
+_SHARDED_REFS_SQL = text(f"""
+SELECT DISTINCT {_IMAGE_PATH} AS rel
+FROM food_items
+WHERE {_IMAGE_PATH} ~ '^[0-9a-f]{{2}}/[0-9a-f]{{2}}/'
+ORDER BY rel
+""")
+
+_LEGACY_REFS_SQL = text(f"""
+SELECT DISTINCT {_IMAGE_PATH} AS rel
+FROM food_items
+WHERE {_IMAGE_PATH} !~ '/'
+""")
+
+
+def file_key(filename):
+    """<hash>_thumb.webp, <hash>.webp -> <hash> (mọi rendition thuộc cùng 1 ảnh)."""
+    return filename.split('.', 1)[0].split('_', 1)[0]
+
+
+def iter_sharded_refs():
+    result = db.session.execute(_SHARDED_REFS_SQL.execution_options(stream_results=True))
+    for row in result:
+        yield row.rel
+
+
+def iter_leaf_dirs(root):
+    """Các thư mục shard ab/cd theo thứ tự tăng dần."""
+    for top in sorted(e.name for e in os.scandir(root) if e.is_dir() and SHARD_RE.match(e.name)):
+        top_path = os.path.join(root, top)
+        for sub in sorted(e.name for e in os.scandir(top_path) if e.is_dir() and SHARD_RE.match(e.name)):
+            yield f'{top}/{sub}'
+
+
+def sweep_sharded(root, min_age_seconds, dry_run):
+    refs = iter_sharded_refs()
+    pending = next(refs, None)
+    removed = 0
+    for leaf in iter_leaf_dirs(root):
+        prefix = leaf + '/'
+        # Bỏ qua tham chiếu tới shard không còn trên đĩa
+        while pending is not None and pending < prefix:
+            pending = next(refs, None)
+        keys = set()
+        while pending is not None and pending.startswith(prefix):
+            keys.add(file_key(pending[len(prefix):]))
+            pending = next(refs, None)
+        removed += _sweep_dir(os.path.join(root, leaf), keys, min_age_seconds, dry_run)
+    return removed
+
+
+def sweep_legacy(root, min_age_seconds, dry_run):
+    """Ảnh lưu phẳng trong uploads/ (trước khi lưu theo hash). Tập này không còn tăng thêm."""
+    keys = {file_key(row.rel) for row in db.session.execute(_LEGACY_REFS_SQL)}
+    return _sweep_dir(root, keys, min_age_seconds, dry_run)
+
+
+def sweep_incoming(root, min_age_seconds, dry_run):
+    """File tạm của upload bị bỏ dở / worker lỗi."""
+    incoming = os.path.join(root, TMP_DIR_NAME)
+    if not os.path.isdir(incoming):
+        return 0
+    return _sweep_dir(incoming, set(), min_age_seconds, dry_run)
+
+
+def _sweep_dir(path, keys, min_age_seconds, dry_run):
+    removed = 0
+    cutoff = time.time() - min_age_seconds
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name.startswith(('default', '.')):
+                continue
+            if file_key(entry.name) in keys:
+                continue
+            # File mới: có thể thuộc upload mà món ăn chưa kịp commit
+            if entry.stat().st_mtime > cutoff:
+                continue
+            print(f"🗑  {os.path.relpath(entry.path)}")
+            if not dry_run:
+                os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dry-run', action='store_true', help='Chỉ liệt kê, không xoá')
+    parser.add_argument('--min-age-hours', type=float, default=24)
+    parser.add_argument('--legacy', action='store_true', help='Dọn cả ảnh lưu phẳng kiểu cũ (uuid)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        root = app.config['UPLOAD_FOLDER']
+        if not os.path.isdir(root):
+            print("Không có thư mục uploads.")
+            return
+        min_age = int(args.min_age_hours * 3600)
+        removed = sweep_sharded(root, min_age, args.dry_run)
+        removed += sweep_incoming(root, min_age, args.dry_run)
+        if args.legacy:
+            removed += sweep_legacy(root, min_age, args.dry_run)
+        action = 'Sẽ xoá' if args.dry_run else 'Đã xoá'
+        print(f"✅ {action} {removed} file.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app, request
+
+from instrumentation import observe_upload
+
+logger = logging.getLogger(__name__)
+
+# Kích thước cạnh dài tối đa (px) của từng bản ảnh; 'detail' là ảnh lưu trong image_url
+RENDITIONS = {
+    'thumb': 128,
+    'list': 320,
+    'detail': 1024,
+}
+RENDITION_FORMAT = 'webp'
+RENDITION_QUALITY = 80
+
+CHUNK_SIZE = 64 * 1024
+TMP_DIR_NAME = '.incoming'
+
+# Ảnh lưu theo hash nội dung (sha256 của file gốc), chia thư mục 2 cấp: ab/cd/<hash>[_rendition].webp
+CONTENT_PATH_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_[a-z]+)?\.' + RENDITION_FORMAT + '$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Ảnh tạm khi worker chưa xử lý xong
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="320" height="320" viewBox="0 0 320 320">'
+    '<rect width="320" height="320" fill="#eeeeee"/></svg>'
+)
+
+
+def rendition_filename(name, rendition):
+    if rendition == 'detail':
+        return f'{name}.{RENDITION_FORMAT}'
+    return f'{name}_{rendition}.{RENDITION_FORMAT}'
+
+
+def rendition_url(image_url, rendition):
+    """
+    URL của bản ảnh `rendition` suy ra từ image_url (ảnh detail).
+    Ảnh cũ (lưu nguyên bản trước khi có pipeline) không có rendition -> trả lại image_url.
+    """
+    suffix = f'.{RENDITION_FORMAT}'
+    if not image_url or not image_url.endswith(suffix) or rendition == 'detail':
+        return image_url
+    return f'{image_url[:-len(suffix)]}_{rendition}{suffix}'
+
+
+def is_rendition_name(filename):
+    return filename.endswith(f'.{RENDITION_FORMAT}')
+
+
+def shard_dir(digest):
+    return f'{digest[:2]}/{digest[2:4]}'
+
+
+def is_content_addressed(filename):
+    """Đường dẫn (tương đối trong uploads) của ảnh lưu theo hash: nội dung không bao giờ đổi."""
+    return bool(CONTENT_PATH_RE.match(filename))
+
+
+def is_pending(upload_folder, filename):
+    """Rendition chưa được tạo nhưng file upload gốc vẫn đang chờ worker xử lý."""
+    if not is_rendition_name(filename) or os.path.exists(os.path.join(upload_folder, filename)):
+        return False
+    name = filename.rsplit('/', 1)[-1][:-len(RENDITION_FORMAT) - 1]
+    for rendition in RENDITIONS:
+        name = name.removesuffix(f'_{rendition}')
+    return os.path.exists(os.path.join(upload_folder, TMP_DIR_NAME, f'{name}.upload'))
+
+
+# --- Lưu upload ---
+
+def save_upload(image_file):
+    """
+    Ghi file upload xuống đĩa theo từng chunk (không đọc cả file vào RAM) và tính sha256 cùng lúc.
+    Ảnh được định danh bằng hash nội dung: upload trùng không lưu / xử lý lại.
+    Việc tạo rendition chạy ở process pool; hàm trả về ngay URL ảnh detail
+    (trong lúc worker chưa xong, URL này được phục vụ bằng ảnh placeholder).
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    tmp_dir = os.path.join(upload_folder, TMP_DIR_NAME)
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    receiving_path = os.path.join(tmp_dir, f'{uuid.uuid4().hex}.receiving')
+    digest, size = _stream_to_file(image_file.stream, receiving_path, current_app.config.get('MAX_CONTENT_LENGTH'))
+    observe_upload('food_image', size)
+
+    relative_dir = shard_dir(digest)
+    detail_path = os.path.join(upload_folder, relative_dir, rendition_filename(digest, 'detail'))
+    tmp_path = os.path.join(tmp_dir, f'{digest}.upload')
+    if os.path.exists(detail_path) or os.path.exists(tmp_path):
+        # Đã có (hoặc đang xử lý) ảnh cùng nội dung
+        os.remove(receiving_path)
+    else:
+        os.replace(receiving_path, tmp_path)
+        _executor(current_app.config.get('IMAGE_WORKERS', 2)).submit(
+            process_upload, tmp_path, os.path.join(upload_folder, relative_dir), digest
+        ).add_done_callback(_log_failure)
+
+    host = request.host_url.rstrip('/')
+    return f'{host}/static/uploads/{relative_dir}/{rendition_filename(digest, "detail")}'
+
+
+def _stream_to_file(stream, path, max_bytes=None):
+    """Ghi stream ra file, trả về (sha256 hex của nội dung, số byte)."""
+    written = 0
+    sha = hashlib.sha256()
+    try:
+        with open(path, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes and written > max_bytes:
+                    raise ValueError('Ảnh vượt quá dung lượng cho phép')
+                sha.update(chunk)
+                out.write(chunk)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    if written == 0:
+        os.remove(path)
+        raise ValueError('File ảnh rỗng')
+    return sha.hexdigest(), written
+
+
+# --- Worker (chạy trong process pool, không dùng app context) ---
+
+def process_upload(tmp_path, dest_dir, name):
+    """
+    Tạo các rendition (thumb / list / detail) dạng WebP từ file upload rồi xoá file tạm.
+    Mỗi file được ghi ra tên tạm rồi os.replace để client không bao giờ đọc phải file dở.
+    """
+    from PIL import Image, ImageOps
+
+    os.makedirs(dest_dir, exist_ok=True)
+    try:
+        with Image.open(tmp_path) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGB')
+            for rendition, size in sorted(RENDITIONS.items(), key=lambda r: r[1]):
+                copy = img.copy()
+                copy.thumbnail((size, size), Image.LANCZOS)
+                final_path = os.path.join(dest_dir, rendition_filename(name, rendition))
+                part_path = final_path + '.part'
+                copy.save(part_path, RENDITION_FORMAT.upper(), quality=RENDITION_QUALITY, method=4)
+                os.replace(part_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return name
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Xử lý ảnh upload thất bại: %s', error)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _executor(max_workers):
+    """Process pool tạo lười theo từng process (an toàn khi server fork worker)."""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+            _pool_pid = os.getpid()
+    return _pool
+
+
+# --- Xoá ---
+
+def delete_upload(image_url):
+    """
+    Xoá ảnh (và các rendition của nó) trong thư mục uploads.
+    Ảnh lưu theo hash có thể được nhiều món dùng chung nên không xoá ở đây;
+    file không còn được tham chiếu sẽ bị dọn bởi food/image_gc.py.
+    """
+    if not image_url:
+        return
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    relative = image_url.split('/static/uploads/', 1)[-1]
+    if is_content_addressed(relative):
+        return
+    filenames = {image_url.split('/')[-1]}
+    if is_rendition_name(image_url):
+        filenames.update(rendition_url(image_url, r).split('/')[-1] for r in RENDITIONS)
+    for filename in filenames:
+        # Không xóa nếu là ảnh mặc định
+        file_path = os.path.join(upload_folder, filename)
+        if not filename.startswith('default') and os.path.exists(file_path):
+            os.remove(file_path)
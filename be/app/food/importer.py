@@ -0,0 +1,286 @@
+"""
+Import danh mục món ăn (CSV / XLSX) vào food_items bằng COPY.
+
+    python food/importer.py food_nutrients_with_unsigned.xlsx
+    python food/importer.py catalog.csv --chunk-size 20000
+    python food/importer.py catalog.csv --restart      # bỏ tiến độ cũ, chạy lại từ đầu
+
+File được đọc dần theo chunk (không load cả file vào RAM). Mỗi chunk:
+COPY vào bảng tạm food_import_staging -> upsert vào food_items
+(khớp theo barcode, không có barcode thì theo tên đã chuẩn hoá) -> ghi tiến độ -> commit.
+Chạy lại cùng file sẽ tiếp tục từ chunk chưa xong; dữ liệu đã có chỉ bị cập nhật nếu khác.
+Cần chạy migrations/007_food_import.sql trước.
+Server đang chạy tự thấy các món mới / vừa sửa (cả barcode vừa nằm trong negative cache)
+sau tối đa FOOD_INDEX_CHECK_SECONDS nhờ updated_at (food/index_sync.py), không cần khởi động lại.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import sys
+import time
+
+# Cho phép import từ thư mục cha
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+from food.services import remove_vietnamese_accents
+
+# Cột của staging theo đúng thứ tự dùng trong COPY
+STAGING_COLUMNS = (
+    'import_id', 'row_no', 'name', 'name_unsigned', 'name_key', 'brand', 'barcode',
+    'serving_size', 'serving_unit', 'calories', 'protein_g', 'carbs_g', 'fat_g', 'image_url',
+)
+
+_COPY_SQL = 'COPY food_import_staging ({}) FROM STDIN WITH (FORMAT csv)'.format(', '.join(STAGING_COLUMNS))
+
+# Upsert 1 chunk. Trong chunk, mỗi khoá (barcode / tên) chỉ lấy dòng cuối cùng.
+# Chỉ cập nhật món dùng chung (is_custom = FALSE) và chỉ khi dữ liệu thực sự khác.
+_MERGE_SQL = text("""
+WITH src AS (
+    SELECT DISTINCT ON (COALESCE('b:' || barcode, 'n:' || name_key)) *
+    FROM food_import_staging
+    WHERE import_id = :import_id AND row_no > :after_row AND row_no <= :last_row
+    ORDER BY COALESCE('b:' || barcode, 'n:' || name_key), row_no DESC
+),
+matched AS (
+    SELECT s.row_no, f.food_item_id
+    FROM src s
+    JOIN LATERAL (
+        SELECT fi.food_item_id
+        FROM food_items fi
+        WHERE NOT fi.is_custom
+          AND (
+            (s.barcode IS NOT NULL AND fi.barcode = s.barcode)
+            OR (s.barcode IS NULL AND lower(fi.name_unsigned) = s.name_key)
+          )
+        ORDER BY fi.food_item_id
+        LIMIT 1
+    ) f ON TRUE
+),
+updated AS (
+    UPDATE food_items f
+    SET name = s.name,
+        name_unsigned = s.name_unsigned,
+        brand = s.brand,
+        serving_size = s.serving_size,
+        serving_unit = s.serving_unit,
+        calories = s.calories,
+        protein_g = s.protein_g,
+        carbs_g = s.carbs_g,
+        fat_g = s.fat_g,
+        image_url = COALESCE(s.image_url, f.image_url),
+        updated_at = now()
+    FROM matched m
+    JOIN src s ON s.row_no = m.row_no
+    WHERE f.food_item_id = m.food_item_id
+      AND (f.name, f.brand, f.serving_size, f.serving_unit, f.calories, f.protein_g, f.carbs_g, f.fat_g, f.image_url)
+          IS DISTINCT FROM
+          (s.name, s.brand, s.serving_size, s.serving_unit, s.calories, s.protein_g, s.carbs_g, s.fat_g,
+           COALESCE(s.image_url, f.image_url))
+    RETURNING f.food_item_id
+),
+inserted AS (
+    INSERT INTO food_items (name, name_unsigned, brand, barcode, serving_size, serving_unit,
+                            calories, protein_g, carbs_g, fat_g, image_url, is_custom, is_recipe)
+    SELECT s.name, s.name_unsigned, s.brand, s.barcode, s.serving_size, s.serving_unit,
+           s.calories, s.protein_g, s.carbs_g, s.fat_g, s.image_url, FALSE, FALSE
+    FROM src s
+    WHERE NOT EXISTS (SELECT 1 FROM matched m WHERE m.row_no = s.row_no)
+    ON CONFLICT (barcode) DO NOTHING
+    RETURNING food_item_id
+)
+SELECT (SELECT count(*) FROM inserted) AS inserted, (SELECT count(*) FROM updated) AS updated
+""")
+
+_CLEAR_CHUNK_SQL = text("""
+DELETE FROM food_import_staging
+WHERE import_id = :import_id AND row_no > :after_row AND row_no <= :last_row
+""")
+
+_SAVE_PROGRESS_SQL = text("""
+INSERT INTO food_import_progress (import_id, source, rows_done, inserted, updated, finished, updated_at)
+VALUES (:import_id, :source, :rows_done, :inserted, :updated, :finished, now())
+ON CONFLICT (import_id) DO UPDATE SET
+    rows_done = EXCLUDED.rows_done,
+    inserted = food_import_progress.inserted + EXCLUDED.inserted,
+    updated = food_import_progress.updated + EXCLUDED.updated,
+    finished = EXCLUDED.finished,
+    updated_at = now()
+""")
+
+
+# --- Đọc file theo dòng ---
+
+def iter_rows(path):
+    """Sinh ra dict theo từng dòng (header -> giá trị) cho CSV hoặc XLSX."""
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        yield from _iter_xlsx(path)
+    else:
+        yield from _iter_csv(path)
+
+
+def _iter_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def _iter_xlsx(path):
+    # openpyxl ở chế độ read_only đọc sheet theo luồng
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        wb.close()
+
+
+def file_fingerprint(path):
+    """Định danh của lần import: sha256 nội dung file (cùng file -> cùng import_id)."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+# --- Chuẩn hoá dòng ---
+
+def normalize_name(name):
+    return ' '.join(remove_vietnamese_accents(name.lower()).split())
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(value):
+    try:
+        return float(value) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def to_staging_row(import_id, row_no, row):
+    """Dòng file -> tuple theo STAGING_COLUMNS (None nếu dòng không có tên)."""
+    name = _text(row.get('name_vi')) or _text(row.get('name'))
+    if not name:
+        return None
+    name_unsigned = normalize_name(name)
+    barcode = _text(row.get('barcode'))
+    return (
+        import_id, row_no, name, name_unsigned, name_unsigned,
+        _text(row.get('brand')), barcode,
+        _number(row.get('serving_size')) or 100.0, _text(row.get('serving_unit')) or 'g',
+        _number(row.get('calories')), _number(row.get('protein_g')),
+        _number(row.get('carbs_g')), _number(row.get('fat_g')),
+        _text(row.get('image_url')),
+    )
+
+
+# --- Import ---
+
+def load_progress(import_id):
+    return db.session.execute(
+        text('SELECT rows_done, finished FROM food_import_progress WHERE import_id = :import_id'),
+        {'import_id': import_id},
+    ).first()
+
+
+def copy_chunk(rows):
+    """COPY các dòng vào staging qua kết nối psycopg2 của session hiện tại."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(['' if v is None else v for v in row])
+    buf.seek(0)
+    raw_cursor = db.session.connection().connection.cursor()
+    try:
+        raw_cursor.copy_expert(_COPY_SQL, buf)
+    finally:
+        raw_cursor.close()
+
+
+def import_file(path, chunk_size=10000, restart=False, require_image=False):
+    import_id = file_fingerprint(path)
+    source = os.path.basename(path)
+    progress = load_progress(import_id)
+    if restart and progress:
+        db.session.execute(text('DELETE FROM food_import_progress WHERE import_id = :id'), {'id': import_id})
+        db.session.commit()
+        progress = None
+    if progress and progress.finished:
+        print(f"✅ {source} đã được import trước đó (import_id={import_id[:12]}).")
+        return
+
+    resume_after = progress.rows_done if progress else 0
+    if resume_after:
+        print(f"↻ Tiếp tục từ dòng {resume_after}.")
+    # Dọn phần staging còn sót của lần chạy bị ngắt
+    db.session.execute(_CLEAR_CHUNK_SQL, {'import_id': import_id, 'after_row': resume_after, 'last_row': 2 ** 62})
+    db.session.commit()
+
+    started = time.perf_counter()
+    totals = {'inserted': 0, 'updated': 0}
+    chunk, after_row, row_no = [], resume_after, 0
+
+    def flush(last_row, finished=False):
+        if chunk:
+            copy_chunk(chunk)
+        params = {'import_id': import_id, 'after_row': after_row, 'last_row': last_row}
+        result = db.session.execute(_MERGE_SQL, params).one() if chunk else None
+        inserted = result.inserted if result else 0
+        updated = result.updated if result else 0
+        db.session.execute(_CLEAR_CHUNK_SQL, params)
+        db.session.execute(_SAVE_PROGRESS_SQL, {
+            'import_id': import_id, 'source': source, 'rows_done': last_row,
+            'inserted': inserted, 'updated': updated, 'finished': finished,
+        })
+        db.session.commit()
+        totals['inserted'] += inserted
+        totals['updated'] += updated
+        rate = (last_row - resume_after) / max(time.perf_counter() - started, 1e-6)
+        print(f"  dòng {last_row}: +{totals['inserted']} mới, ~{totals['updated']} cập nhật ({rate:.0f} dòng/s)")
+
+    for row_no, row in enumerate(iter_rows(path), start=1):
+        if row_no <= resume_after:
+            continue
+        if require_image and not _text(row.get('image_url')):
+            continue
+        staged = to_staging_row(import_id, row_no, row)
+        if staged is not None:
+            chunk.append(staged)
+        if row_no - after_row >= chunk_size:
+            flush(row_no)
+            chunk, after_row = [], row_no
+
+    flush(max(row_no, after_row), finished=True)
+    db.session.execute(text('ANALYZE food_items'))
+    db.session.commit()
+    print(f"✅ Đã import {source}: {totals['inserted']} món mới, {totals['updated']} món cập nhật.")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', help='File CSV hoặc XLSX')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--restart', action='store_true', help='Bỏ tiến độ đã lưu và import lại từ đầu')
+    parser.add_argument('--require-image', action='store_true', help='Chỉ import các dòng có image_url')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        import_file(args.path, args.chunk_size, args.restart, args.require_image)
+
+
+if __name__ == "__main__":
+    main()
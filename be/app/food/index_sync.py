@@ -0,0 +1,134 @@
+import threading
+import time
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import func
+from extensions import db
+from food.models import FoodItem, FoodItemDeletion
+from food.barcode_index import barcode_index
+from food.search_index import food_index
+
+# Lấy lại cả các dòng có updated_at cũ hơn mốc đã thấy một chút: updated_at = now() là thời điểm
+# BẮT ĐẦU transaction, transaction commit muộn có thể mang updated_at nhỏ hơn mốc lần trước.
+DELTA_OVERLAP = timedelta(minutes=5)
+# Trigger ở migrations/010_food_item_deletions.sql chỉ giữ id món bị xoá trong khoảng này:
+# process không đồng bộ lâu hơn thì không biết đủ các món đã xoá, phải dựng lại index.
+FOOD_DELETION_RETENTION = timedelta(days=1)
+
+
+class FoodIndexSync:
+    """
+    Giữ index tìm kiếm và index barcode trong RAM (mỗi process 1 bản) khớp với bảng food_items.
+
+    Tối đa mỗi FOOD_INDEX_CHECK_SECONDS giây đọc version (count, max(updated_at), max(id),
+    max(deleted_at) của food_item_deletions); khi version đổi thì nạp các dòng mới sửa (delta)
+    và gỡ các món mới bị xoá khỏi các index đã dựng.
+    Nhờ vậy thay đổi từ worker khác, importer, recompute công thức đều được thấy sau tối đa 1 chu kỳ;
+    barcode vừa được import cũng được gỡ khỏi negative cache.
+    Dựng lại toàn bộ (lần đầu bảng còn rỗng, hoặc lâu quá FOOD_DELETION_RETENTION chưa đồng bộ)
+    chạy ở thread nền, request vẫn dùng index hiện tại trong lúc đó.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._synced_at = 0.0
+
+    def mark_built(self):
+        """Ghi nhận version hiện tại ngay sau khi index được dựng lúc khởi động (gọi trong app context)."""
+        with self._lock:
+            self._version = self._read_version()
+            self._checked_at = self._synced_at = time.monotonic()
+
+    def check(self):
+        ttl = current_app.config.get('FOOD_INDEX_CHECK_SECONDS', 15)
+        if time.monotonic() - self._checked_at < ttl:
+            return
+        # Request khác đang kiểm tra thì dùng index hiện tại, không chờ
+        if not self._lock.acquire(blocking=False):
+            return
+        rebuilding = False
+        try:
+            version = self._read_version()
+            self._checked_at = time.monotonic()
+            if version == self._version:
+                self._synced_at = self._checked_at
+                return
+            stale = self._checked_at - self._synced_at > (FOOD_DELETION_RETENTION - DELTA_OVERLAP).total_seconds()
+            if self._version is None or self._version[1] is None or stale:
+                self._start_rebuild(version)
+                rebuilding = True
+                return
+            self._apply_delta(self._version[1] - DELTA_OVERLAP)
+            self._apply_deletions(self._version[3] - DELTA_OVERLAP if self._version[3] else None)
+            self._version = version
+            self._synced_at = self._checked_at
+        finally:
+            # Thread dựng lại giữ lock tới khi xong
+            if not rebuilding:
+                self._lock.release()
+
+    def _start_rebuild(self, version):
+        app = current_app._get_current_object()
+        threading.Thread(
+            target=self._rebuild_in_background, args=(app, version), name='food-index-rebuild', daemon=True,
+        ).start()
+
+    def _rebuild_in_background(self, app, version):
+        try:
+            with app.app_context():
+                try:
+                    self._rebuild_locked(version)
+                finally:
+                    db.session.remove()
+        finally:
+            self._lock.release()
+
+    def _rebuild_locked(self, version):
+        # Chỉ dựng lại index đã được bật lúc khởi động
+        if food_index.ready:
+            food_index.build()
+        if barcode_index.ready:
+            barcode_index.build()
+        self._version = version
+        self._checked_at = self._synced_at = time.monotonic()
+
+    def _apply_delta(self, since):
+        if not (food_index.ready or barcode_index.ready):
+            return
+        rows = (
+            db.session.query(FoodItem.food_item_id, FoodItem.name, FoodItem.name_unsigned,
+                             FoodItem.is_custom, FoodItem.created_by, FoodItem.barcode)
+            .filter(FoodItem.updated_at >= since)
+            .yield_per(1000)
+        )
+        indexes = [index for index in (food_index, barcode_index) if index.ready]
+        for row in rows:
+            for index in indexes:
+                index.upsert(row)
+
+    def _apply_deletions(self, since):
+        indexes = [index for index in (food_index, barcode_index) if index.ready]
+        if not indexes:
+            return
+        query = db.session.query(FoodItemDeletion.food_item_id)
+        if since is not None:
+            query = query.filter(FoodItemDeletion.deleted_at >= since)
+        for (food_item_id,) in query.yield_per(1000):
+            for index in indexes:
+                index.remove(food_item_id)
+
+    @staticmethod
+    def _read_version():
+        row = db.session.query(
+            func.count(FoodItem.food_item_id),
+            func.max(FoodItem.updated_at),
+            func.max(FoodItem.food_item_id),
+            db.session.query(func.max(FoodItemDeletion.deleted_at)).scalar_subquery(),
+        ).one()
+        return tuple(row)
+
+
+food_index_sync = FoodIndexSync()
@@ -28,3 +28,20 @@ class FoodItemIngredient(db.Model):
     ingredient_id = db.Column(db.BigInteger, db.ForeignKey('food_items.food_item_id'), nullable=False)
     quantity = db.Column(db.Numeric(8, 2), nullable=False)
     unit = db.Column(db.String(20), nullable=False, default='g')
+
+
+class BarcodeScan(db.Model):
+    __tablename__ = 'barcode_scans'
+    scan_id = db.Column(db.BigInteger, primary_key=True)
+    user_id = db.Column(db.BigInteger, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
+    barcode = db.Column(db.String(50), nullable=False)
+    food_item_id = db.Column(db.BigInteger, db.ForeignKey('food_items.food_item_id'))
+    scanned_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), nullable=False)
+
+
+class FoodItemDeletion(db.Model):
+    """Id của món đã bị xoá, do trigger ghi (migrations/010_food_item_deletions.sql)."""
+    __tablename__ = 'food_item_deletions'
+    # Bảng không có khoá chính: cặp (id, thời điểm xoá) đủ để ORM định danh dòng
+    food_item_id = db.Column(db.BigInteger, primary_key=True)
+    deleted_at = db.Column(db.DateTime(timezone=True), primary_key=True, server_default=db.func.now())
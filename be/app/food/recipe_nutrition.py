@@ -0,0 +1,112 @@
+import numpy as np
+from food.models import FoodItem
+
+# Đơn vị -> (nhóm, hệ số quy về đơn vị gốc của nhóm: g / ml / cái)
+UNIT_FACTORS = {
+    'g': ('mass', 1.0),
+    'gram': ('mass', 1.0),
+    'kg': ('mass', 1000.0),
+    'mg': ('mass', 0.001),
+    'oz': ('mass', 28.3495),
+    'lb': ('mass', 453.592),
+    'ml': ('volume', 1.0),
+    'l': ('volume', 1000.0),
+    'tsp': ('volume', 5.0),
+    'tbsp': ('volume', 15.0),
+    'cup': ('volume', 240.0),
+    'piece': ('count', 1.0),
+    'pc': ('count', 1.0),
+    'cái': ('count', 1.0),
+    'quả': ('count', 1.0),
+    'lát': ('count', 1.0),
+}
+
+# Đơn vị tính theo khẩu phần của chính món nguyên liệu
+SERVING_UNITS = {'serving', 'khẩu phần', 'phần'}
+
+# Thứ tự cột dinh dưỡng dùng cho phép nhân ma trận
+NUTRIENT_FIELDS = ('calories', 'protein_g', 'carbs_g', 'fat_g')
+
+
+def normalize_unit(unit):
+    return (unit or 'g').strip().lower()
+
+
+def servings_for(quantity, unit, food):
+    """
+    Đổi lượng nguyên liệu (quantity + unit) thành số khẩu phần của FoodItem.
+
+    - unit là 'serving' -> chính là số khẩu phần.
+    - cùng nhóm với serving_unit của món (g/kg/mg, ml/l, cái...) -> quy đổi theo hệ số.
+    - khối lượng <-> thể tích: coi tỷ trọng = 1 (1 ml ~ 1 g).
+    - đơn vị không nhận ra -> quantity / serving_size như cách tính cũ.
+    """
+    quantity = float(quantity)
+    unit = normalize_unit(unit)
+    serving_size = float(food.serving_size or 0) or 1.0
+    if unit in SERVING_UNITS:
+        return quantity
+
+    source = UNIT_FACTORS.get(unit)
+    target = UNIT_FACTORS.get(normalize_unit(food.serving_unit))
+    if source is None or target is None:
+        return quantity / serving_size
+
+    source_kind, source_factor = source
+    target_kind, target_factor = target
+    liquid_or_solid = {source_kind, target_kind} == {'mass', 'volume'}
+    if source_kind != target_kind and not liquid_or_solid:
+        return quantity / serving_size
+    return (quantity * source_factor) / (serving_size * target_factor)
+
+
+def load_ingredient_foods(ingredient_ids):
+    """Lấy tất cả FoodItem nguyên liệu trong 1 truy vấn IN. Trả về dict id -> FoodItem."""
+    ids = {int(i) for i in ingredient_ids}
+    if not ids:
+        return {}
+    foods = FoodItem.query.filter(FoodItem.food_item_id.in_(ids)).all()
+    return {f.food_item_id: f for f in foods}
+
+
+def compute_recipe_totals(ingredients, foods):
+    """
+    Tổng dinh dưỡng của công thức.
+    ingredients: list (ingredient_id, quantity, unit); foods: dict id -> FoodItem.
+    Nguyên liệu không có trong `foods` bị bỏ qua.
+    Trả về dict calories / protein_g / carbs_g / fat_g (float).
+    """
+    rows = [(foods[i], q, u) for i, q, u in ingredients if i in foods]
+    if not rows:
+        return {field: 0.0 for field in NUTRIENT_FIELDS}
+
+    servings = np.array([servings_for(q, u, food) for food, q, u in rows], dtype=float)
+    nutrients = np.array(
+        [[float(getattr(food, field) or 0) for field in NUTRIENT_FIELDS] for food, _, _ in rows],
+        dtype=float,
+    )
+    totals = servings @ nutrients
+    return {field: round(float(value), 2) for field, value in zip(NUTRIENT_FIELDS, totals)}
+
+
+def apply_recipe_totals(recipe, totals):
+    for field in NUTRIENT_FIELDS:
+        setattr(recipe, field, totals[field])
+
+
+def parse_ingredients(raw_ingredients):
+    """
+    Chuẩn hoá danh sách nguyên liệu từ request thành list (ingredient_id, quantity, unit).
+    """
+    parsed = []
+    for ing in raw_ingredients:
+        try:
+            ingredient_id = int(ing['food_item_id'])
+            quantity = float(ing['quantity'])
+            unit = ing.get('unit', 'g')
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Dữ liệu nguyên liệu không hợp lệ')
+        if quantity <= 0:
+            raise ValueError('Số lượng nguyên liệu phải > 0')
+        parsed.append((ingredient_id, quantity, unit))
+    return parsed
@@ -0,0 +1,118 @@
+from collections import defaultdict
+from sqlalchemy import text
+from extensions import db
+from food.recipe_nutrition import SERVING_UNITS, UNIT_FACTORS
+
+# Giới hạn độ sâu lồng công thức (chặn vòng lặp dữ liệu xấu)
+MAX_RECIPE_DEPTH = 16
+
+# Chỉ mục ngược nguyên liệu -> công thức, đi theo food_item_ingredients(ingredient_id).
+# depth = đường dài nhất từ món bị sửa tới công thức => cập nhật theo depth tăng dần
+# là thứ tự topo (mọi công thức con bị ảnh hưởng đều có depth nhỏ hơn).
+_DEPENDENTS_SQL = text("""
+WITH RECURSIVE deps(recipe_id, depth, path) AS (
+    SELECT fi.recipe_id, 1, ARRAY[fi.ingredient_id, fi.recipe_id]
+    FROM food_item_ingredients fi
+    WHERE fi.ingredient_id = ANY(CAST(:food_ids AS BIGINT[]))
+    UNION ALL
+    SELECT fi.recipe_id, d.depth + 1, d.path || fi.recipe_id
+    FROM deps d
+    JOIN food_item_ingredients fi ON fi.ingredient_id = d.recipe_id
+    WHERE fi.recipe_id <> ALL(d.path) AND d.depth < :max_depth
+)
+SELECT recipe_id, MAX(depth) AS depth
+FROM deps
+GROUP BY recipe_id
+""")
+
+# Tính lại tổng dinh dưỡng cho 1 tầng công thức bằng 1 câu UPDATE.
+# Quy đổi đơn vị giống recipe_nutrition.servings_for (bảng đơn vị truyền vào dạng mảng).
+_RECOMPUTE_SQL = text("""
+WITH units AS (
+    SELECT * FROM unnest(
+        CAST(:unit_names AS TEXT[]), CAST(:unit_kinds AS TEXT[]), CAST(:unit_factors AS FLOAT8[])
+    ) AS u(unit, kind, factor)
+),
+lines AS (
+    SELECT fi.recipe_id, f.calories, f.protein_g, f.carbs_g, f.fat_g,
+           CASE
+             WHEN lower(trim(fi.unit)) = ANY(CAST(:serving_units AS TEXT[])) THEN fi.quantity::float8
+             WHEN su.kind IS NOT NULL AND tu.kind IS NOT NULL
+                  AND (su.kind = tu.kind OR (su.kind IN ('mass', 'volume') AND tu.kind IN ('mass', 'volume')))
+               THEN fi.quantity * su.factor / (COALESCE(NULLIF(f.serving_size, 0), 1) * tu.factor)
+             ELSE fi.quantity / COALESCE(NULLIF(f.serving_size, 0), 1)
+           END AS servings
+    FROM food_item_ingredients fi
+    JOIN food_items f ON f.food_item_id = fi.ingredient_id
+    LEFT JOIN units su ON su.unit = lower(trim(fi.unit))
+    LEFT JOIN units tu ON tu.unit = lower(trim(f.serving_unit))
+    WHERE fi.recipe_id = ANY(CAST(:recipe_ids AS BIGINT[]))
+),
+-- Công thức không còn nguyên liệu nào (nguyên liệu cuối cùng bị xoá) có tổng = 0
+totals AS (
+    SELECT ids.recipe_id,
+           COALESCE(ROUND(SUM(servings * COALESCE(calories, 0))::numeric, 2), 0)  AS calories,
+           COALESCE(ROUND(SUM(servings * COALESCE(protein_g, 0))::numeric, 2), 0) AS protein_g,
+           COALESCE(ROUND(SUM(servings * COALESCE(carbs_g, 0))::numeric, 2), 0)   AS carbs_g,
+           COALESCE(ROUND(SUM(servings * COALESCE(fat_g, 0))::numeric, 2), 0)     AS fat_g
+    FROM unnest(CAST(:recipe_ids AS BIGINT[])) AS ids(recipe_id)
+    LEFT JOIN lines ON lines.recipe_id = ids.recipe_id
+    GROUP BY ids.recipe_id
+)
+UPDATE food_items r
+SET calories = t.calories,
+    protein_g = t.protein_g,
+    carbs_g = t.carbs_g,
+    fat_g = t.fat_g,
+    updated_at = now()
+FROM totals t
+WHERE r.food_item_id = t.recipe_id
+  AND (r.calories, r.protein_g, r.carbs_g, r.fat_g)
+      IS DISTINCT FROM (t.calories, t.protein_g, t.carbs_g, t.fat_g)
+""")
+
+
+def find_dependent_recipes(food_ids):
+    """
+    Các công thức dùng (trực tiếp hoặc lồng nhau) những món trong food_ids.
+    Trả về dict recipe_id -> depth.
+    """
+    food_ids = [int(i) for i in food_ids]
+    if not food_ids:
+        return {}
+    rows = db.session.execute(
+        _DEPENDENTS_SQL, {'food_ids': food_ids, 'max_depth': MAX_RECIPE_DEPTH}
+    )
+    return {row.recipe_id: row.depth for row in rows}
+
+
+def recompute_dependent_recipes(food_ids, dependents=None):
+    """
+    Cập nhật lại calories/macros của mọi công thức phụ thuộc vào food_ids sau khi các món này bị sửa.
+    Mỗi tầng (depth) là 1 câu UPDATE set-based; chạy trong transaction hiện tại (không commit).
+    dependents: kết quả find_dependent_recipes lấy trước khi xoá món (dòng nguyên liệu bị xoá theo).
+    Trả về danh sách recipe_id đã xét.
+    """
+    db.session.flush()
+    if dependents is None:
+        dependents = find_dependent_recipes(food_ids)
+    if not dependents:
+        return []
+
+    levels = defaultdict(list)
+    for recipe_id, depth in dependents.items():
+        levels[depth].append(recipe_id)
+
+    units = sorted(UNIT_FACTORS.items())
+    params = {
+        'unit_names': [name for name, _ in units],
+        'unit_kinds': [kind for _, (kind, _) in units],
+        'unit_factors': [factor for _, (_, factor) in units],
+        'serving_units': sorted(SERVING_UNITS),
+    }
+    for depth in sorted(levels):
+        db.session.execute(_RECOMPUTE_SQL, {**params, 'recipe_ids': levels[depth]})
+
+    # Các object FoodItem đang nằm trong session có thể đã cũ
+    db.session.expire_all()
+    return list(dependents)
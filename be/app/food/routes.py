@@ -3,17 +3,21 @@ import traceback
 
 import requests
 from extensions import db
-from flask import Blueprint, g, jsonify, request
+from flask import Blueprint, current_app, g, jsonify, request
 from auth.decorators import firebase_required
+from db_routing import replica_read
 from food.services import (
     create_custom_food_service,
     create_recipe_service,
     delete_custom_food_service,
+    get_food_by_barcode,
     get_my_foods,
     search_food_items,
     update_custom_food_service
 )
 from food.models import FoodItem
+from food.scan_log import scan_recorder
+from http_cache import PRIVATE_REVALIDATE, PUBLIC_CACHE, conditional_json, make_etag
 
 # Blueprint định nghĩa các route bắt đầu với /api/v1/foods
 food_bp = Blueprint('food', __name__, url_prefix='/api/v1/foods')
@@ -22,12 +26,46 @@ food_bp = Blueprint('food', __name__, url_prefix='/api/v1/foods')
 
 @food_bp.route('/<int:food_id>', methods=['GET'])
 @firebase_required()
+@replica_read
 def get_food_by_id(food_id):
     """
     API lấy chi tiết 1 món ăn theo ID.
     Chỉ dùng để đọc dữ liệu món ăn.
+    Hỗ trợ If-None-Match: chỉ đọc updated_at để so ETag, khớp thì trả 304.
+    """
+    version = (
+        db.session.query(FoodItem.updated_at, FoodItem.is_custom)
+        .filter(FoodItem.food_item_id == food_id)
+        .first()
+    )
+    if not version:
+        return jsonify({'error': 'Food item not found'}), 404
+
+    if version.is_custom:
+        cache_control = PRIVATE_REVALIDATE
+    else:
+        cache_control = PUBLIC_CACHE.format(max_age=current_app.config['FOOD_CACHE_MAX_AGE'])
+
+    from food.services import food_to_dict
+    return conditional_json(
+        make_etag('food', food_id, version.updated_at),
+        lambda: food_to_dict(FoodItem.query.get(food_id)),
+        cache_control,
+    )
+
+@food_bp.route('/barcode/<string:code>', methods=['GET'])
+@firebase_required()
+def get_food_by_barcode_route(code):
+    """
+    API tra cứu món ăn theo mã vạch.
+    Mỗi lần quét được ghi vào barcode_scans ở background (kể cả khi không tìm thấy).
     """
-    food = FoodItem.query.get(food_id)
+    code = code.strip()
+    if not code or len(code) > 50:
+        return jsonify({'error': 'Invalid barcode'}), 400
+    user_id = g.current_user.user_id
+    food = get_food_by_barcode(code, user_id)
+    scan_recorder.record(user_id, code, food.food_item_id if food else None)
     if not food:
         return jsonify({'error': 'Food item not found'}), 404
     from food.services import food_to_dict
@@ -35,6 +73,7 @@ def get_food_by_id(food_id):
 
 @food_bp.route('/', methods=['GET'])
 @firebase_required()
+@replica_read
 def search_foods():
     """
     API tìm kiếm món ăn theo tên (có hỗ trợ bỏ dấu).
@@ -88,14 +127,28 @@ def create_recipe():
 
 @food_bp.route('/my-foods', methods=['GET'])
 @firebase_required()
+@replica_read
 def my_foods():
     """
     API lấy danh sách món tự tạo của người dùng.
+    Query: limit (mặc định 10), cursor (từ header X-Next-Cursor của trang trước),
+    is_recipe=true|false (tuỳ chọn).
     """
     user_id = g.current_user.user_id
-    limit = int(request.args.get('limit', 10))
-    result = get_my_foods(user_id, limit)
-    return jsonify(result)
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        is_recipe = request.args.get('is_recipe')
+        if is_recipe is not None:
+            is_recipe = is_recipe.lower() == 'true'
+        result, next_cursor = get_my_foods(
+            user_id, limit, cursor=request.args.get('cursor'), is_recipe=is_recipe
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify(result)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @food_bp.route('/<int:food_id>/update', methods=['PUT'])
 @firebase_required()
@@ -133,6 +186,7 @@ def delete_custom_food(food_id):
     
 @food_bp.route('/recipes/<int:recipe_id>/ingredients', methods=['GET'])
 @firebase_required()
+@replica_read
 def get_recipe_ingredients(recipe_id):
     """
     API trả về danh sách nguyên liệu của 1 recipe cụ thể.
@@ -175,9 +229,14 @@ def get_favorite_foods():
         user_id = g.current_user.user_id
         data = request.get_json()
         favorite_ids = data.get("favorite_ids", [])
-        from food.services import get_favorite_foods_service
-        foods = get_favorite_foods_service(favorite_ids, user_id)
-        return jsonify(foods), 200
+        from food.services import get_favorite_foods_service, get_favorite_foods_version
+        # ETag theo danh sách (id, updated_at) của các món, khớp If-None-Match thì trả 304
+        etag = make_etag('favorites', get_favorite_foods_version(favorite_ids, user_id))
+        return conditional_json(
+            etag,
+            lambda: get_favorite_foods_service(favorite_ids, user_id),
+            PRIVATE_REVALIDATE,
+        )
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({'error': str(e)}), 400
\ No newline at end of file
@@ -0,0 +1,104 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from extensions import db
+from food.models import BarcodeScan
+
+logger = logging.getLogger(__name__)
+
+
+class ScanRecorder:
+    """
+    Ghi lịch sử quét barcode (barcode_scans) ở background.
+    record() chỉ đưa vào hàng đợi trong RAM; 1 thread nền gom tối đa `batch_size` dòng
+    hoặc chờ tối đa `flush_interval` giây rồi INSERT hàng loạt trong 1 câu lệnh.
+    Hàng đợi đầy thì bỏ bớt bản ghi (không làm chậm request).
+    """
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._app = None
+        self._queue = None
+        self._lock = threading.Lock()
+        self._worker_pid = None
+
+    def init_app(self, app):
+        self._app = app
+        self.batch_size = app.config.get('BARCODE_SCAN_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('BARCODE_SCAN_FLUSH_SECONDS', self.flush_interval)
+
+    def record(self, user_id, barcode, food_item_id=None):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait({
+                'user_id': user_id,
+                'barcode': barcode,
+                'food_item_id': food_item_id,
+                'scanned_at': datetime.now(timezone.utc),
+            })
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Ghi ngay mọi bản ghi đang chờ (dùng khi tắt process)."""
+        if self._queue is None or self._worker_pid != os.getpid():
+            return
+        rows = self._drain()
+        while rows:
+            self._write(rows)
+            rows = self._drain()
+
+    def _ensure_worker(self):
+        # Thread nền tạo lười theo từng process (an toàn khi server fork worker)
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._worker_pid = os.getpid()
+            threading.Thread(target=self._run, name='barcode-scan-writer', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            rows = [first] + self._drain(self.batch_size - 1)
+            self._write(rows)
+
+    def _drain(self, limit=None):
+        rows = []
+        limit = self.batch_size if limit is None else limit
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows):
+        if not rows or self._app is None:
+            return
+        with self._app.app_context():
+            try:
+                db.session.execute(insert(BarcodeScan.__table__), rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error('Ghi %d barcode_scans thất bại: %s', len(rows), e)
+            finally:
+                db.session.remove()
+
+
+scan_recorder = ScanRecorder()
@@ -0,0 +1,162 @@
+import heapq
+import threading
+import unicodedata
+from collections import defaultdict
+
+from food.models import FoodItem
+
+# Mỗi token được đệm 2 khoảng trắng đầu + 1 khoảng trắng cuối (giống pg_trgm)
+# để truy vấn 1-2 ký tự vẫn sinh ra trigram và tiền tố được ưu tiên.
+NGRAM_SIZE = 3
+
+
+def fold_text(text):
+    """
+    Chuẩn hoá tên để đánh index: chữ thường, bỏ dấu tiếng Việt, đ -> d.
+    """
+    text = unicodedata.normalize('NFD', (text or '').lower())
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    return text.replace('đ', 'd')
+
+
+def extract_ngrams(folded):
+    """
+    Tách chuỗi đã chuẩn hoá thành tập trigram theo từng từ.
+    """
+    grams = set()
+    for word in folded.split():
+        padded = '  ' + word + ' '
+        for i in range(len(padded) - NGRAM_SIZE + 1):
+            grams.add(padded[i:i + NGRAM_SIZE])
+    return grams
+
+
+class FoodSearchIndex:
+    """
+    Inverted index trigram trong bộ nhớ cho tên món ăn (đã bỏ dấu).
+
+    Mỗi document là 1 FoodItem: lưu tên đã chuẩn hoá, tập trigram và
+    chủ sở hữu (None với món mặc định) để áp dụng luật hiển thị khi tìm kiếm.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(set)   # trigram -> {food_item_id}
+        self._docs = {}                      # food_item_id -> (folded, grams, owner_id)
+        self.ready = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    def build(self, batch_size=5000):
+        """
+        Dựng lại toàn bộ index từ bảng food_items (gọi trong app context).
+        """
+        postings = defaultdict(set)
+        docs = {}
+        rows = (
+            FoodItem.query
+            .with_entities(FoodItem.food_item_id, FoodItem.name, FoodItem.name_unsigned,
+                           FoodItem.is_custom, FoodItem.created_by)
+            .yield_per(batch_size)
+        )
+        for food_id, name, name_unsigned, is_custom, created_by in rows:
+            folded, grams = self._analyze(name, name_unsigned)
+            docs[food_id] = (folded, grams, created_by if is_custom else None)
+            for gram in grams:
+                postings[gram].add(food_id)
+
+        with self._lock:
+            self._postings = postings
+            self._docs = docs
+            self.ready = True
+
+    def upsert(self, food):
+        """
+        Thêm mới hoặc cập nhật 1 món trong index (sau khi tạo/sửa).
+        """
+        folded, grams = self._analyze(food.name, food.name_unsigned)
+        owner = food.created_by if food.is_custom else None
+        with self._lock:
+            self._remove_locked(food.food_item_id)
+            self._docs[food.food_item_id] = (folded, grams, owner)
+            for gram in grams:
+                self._postings[gram].add(food.food_item_id)
+
+    def remove(self, food_id):
+        with self._lock:
+            self._remove_locked(food_id)
+
+    def search(self, query, user_id=None, limit=15):
+        """
+        Trả về list food_item_id đã xếp hạng (tốt nhất trước).
+
+        Điểm = độ tương đồng trigram (Jaccard); món có chứa nguyên chuỗi
+        truy vấn (hành vi ILIKE cũ) luôn được xếp trước, tiền tố được cộng thêm.
+        Chỉ trả về món mặc định và món custom của chính user_id.
+        """
+        q_folded = ' '.join(fold_text(query).split())
+        q_grams = extract_ngrams(q_folded)
+        if not q_grams:
+            return []
+
+        with self._lock:
+            hits = defaultdict(int)
+            for gram in q_grams:
+                for food_id in self._postings.get(gram, ()):
+                    hits[food_id] += 1
+
+            scored = []
+            for food_id, shared in hits.items():
+                folded, grams, owner = self._docs[food_id]
+                if user_id is not None and owner is not None and owner != user_id:
+                    continue
+                score = shared / (len(q_grams) + len(grams) - shared)
+                position = folded.find(q_folded)
+                if position == 0:
+                    score += 2.0
+                elif position > 0:
+                    score += 1.0
+                # -food_id: cùng điểm thì ưu tiên id nhỏ để kết quả ổn định
+                scored.append((score, -food_id))
+
+        return [-neg_id for _, neg_id in heapq.nlargest(limit, scored)]
+
+    # --- internal ---
+
+    @staticmethod
+    def _analyze(name, name_unsigned):
+        folded = ' '.join(fold_text(name_unsigned or name).split())
+        grams = extract_ngrams(folded)
+        # Tên có dấu có thể khác name_unsigned (dữ liệu cũ), gộp cả hai
+        if name_unsigned:
+            grams |= extract_ngrams(fold_text(name))
+        return folded, grams
+
+    def _remove_locked(self, food_id):
+        doc = self._docs.pop(food_id, None)
+        if doc is None:
+            return
+        for gram in doc[1]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(food_id)
+                if not ids:
+                    del self._postings[gram]
+
+
+food_index = FoodSearchIndex()
+
+
+def init_food_index(app):
+    """
+    Dựng index tìm kiếm món ăn khi khởi động ứng dụng.
+    Chỉ dựng khi FOOD_SEARCH_BACKEND='memory' để không tốn RAM ở các backend khác.
+    Sau đó index được đồng bộ theo version của bảng (food/index_sync.py).
+    """
+    if app.config.get('FOOD_SEARCH_BACKEND', 'memory') != 'memory':
+        return
+    from food.index_sync import food_index_sync
+    with app.app_context():
+        food_index.build()
+        food_index_sync.mark_built()
@@ -1,12 +1,23 @@
-import os
 import unicodedata
-import uuid
-from flask import current_app, json, request
+from datetime import datetime
+from flask import current_app, json
 import requests
-from sqlalchemy import or_
-from werkzeug.utils import secure_filename
+from sqlalchemy import func, literal, or_, tuple_
 from extensions import db
 from food.models import FoodItem, FoodItemIngredient
+from food.index_sync import food_index_sync
+from food.search_index import fold_text, food_index
+from food.barcode_index import barcode_index
+from food.images import delete_upload, rendition_url, save_upload
+from pagination import decode_cursor, encode_cursor
+from food.recipe_nutrition import (
+    apply_recipe_totals,
+    compute_recipe_totals,
+    load_ingredient_foods,
+    parse_ingredients
+)
+from food.recipe_rollup import find_dependent_recipes, recompute_dependent_recipes
+from summary.services import refresh_daily_summaries_for_foods
 
 # --- HELPER ---
 
@@ -20,18 +31,11 @@ def remove_vietnamese_accents(text):
 def save_food_image(image_file):
     """
     Lưu ảnh món ăn và trả về URL ảnh.
+    Ảnh được ghi theo chunk và xử lý nền thành các rendition (xem food/images.py).
     """
     if not image_file:
         return None
-    filename = secure_filename(image_file.filename)
-    ext = filename.rsplit('.', 1)[-1]
-    unique_filename = f"{uuid.uuid4().hex}.{ext}"
-    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'static/uploads')
-    os.makedirs(upload_folder, exist_ok=True)
-    img_path = os.path.join(upload_folder, unique_filename)
-    image_file.save(img_path)
-    host = request.host_url.rstrip('/')
-    return f'{host}/static/uploads/{unique_filename}'
+    return save_upload(image_file)
 
 def food_to_dict(food, is_recipe=None):
     """
@@ -51,6 +55,8 @@ def food_to_dict(food, is_recipe=None):
         'serving_unit': food.serving_unit,
         'is_custom': food.is_custom,
         'image_url': food.image_url,
+        'image_thumb_url': rendition_url(food.image_url, 'thumb'),
+        'image_list_url': rendition_url(food.image_url, 'list'),
     }
 
 # --- SERVICE ---
@@ -59,7 +65,32 @@ def search_food_items(query, user_id=None, limit=15):
     """
     Tìm kiếm món ăn theo tên hoặc không dấu.
     Bao gồm món mặc định và món custom của user.
+    Backend chọn qua Config.FOOD_SEARCH_BACKEND:
+      - 'memory': index trigram trong bộ nhớ (fallback ILIKE nếu index chưa dựng)
+      - 'pg_trgm': xếp hạng similarity trong Postgres (GIN trigram index)
+      - 'ilike': truy vấn ILIKE cũ, không xếp hạng
     """
+    backend = current_app.config.get('FOOD_SEARCH_BACKEND', 'memory')
+    if backend == 'pg_trgm':
+        return _search_food_items_pg_trgm(query, user_id, limit)
+    if backend != 'memory' or not food_index.ready:
+        return _search_food_items_ilike(query, user_id, limit)
+    # Thay đổi từ process khác (worker khác, importer, recompute công thức)
+    food_index_sync.check()
+    ids = food_index.search(query, user_id, limit)
+    if not ids:
+        return []
+    foods = FoodItem.query.filter(FoodItem.food_item_id.in_(ids)).all()
+    id_to_food = {food.food_item_id: food for food in foods}
+    return [id_to_food[fid] for fid in ids if fid in id_to_food]
+
+def _visible_to(user_id):
+    return or_(
+        FoodItem.is_custom == False,
+        (FoodItem.is_custom == True) & (FoodItem.created_by == user_id)
+    )
+
+def _search_food_items_ilike(query, user_id=None, limit=15):
     query_unsigned = remove_vietnamese_accents(query.lower())
     filters = [
         or_(
@@ -68,15 +99,48 @@ def search_food_items(query, user_id=None, limit=15):
         )
     ]
     if user_id is not None:
-        filters.append(
-            or_(
-                FoodItem.is_custom == False,
-                (FoodItem.is_custom == True) & (FoodItem.created_by == user_id)
-            )
-        )
+        filters.append(_visible_to(user_id))
     foods = FoodItem.query.filter(*filters).limit(limit).all()
     return foods
 
+def _search_food_items_pg_trgm(query, user_id=None, limit=15):
+    """
+    Tìm kiếm xếp hạng theo word_similarity của pg_trgm.
+    Các biểu thức lower(...) khớp với GIN index trong migrations/001_food_search_pg_trgm.sql.
+    """
+    query_lower = ' '.join(query.lower().split())
+    query_unsigned = ' '.join(fold_text(query).split())
+    name_lower = func.lower(FoodItem.name)
+    unsigned_lower = func.lower(FoodItem.name_unsigned)
+
+    filters = [
+        or_(
+            name_lower.like(f"%{query_lower}%"),
+            unsigned_lower.like(f"%{query_unsigned}%"),
+            literal(query_unsigned).op('<%')(unsigned_lower),
+        )
+    ]
+    if user_id is not None:
+        filters.append(_visible_to(user_id))
+
+    rank = func.greatest(
+        func.word_similarity(query_unsigned, unsigned_lower),
+        func.word_similarity(query_lower, name_lower),
+    )
+    foods = (
+        FoodItem.query
+        .filter(*filters)
+        .order_by(
+            unsigned_lower.like(f"{query_unsigned}%").desc(),
+            rank.desc(),
+            func.similarity(query_unsigned, unsigned_lower).desc(),
+            FoodItem.food_item_id,
+        )
+        .limit(limit)
+        .all()
+    )
+    return foods
+
 def create_custom_food_service(form_data, image_file, user_id):
     """
     Tạo mới món ăn custom (user nhập tay).
@@ -93,6 +157,7 @@ def create_custom_food_service(form_data, image_file, user_id):
     carbs = float(form_data.get('carbs', 0))
     is_custom = str(form_data.get('is_custom', 'true')).lower() == 'true'
     is_recipe = str(form_data.get('is_recipe', 'false')).lower() == 'true'
+    barcode = (form_data.get('barcode') or '').strip() or None
 
     image_url = save_food_image(image_file) if image_file else None
 
@@ -108,10 +173,13 @@ def create_custom_food_service(form_data, image_file, user_id):
         is_custom=is_custom,
         is_recipe=is_recipe,
         image_url=image_url,
+        barcode=barcode,
         created_by=user_id
     )
     db.session.add(food)
     db.session.commit()
+    food_index.upsert(food)
+    barcode_index.upsert(food)
     return food
 
 def update_custom_food_service(food_id, form_data, image_file, user_id):
@@ -132,30 +200,35 @@ def update_custom_food_service(food_id, form_data, image_file, user_id):
     food.protein_g = float(form_data.get('protein', food.protein_g))
     food.fat_g = float(form_data.get('fat', food.fat_g))
     food.carbs_g = float(form_data.get('carbs', food.carbs_g))
+    if 'barcode' in form_data:
+        food.barcode = (form_data.get('barcode') or '').strip() or None
     if image_file:
         food.image_url = save_food_image(image_file)
+    # Cập nhật các công thức (kể cả lồng nhau) đang dùng món này và rollup nhật ký liên quan
+    recipe_ids = recompute_dependent_recipes([food_id])
+    refresh_daily_summaries_for_foods([food_id, *recipe_ids])
     db.session.commit()
+    food_index.upsert(food)
+    barcode_index.upsert(food)
     return food
 
 def delete_image_file(image_url):
-    # Tùy cấu hình, bóc path ra từ url, ví dụ:
-    if not image_url:
-        return
-    filename = image_url.split('/')[-1]
-    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'static/uploads')
-    file_path = os.path.join(upload_folder, filename)
-    # Không xóa nếu là ảnh mặc định
-    if not filename.startswith('default') and os.path.exists(file_path):
-        os.remove(file_path)
+    delete_upload(image_url)
 
 def delete_custom_food_service(food_id, user_id):
     food = FoodItem.query.get(food_id)
     if not food or not food.is_custom or food.created_by != user_id:
         raise PermissionError('Bạn không có quyền xoá món này')
+    # Dòng food_item_ingredients bị xoá theo (ON DELETE CASCADE): lấy các công thức dùng món này trước
+    dependents = find_dependent_recipes([food_id])
     # Xoá ảnh nếu cần
     delete_image_file(food.image_url)
     db.session.delete(food)
+    recipe_ids = recompute_dependent_recipes([food_id], dependents=dependents)
+    refresh_daily_summaries_for_foods(recipe_ids)
     db.session.commit()
+    food_index.remove(food_id)
+    barcode_index.remove(food_id)
 
 
 def create_recipe_service(form_data, image_file, user_id):
@@ -216,52 +289,24 @@ def create_recipe_item(data, user_id):
         db.session.add(recipe)
         db.session.flush()  # lấy ID
 
-        # Bước 1: insert tất cả ingredient liên kết vào DB
-        for ing in data['ingredients']:
-            ingredient_id = ing['food_item_id']
-            quantity = float(ing['quantity'])
-            unit = ing.get('unit', 'g')
-            ingredient = FoodItem.query.get(ingredient_id)
-            if not ingredient:
+        # Bước 1: lấy tất cả nguyên liệu trong 1 truy vấn và insert liên kết
+        ingredients = parse_ingredients(data['ingredients'])
+        foods = load_ingredient_foods(i for i, _, _ in ingredients)
+        for ingredient_id, quantity, unit in ingredients:
+            if ingredient_id not in foods:
                 raise ValueError(f'Ingredient food_item_id={ingredient_id} không tồn tại.')
-            if quantity <= 0:
-                raise ValueError('Số lượng nguyên liệu phải > 0')
-            fi_ing = FoodItemIngredient(
+            db.session.add(FoodItemIngredient(
                 recipe_id=recipe.food_item_id,
                 ingredient_id=ingredient_id,
                 quantity=quantity,
                 unit=unit
-            )
-            db.session.add(fi_ing)
-        
-        db.session.flush()  # ensure all ingredients added!
-
-        # Bước 2: tính tổng dinh dưỡng
-        total_calories = total_protein = total_carbs = total_fat = 0.0
-        for ing in data['ingredients']:
-            ingredient_id = ing['food_item_id']
-            quantity = float(ing['quantity'])
-            ingredient = FoodItem.query.get(ingredient_id)
-            if not ingredient:
-                continue
-            serving_size = float(ingredient.serving_size) if ingredient.serving_size else 1
-            calories = float(ingredient.calories or 0)
-            protein_g = float(ingredient.protein_g or 0)
-            carbs_g = float(ingredient.carbs_g or 0)
-            fat_g = float(ingredient.fat_g or 0)
-            ratio = quantity / serving_size if serving_size else 1
-
-            total_calories += calories * ratio
-            total_protein  += protein_g * ratio
-            total_carbs    += carbs_g * ratio
-            total_fat      += fat_g * ratio
-
-        recipe.calories  = total_calories
-        recipe.protein_g = total_protein
-        recipe.carbs_g   = total_carbs
-        recipe.fat_g     = total_fat
+            ))
+
+        # Bước 2: tính tổng dinh dưỡng (quy đổi đơn vị)
+        apply_recipe_totals(recipe, compute_recipe_totals(ingredients, foods))
 
         db.session.commit()
+        food_index.upsert(recipe)
         return food_to_dict(recipe, is_recipe=True)
 
     except Exception as e:
@@ -277,20 +322,21 @@ def get_recipe_ingredients_service(recipe_id, user_id):
     if not recipe or not recipe.is_custom or recipe.created_by != user_id:
         raise PermissionError('Không tìm thấy công thức hoặc không có quyền truy cập')
 
-    from food.services import food_to_dict
-
-    ingredients = FoodItemIngredient.query.filter_by(recipe_id=recipe_id).all()
-    results = []
-    for ing in ingredients:
-        ingredient_food = FoodItem.query.get(ing.ingredient_id)
-        if not ingredient_food:
-            continue
-        results.append({
+    rows = (
+        db.session.query(FoodItemIngredient, FoodItem)
+        .join(FoodItem, FoodItemIngredient.ingredient_id == FoodItem.food_item_id)
+        .filter(FoodItemIngredient.recipe_id == recipe_id)
+        .order_by(FoodItemIngredient.id)
+        .all()
+    )
+    return [
+        {
             'food_item': food_to_dict(ingredient_food),
             'quantity': ing.quantity,
             'unit': ing.unit,
-        })
-    return results
+        }
+        for ing, ingredient_food in rows
+    ]
 
 def update_recipe_service(recipe_id, form_data, image_file, user_id):
     """
@@ -325,61 +371,64 @@ def update_recipe_service(recipe_id, form_data, image_file, user_id):
     # Xoá nguyên liệu cũ
     FoodItemIngredient.query.filter_by(recipe_id=recipe_id).delete()
 
-    # Thêm lại nguyên liệu mới
-    total_calories = total_protein = total_carbs = total_fat = 0.0
-    for ing in ingredients:
-        try:
-            ingredient_id = int(ing['food_item_id'])
-            quantity = float(ing['quantity'])
-            unit = ing.get('unit', 'g')
-        except Exception:
-            raise ValueError('Dữ liệu nguyên liệu không hợp lệ')
-        ingredient = FoodItem.query.get(ingredient_id)
-        if not ingredient:
+    # Thêm lại nguyên liệu mới (bỏ qua nguyên liệu không tồn tại)
+    ingredients = parse_ingredients(ingredients)
+    foods = load_ingredient_foods(i for i, _, _ in ingredients)
+    for ingredient_id, quantity, unit in ingredients:
+        if ingredient_id not in foods:
             continue
-        fi_ing = FoodItemIngredient(
+        db.session.add(FoodItemIngredient(
             recipe_id=recipe_id,
             ingredient_id=ingredient_id,
             quantity=quantity,
             unit=unit
-        )
-        db.session.add(fi_ing)
+        ))
 
-        # Tính dinh dưỡng
-        ratio = quantity / float(ingredient.serving_size or 1)
-        total_calories += float(ingredient.calories or 0) * ratio
-        total_protein  += float(ingredient.protein_g or 0) * ratio
-        total_carbs    += float(ingredient.carbs_g or 0) * ratio
-        total_fat      += float(ingredient.fat_g or 0) * ratio
+    apply_recipe_totals(recipe, compute_recipe_totals(ingredients, foods))
 
-    recipe.calories = total_calories
-    recipe.protein_g = total_protein
-    recipe.carbs_g = total_carbs
-    recipe.fat_g = total_fat
+    # Công thức này có thể là nguyên liệu của công thức khác
+    recipe_ids = recompute_dependent_recipes([recipe_id])
+    refresh_daily_summaries_for_foods([recipe_id, *recipe_ids])
 
     db.session.commit()
+    food_index.upsert(recipe)
     return food_to_dict(recipe, is_recipe=True)
 
 
-def get_my_foods(user_id, limit=20):
+def get_my_foods(user_id, limit=20, cursor=None, is_recipe=None):
     """
-    Trả về danh sách món ăn mà user đã tự tạo (cả custom & recipe).
+    Trả về 1 trang món ăn mà user đã tự tạo (cả custom & recipe), mới nhất trước.
+    Phân trang keyset theo (created_at, food_item_id); `is_recipe` (True/False) để lọc.
+    Trả về (items, next_cursor); next_cursor = None khi hết.
     """
-    foods = FoodItem.query.filter(
-        FoodItem.is_custom == True,
-        FoodItem.created_by == user_id
-    ).order_by(FoodItem.created_at.desc()).limit(limit).all()
-
-    # Lấy danh sách ID món là công thức
-    recipe_ids = set(
-        r.recipe_id for r in FoodItemIngredient.query.with_entities(FoodItemIngredient.recipe_id).distinct()
+    query = FoodItem.query.filter(
+        FoodItem.created_by == user_id,
+        FoodItem.is_custom == True
     )
+    if is_recipe is not None:
+        query = query.filter(FoodItem.is_recipe == is_recipe)
+    if cursor:
+        created_at, food_item_id = decode_cursor(cursor, 2)
+        try:
+            created_at = datetime.fromisoformat(created_at)
+            food_item_id = int(food_item_id)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+        query = query.filter(
+            tuple_(FoodItem.created_at, FoodItem.food_item_id) < (created_at, food_item_id)
+        )
 
-    results = []
-    for food in foods:
-        is_recipe = food.food_item_id in recipe_ids
-        results.append(food_to_dict(food, is_recipe=is_recipe))
-    return results
+    foods = (
+        query.order_by(FoodItem.created_at.desc(), FoodItem.food_item_id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = None
+    if len(foods) > limit:
+        foods = foods[:limit]
+        last = foods[-1]
+        next_cursor = encode_cursor(last.created_at, last.food_item_id)
+    return [food_to_dict(food, is_recipe=food.is_recipe) for food in foods], next_cursor
 
 
 def food_to_dict_full(food):
@@ -401,23 +450,43 @@ def food_to_dict_full(food):
     }
 
 def search_food_items_by_name(query, user_id=None, limit=15):
-    query_unsigned = remove_vietnamese_accents(query.lower())
-    filters = [
-        or_(
-            FoodItem.name.ilike(f"%{query}%"),
-            FoodItem.name_unsigned.ilike(f"%{query_unsigned}%")
-        )
-    ]
-    if user_id is not None:
-        filters.append(
-            or_(
-                FoodItem.is_custom == False,
-                (FoodItem.is_custom == True) & (FoodItem.created_by == user_id)
-            )
-        )
-    foods = FoodItem.query.filter(*filters).limit(limit).all()
-    return foods
+    return search_food_items(query, user_id, limit)
+
+
+
+def get_food_by_barcode(barcode, user_id):
+    """
+    Tra món ăn theo barcode qua index trong RAM (mã không tồn tại không chạm DB trong TTL).
+    Trả về FoodItem hoặc None.
+    """
+    # Barcode vừa được import / tạo ở process khác: gỡ khỏi negative cache
+    food_index_sync.check()
+    food_item_id = barcode_index.lookup(barcode, user_id)
+    if food_item_id is None:
+        return None
+    food = FoodItem.query.get(food_item_id)
+    if food is None or food.barcode != barcode:
+        # Món đã bị xoá / đổi barcode ở process khác
+        barcode_index.remove(food_item_id)
+        return None
+    return food
+
 
+def get_favorite_foods_version(favorite_ids, user_id=None):
+    """
+    Phiên bản của danh sách yêu thích: list (id, updated_at) theo đúng thứ tự favorite_ids,
+    chỉ đọc 2 cột (dùng để tạo ETag mà không load cả dòng).
+    """
+    if not favorite_ids:
+        return []
+    query = (
+        db.session.query(FoodItem.food_item_id, FoodItem.updated_at)
+        .filter(FoodItem.food_item_id.in_(favorite_ids))
+    )
+    if user_id is not None:
+        query = query.filter(_visible_to(user_id))
+    versions = dict(query.all())
+    return [(fid, versions[fid]) for fid in favorite_ids if fid in versions]
 
 
 def get_favorite_foods_service(favorite_ids, user_id=None):
@@ -432,12 +501,7 @@ def get_favorite_foods_service(favorite_ids, user_id=None):
     query = FoodItem.query.filter(FoodItem.food_item_id.in_(favorite_ids))
     # Nếu có user_id: chỉ cho phép xem món custom của user hoặc món mặc định
     if user_id is not None:
-        query = query.filter(
-            or_(
-                FoodItem.is_custom == False,
-                (FoodItem.is_custom == True) & (FoodItem.created_by == user_id)
-            )
-        )
+        query = query.filter(_visible_to(user_id))
 
     foods = query.all()
     # Trả về list dict (theo đúng thứ tự favorite_ids nếu cần)
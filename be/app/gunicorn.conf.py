@@ -0,0 +1,50 @@
+"""
+Cấu hình gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
+
+App được nạp và warm-up 1 lần trong master (preload_app) rồi mới fork worker.
+Mỗi worker có pool kết nối DB riêng (DB_POOL_SIZE + DB_MAX_OVERFLOW),
+nên tổng kết nối tối đa ~ workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Số liệu Prometheus của các worker ghi vào file trong thư mục này và được /metrics cộng dồn
+# (xem instrumentation.py). Phải đặt trước khi app (prometheus_client) được import.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'food-nutri-metrics'))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 4))
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+preload_app = True
+# Tái tạo worker định kỳ: mặc định tắt. Worker mới fork từ bản chụp lúc khởi động của master;
+# các cache trong RAM (index món ăn / barcode, catalog bài tập, ngữ cảnh user) đều tự kiểm tra version
+# với DB nên bắt kịp sau chu kỳ kiểm tra, nhưng bật lên vẫn tốn 1 lần nạp delta cho mỗi worker mới.
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Bỏ số liệu của lần chạy trước
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from instrumentation import mark_worker_dead
+    mark_worker_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    from wsgi import app
+    from warmup import after_fork
+    after_fork(app)
@@ -0,0 +1,53 @@
+import hashlib
+from flask import jsonify, make_response, request
+
+# Dữ liệu dùng chung (không phụ thuộc user) -> cho phép cache; dữ liệu riêng -> luôn hỏi lại server
+PUBLIC_CACHE = 'public, max-age={max_age}'
+PRIVATE_REVALIDATE = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """
+    ETag mạnh từ các thành phần xác định phiên bản của response
+    (vd: id + updated_at, hoặc danh sách (id, updated_at)).
+    """
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def is_not_modified(etag):
+    """Client đã có bản này (If-None-Match khớp ETag)."""
+    return etag in request.if_none_match
+
+
+def not_modified(etag, cache_control=None):
+    """Response 304 không có body."""
+    response = make_response('', 304)
+    return _with_validators(response, etag, cache_control)
+
+
+def conditional_json(etag, build_payload, cache_control=None, status=200):
+    """
+    Trả về 304 nếu If-None-Match khớp `etag`, ngược lại gọi build_payload() và trả JSON kèm ETag.
+    build_payload chỉ được gọi khi cần gửi body, nên có thể đặt truy vấn đầy đủ trong đó.
+    """
+    if is_not_modified(etag):
+        return not_modified(etag, cache_control)
+    response = jsonify(build_payload())
+    response.status_code = status
+    return _with_validators(response, etag, cache_control)
+
+
+def conditional_bytes(etag, body, mimetype='application/json', cache_control=None):
+    """Giống conditional_json nhưng body đã được encode sẵn (bytes)."""
+    if is_not_modified(etag):
+        return not_modified(etag, cache_control)
+    response = make_response(body)
+    response.mimetype = mimetype
+    return _with_validators(response, etag, cache_control)
+
+
+def _with_validators(response, etag, cache_control):
+    response.set_etag(etag)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
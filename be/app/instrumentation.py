@@ -0,0 +1,147 @@
+"""
+Số liệu vận hành dạng Prometheus (text exposition format) tại GET /metrics.
+
+- http_request_duration_seconds: độ trễ theo blueprint / endpoint / method / status
+- db_statements_total, db_statement_duration_seconds, db_statements_per_request: SQL theo endpoint
+- firebase_verify_duration_seconds: thời gian verify ID token
+- upload_bytes: kích thước file upload
+
+Nhãn chỉ lấy từ tập hữu hạn (tên endpoint Flask, method, status code) nên số series bị chặn.
+Chạy nhiều worker (gunicorn): đặt PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py đặt sẵn) trước khi import
+prometheus_client; mỗi worker ghi số liệu vào file riêng trong thư mục đó và /metrics cộng dồn
+số liệu của mọi worker, kể cả worker đã thoát, nên counter không bị reset / nhảy giữa các lần scrape.
+"""
+import os
+import time
+
+from flask import Response, abort, g, has_app_context, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import REGISTRY as DEFAULT_REGISTRY
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+BYTES_BUCKETS = tuple(2 ** p for p in range(14, 25))  # 16KB .. 16MB
+
+# Endpoint của các câu SQL chạy ngoài request (thread nền, script)
+BACKGROUND = 'background'
+UNMATCHED = 'unmatched'
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency.',
+    ('blueprint', 'endpoint', 'method', 'status'), buckets=LATENCY_BUCKETS,
+)
+SQL_STATEMENTS = Counter('db_statements_total', 'SQL statements executed.', ('blueprint', 'endpoint'))
+SQL_DURATION = Histogram(
+    'db_statement_duration_seconds', 'SQL statement execution time.', ('blueprint', 'endpoint'),
+    buckets=SQL_BUCKETS,
+)
+SQL_PER_REQUEST = Histogram(
+    'db_statements_per_request', 'SQL statements issued while handling one request.',
+    ('blueprint', 'endpoint'), buckets=COUNT_BUCKETS,
+)
+FIREBASE_VERIFY = Histogram(
+    'firebase_verify_duration_seconds', 'Firebase ID token verification time.', ('outcome',),
+    buckets=LATENCY_BUCKETS,
+)
+UPLOAD_BYTES = Histogram('upload_bytes', 'Size of uploaded files in bytes.', ('kind',), buckets=BYTES_BUCKETS)
+
+
+def render_metrics():
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        # Gộp file số liệu của mọi worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(DEFAULT_REGISTRY)
+
+
+def mark_worker_dead(pid):
+    """Gọi từ hook child_exit của gunicorn khi 1 worker thoát."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+# --- Gắn vào app ---
+
+def _route_labels():
+    """(blueprint, endpoint) của request hiện tại; thread con của parallel_queries dùng nhãn được truyền sang."""
+    if has_request_context():
+        endpoint = request.endpoint or UNMATCHED
+        return request.blueprint or 'app', endpoint
+    if has_app_context():
+        labels = g.get('metrics_route')
+        if labels is not None:
+            return labels
+    return BACKGROUND, BACKGROUND
+
+
+def observe_firebase_verify(seconds, ok):
+    FIREBASE_VERIFY.labels('ok' if ok else 'error').observe(seconds)
+
+
+def observe_upload(kind, size):
+    UPLOAD_BYTES.labels(kind).observe(size)
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_sql_count = 0
+    g.metrics_route = _route_labels()
+
+
+def _after_request(response):
+    started = g.get('metrics_started')
+    if started is not None and request.endpoint != 'prometheus_metrics':
+        blueprint, endpoint = g.metrics_route
+        REQUEST_LATENCY.labels(blueprint, endpoint, request.method, str(response.status_code)).observe(
+            time.perf_counter() - started,
+        )
+        SQL_PER_REQUEST.labels(blueprint, endpoint).observe(g.get('metrics_sql_count', 0))
+    return response
+
+
+def _before_cursor_execute(conn, _cursor, _statement, _parameters, _context, _executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, _cursor, _statement, _parameters, _context, _executemany):
+    stack = conn.info.get('metrics_started')
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    labels = _route_labels()
+    SQL_STATEMENTS.labels(*labels).inc()
+    SQL_DURATION.labels(*labels).observe(elapsed)
+    if has_request_context():
+        g.metrics_sql_count = g.get('metrics_sql_count', 0) + 1
+
+
+def _handle_error(context):
+    stack = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if stack:
+        stack.pop()
+
+
+def init_instrumentation(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    token = app.config.get('METRICS_TOKEN')
+
+    @app.route('/metrics', endpoint='prometheus_metrics')
+    def prometheus_metrics():
+        # Endpoint nội bộ: nếu có METRICS_TOKEN thì bắt buộc Bearer token
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(404)
+        return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
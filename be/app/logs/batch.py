@@ -0,0 +1,331 @@
+from datetime import datetime
+from sqlalchemy import bindparam, delete, insert, select, text, update
+from extensions import db
+from meal.models import Meal, MealEntry
+from exercise.models import ExerciseLog, ExerciseType
+from exercise.catalog import exercise_catalog
+from food.models import FoodItem
+from water.models import WaterLog
+from summary.services import refresh_daily_summaries
+from day_window import as_aware, local_date, user_timezone
+
+LOG_TYPES = ('meal', 'water', 'exercise')
+OPS = ('create', 'update', 'delete')
+
+
+class BatchValidationError(ValueError):
+    """Batch không hợp lệ; `errors` là list {'index', 'error'} cho từng phần tử lỗi."""
+
+    def __init__(self, errors):
+        super().__init__('Invalid batch')
+        self.errors = errors
+
+
+def apply_log_batch(user_id: int, items: list, max_items: int = 500) -> list[dict]:
+    """
+    Áp dụng 1 mảng thao tác log (create / update quantity / delete) cho meal, water, exercise.
+
+    Toàn bộ mảng được kiểm tra trước; nếu có phần tử lỗi thì không ghi gì (BatchValidationError).
+    Sau đó ghi bằng INSERT/UPDATE/DELETE hàng loạt trong transaction hiện tại
+    (route chịu trách nhiệm commit). Thứ tự áp dụng: create -> update -> delete.
+
+    Phần tử:
+      {"op": "create", "type": "water", "timestamp": "...", "data": {...}}
+      {"op": "update", "type": "meal", "id": 12, "quantity": 150}
+      {"op": "delete", "type": "exercise", "id": 34}
+    Trả về list kết quả cùng thứ tự: {"index", "op", "type", "id", "status"}.
+    """
+    if not isinstance(items, list) or not items:
+        raise BatchValidationError([{'index': None, 'error': 'items must be a non-empty array'}])
+    if len(items) > max_items:
+        raise BatchValidationError([{'index': None, 'error': f'At most {max_items} items per batch'}])
+
+    tz = user_timezone(user_id)
+    parsed = _validate(items, tz)
+
+    results = [None] * len(items)
+    touched_days = set()
+
+    creates = [p for p in parsed if p['op'] == 'create']
+    _create_waters(user_id, [p for p in creates if p['type'] == 'water'], tz, results, touched_days)
+    _create_meals(user_id, [p for p in creates if p['type'] == 'meal'], tz, results, touched_days)
+    _create_exercises(user_id, [p for p in creates if p['type'] == 'exercise'], tz, results, touched_days)
+
+    _update_meals(user_id, [p for p in parsed if p['op'] == 'update'], results, touched_days)
+
+    deletes = [p for p in parsed if p['op'] == 'delete']
+    _delete_meals(user_id, [p for p in deletes if p['type'] == 'meal'], results, touched_days)
+    _delete_logs(user_id, WaterLog, WaterLog.water_id,
+                 [p for p in deletes if p['type'] == 'water'], tz, results, touched_days)
+    _delete_logs(user_id, ExerciseLog, ExerciseLog.exercise_id,
+                 [p for p in deletes if p['type'] == 'exercise'], tz, results, touched_days)
+
+    refresh_daily_summaries((user_id, day) for day in touched_days)
+    return results
+
+
+# --- validation ---
+
+def _validate(items, tz):
+    errors = []
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append(_parse_item(index, item, tz))
+        except (KeyError, TypeError, ValueError) as e:
+            message = f'Missing field {e}' if isinstance(e, KeyError) else str(e)
+            errors.append({'index': index, 'error': message})
+
+    # Kiểm tra khoá ngoại một lần cho cả batch thay vì để INSERT hỏng giữa chừng
+    food_ids = {p['data']['food_item_id'] for p in parsed if p['op'] == 'create' and p['type'] == 'meal'}
+    type_ids = {p['data']['exercise_type_id'] for p in parsed if p['op'] == 'create' and p['type'] == 'exercise'}
+    known_foods = _existing_ids(FoodItem.food_item_id, food_ids)
+    known_types = {i for i in type_ids if exercise_catalog.get(i) is not None}
+    if known_types != type_ids:
+        # Catalog có thể chưa kịp nạp loại mới thêm: kiểm tra lại trong DB
+        known_types |= _existing_ids(ExerciseType.exercise_type_id, type_ids - known_types)
+    for p in parsed:
+        if p['op'] != 'create':
+            continue
+        if p['type'] == 'meal' and p['data']['food_item_id'] not in known_foods:
+            errors.append({'index': p['index'], 'error': 'Unknown food_item_id'})
+        if p['type'] == 'exercise' and p['data']['exercise_type_id'] not in known_types:
+            errors.append({'index': p['index'], 'error': 'Unknown exercise_type_id'})
+
+    if errors:
+        raise BatchValidationError(sorted(errors, key=lambda e: e['index']))
+    return parsed
+
+
+def _parse_item(index, item, tz):
+    if not isinstance(item, dict):
+        raise ValueError('Item must be an object')
+    op = item.get('op', 'create')
+    log_type = item['type']
+    if op not in OPS:
+        raise ValueError('Unsupported op')
+    if log_type not in LOG_TYPES:
+        raise ValueError('Unsupported log type')
+
+    parsed = {'index': index, 'op': op, 'type': log_type}
+    if op == 'create':
+        parsed['timestamp'] = as_aware(datetime.fromisoformat(item['timestamp']), tz)
+        parsed['data'] = _parse_create_data(log_type, item['data'])
+    elif op == 'update':
+        if log_type != 'meal':
+            raise ValueError('Only meal logs support update')
+        parsed['id'] = int(item['id'])
+        parsed['quantity'] = float(item['quantity'])
+        if parsed['quantity'] <= 0:
+            raise ValueError('quantity must be > 0')
+    else:
+        parsed['id'] = int(item['id'])
+    return parsed
+
+
+def _parse_create_data(log_type, data):
+    if log_type == 'water':
+        return {'intake_ml': int(data['intake_ml'])}
+    if log_type == 'exercise':
+        return {
+            'exercise_type_id': int(data['exercise_type_id']),
+            'duration_min': int(data['duration_min']),
+        }
+    return {
+        'meal_name': data.get('meal_name', 'Meal'),
+        'food_item_id': int(data['food_item_id']),
+        'quantity': float(data['quantity']),
+        'unit': data.get('unit', 'g'),
+        'calories': float(data['calories']),
+        'protein_g': float(data['protein']),
+        'carbs_g': float(data['carbs']),
+        'fat_g': float(data['fat']),
+    }
+
+
+def _existing_ids(column, ids):
+    if not ids:
+        return set()
+    return {row[0] for row in db.session.query(column).filter(column.in_(ids))}
+
+
+# --- writes ---
+
+def _allocate_ids(table, column, count):
+    """
+    Lấy trước `count` id từ sequence BIGSERIAL trong 1 câu SQL,
+    để INSERT hàng loạt mà vẫn biết id của từng phần tử (và nối meal -> meal_entries).
+    """
+    if count == 0:
+        return []
+    rows = db.session.execute(
+        text('SELECT nextval(pg_get_serial_sequence(:table, :column)) FROM generate_series(1, :n)'),
+        {'table': table, 'column': column, 'n': count},
+    )
+    return [row[0] for row in rows]
+
+
+def _create_waters(user_id, items, tz, results, touched_days):
+    ids = _allocate_ids('water_log', 'water_id', len(items))
+    rows = []
+    for p, water_id in zip(items, ids):
+        rows.append({
+            'water_id': water_id,
+            'user_id': user_id,
+            'intake_ml': p['data']['intake_ml'],
+            'logged_at': p['timestamp'],
+        })
+        touched_days.add(local_date(p['timestamp'], tz))
+        results[p['index']] = _result(p, water_id, 'created')
+    if rows:
+        db.session.execute(insert(WaterLog.__table__), rows)
+
+
+def _create_meals(user_id, items, tz, results, touched_days):
+    meal_ids = _allocate_ids('meal', 'meal_id', len(items))
+    entry_ids = _allocate_ids('meal_entries', 'entry_id', len(items))
+    meals, entries = [], []
+    for p, meal_id, entry_id in zip(items, meal_ids, entry_ids):
+        data = p['data']
+        meal_date = local_date(p['timestamp'], tz)
+        meals.append({
+            'meal_id': meal_id,
+            'user_id': user_id,
+            'name': data['meal_name'],
+            'meal_date': meal_date,
+            'created_at': p['timestamp'],
+        })
+        entries.append({
+            'entry_id': entry_id,
+            'meal_id': meal_id,
+            'food_item_id': data['food_item_id'],
+            'quantity': data['quantity'],
+            'unit': data['unit'],
+            'calories': data['calories'],
+            'protein_g': data['protein_g'],
+            'carbs_g': data['carbs_g'],
+            'fat_g': data['fat_g'],
+            'created_at': p['timestamp'],
+        })
+        touched_days.add(meal_date)
+        results[p['index']] = _result(p, entry_id, 'created')
+    if meals:
+        db.session.execute(insert(Meal.__table__), meals)
+        db.session.execute(insert(MealEntry.__table__), entries)
+
+
+def _create_exercises(user_id, items, tz, results, touched_days):
+    ids = _allocate_ids('exercise_log', 'exercise_id', len(items))
+    rows = []
+    for p, exercise_id in zip(items, ids):
+        rows.append({
+            'exercise_id': exercise_id,
+            'user_id': user_id,
+            'exercise_type_id': p['data']['exercise_type_id'],
+            'duration_min': p['data']['duration_min'],
+            'logged_at': p['timestamp'],
+        })
+        touched_days.add(local_date(p['timestamp'], tz))
+        results[p['index']] = _result(p, exercise_id, 'created')
+    if rows:
+        # trigger calculate_calories_burned vẫn chạy cho từng dòng
+        db.session.execute(insert(ExerciseLog.__table__), rows)
+
+
+def _update_meals(user_id, items, results, touched_days):
+    """
+    Cập nhật quantity và tính lại calories/macros theo FoodItem (giống update_meal_quantity),
+    đọc tất cả entry trong 1 truy vấn và ghi bằng 1 UPDATE executemany.
+    """
+    if not items:
+        return
+    found = {
+        entry_id: (meal_date, food)
+        for entry_id, meal_date, food in (
+            db.session.query(MealEntry.entry_id, Meal.meal_date, FoodItem)
+            .join(Meal, MealEntry.meal_id == Meal.meal_id)
+            .join(FoodItem, MealEntry.food_item_id == FoodItem.food_item_id)
+            .filter(Meal.user_id == user_id, MealEntry.entry_id.in_({p['id'] for p in items}))
+        )
+    }
+    rows = []
+    for p in items:
+        if p['id'] not in found:
+            results[p['index']] = _result(p, p['id'], 'not_found')
+            continue
+        meal_date, food = found[p['id']]
+        factor = p['quantity'] / float(food.serving_size or 1)
+        rows.append({
+            'b_entry_id': p['id'],
+            'quantity': p['quantity'],
+            'calories': float(food.calories) * factor,
+            'protein_g': float(food.protein_g) * factor,
+            'carbs_g': float(food.carbs_g) * factor,
+            'fat_g': float(food.fat_g) * factor,
+        })
+        touched_days.add(meal_date)
+        results[p['index']] = _result(p, p['id'], 'updated')
+    if rows:
+        table = MealEntry.__table__
+        db.session.execute(
+            update(table).where(table.c.entry_id == bindparam('b_entry_id')),
+            rows,
+        )
+
+
+def _delete_meals(user_id, items, results, touched_days):
+    if not items:
+        return
+    deleted = {
+        row.entry_id: row
+        for row in db.session.execute(
+            delete(MealEntry.__table__)
+            .where(MealEntry.meal_id == Meal.meal_id)
+            .where(Meal.user_id == user_id)
+            .where(MealEntry.entry_id.in_({p['id'] for p in items}))
+            .returning(MealEntry.entry_id, MealEntry.meal_id, Meal.meal_date)
+        )
+    }
+    for p in items:
+        row = deleted.get(p['id'])
+        results[p['index']] = _result(p, p['id'], 'deleted' if row else 'not_found')
+        if row:
+            touched_days.add(row.meal_date)
+
+    # Xoá các meal không còn entry nào (giống delete_meal_log)
+    meal_ids = {row.meal_id for row in deleted.values()}
+    if meal_ids:
+        db.session.execute(
+            delete(Meal.__table__)
+            .where(Meal.meal_id.in_(meal_ids))
+            .where(~select(MealEntry.entry_id).where(MealEntry.meal_id == Meal.meal_id).exists())
+        )
+
+
+def _delete_logs(user_id, model, id_column, items, tz, results, touched_days):
+    if not items:
+        return
+    deleted = {
+        row[0]: row[1]
+        for row in db.session.execute(
+            delete(model.__table__)
+            .where(model.user_id == user_id)
+            .where(id_column.in_({p['id'] for p in items}))
+            .returning(id_column, model.logged_at)
+        )
+    }
+    for p in items:
+        logged_at = deleted.get(p['id'])
+        results[p['index']] = _result(p, p['id'], 'deleted' if logged_at else 'not_found')
+        if logged_at:
+            touched_days.add(local_date(logged_at, tz))
+
+
+def _result(parsed, log_id, status):
+    return {
+        'index': parsed['index'],
+        'op': parsed['op'],
+        'type': parsed['type'],
+        'id': log_id,
+        'status': status,
+    }
@@ -1,13 +1,19 @@
-from flask import Blueprint, request, jsonify, g
+import json
+from flask import Blueprint, Response, request, jsonify, g, current_app, stream_with_context
 from auth.decorators import firebase_required
+from db_routing import replica_read
 from logs.services import create_exercise_log, create_meal_log, create_water_log, get_aggregated_logs, get_recent_logs_for_user, delete_meal_log, delete_water_log, delete_exercise_log, update_meal_quantity
-from datetime import datetime, date
+from datetime import datetime
 from extensions import db
+from day_window import local_today, user_timezone
+from logs.batch import BatchValidationError, apply_log_batch
+from logs.timeline import get_timeline_page, iter_timeline, parse_timeline_cursor
 
 logs_bp = Blueprint('logs', __name__, url_prefix='/api/v1/logs')
 
 @logs_bp.route("/recent", methods=['GET'])
 @firebase_required()
+@replica_read
 def get_recent_logs():
     # 1. Parse ngày từ query param
     date_str = request.args.get('date')
@@ -16,7 +22,7 @@ def get_recent_logs():
             # chuyển string "YYYY-MM-DD" thành date
             target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         else:
-            target_date = date.today()
+            target_date = local_today(user_timezone(g.current_user.user_id))
     except ValueError:
         return jsonify({"error": "Invalid date format, use YYYY-MM-DD"}), 400
 
@@ -30,9 +36,12 @@ def get_recent_logs():
     
 @logs_bp.route('', methods=['GET'])
 @firebase_required()
+@replica_read
 def list_logs():
     user_id = g.current_user.user_id
     date_str = request.args.get('date')
+    if not date_str and request.args.get('from'):
+        return list_logs_range(user_id)
     if not date_str:
         return jsonify({'msg': 'Missing date param'}), 400
     try:
@@ -44,6 +53,38 @@ def list_logs():
     logs = get_aggregated_logs(user_id, query_date)
     return jsonify(logs), 200
 
+def list_logs_range(user_id):
+    """
+    Timeline nhiều ngày: GET /api/v1/logs?from=YYYY-MM-DD&to=YYYY-MM-DD&cursor=...&limit=200
+    Trả về {"data": [...], "next_cursor": "..."}; next_cursor = null khi hết.
+    Với `?format=ndjson` (hoặc Accept: application/x-ndjson) trả về toàn bộ khoảng
+    dưới dạng NDJSON, mỗi dòng 1 log, đọc dần từ DB.
+    """
+    try:
+        start_day = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+        to_str = request.args.get('to')
+        end_day = datetime.strptime(to_str, '%Y-%m-%d').date() if to_str else start_day
+        limit = min(max(int(request.args.get('limit', 200)), 1), 1000)
+        cursor = request.args.get('cursor')
+        after = parse_timeline_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 400
+    if end_day < start_day:
+        return jsonify({'msg': '`to` must not be before `from`'}), 400
+
+    wants_ndjson = (
+        request.args.get('format') == 'ndjson'
+        or request.accept_mimetypes.best == 'application/x-ndjson'
+    )
+    if wants_ndjson:
+        def generate():
+            for _, item in iter_timeline(user_id, start_day, end_day, after):
+                yield json.dumps(item, ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    items, next_cursor = get_timeline_page(user_id, start_day, end_day, cursor, limit)
+    return jsonify({'data': items, 'next_cursor': next_cursor}), 200
+
 @logs_bp.route('', methods=['POST'])
 @firebase_required()
 def create_log():
@@ -85,6 +126,41 @@ def create_log():
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
     
+@logs_bp.route('/batch', methods=['POST'])
+@firebase_required()
+def batch_logs():
+    """
+    Ghi nhiều thao tác log trong 1 request (1 transaction).
+    Body:
+    {
+      "items": [
+        {"op": "create", "type": "meal" | "water" | "exercise", "timestamp": "...", "data": {...}},
+        {"op": "update", "type": "meal", "id": 12, "quantity": 150},
+        {"op": "delete", "type": "meal" | "water" | "exercise", "id": 34}
+      ]
+    }
+    Nếu có phần tử không hợp lệ thì không ghi gì và trả về 400 kèm lỗi theo index.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "Missing body"}), 400
+
+    try:
+        results = apply_log_batch(
+            g.current_user.user_id,
+            data.get("items"),
+            max_items=current_app.config['LOG_BATCH_MAX_ITEMS'],
+        )
+        db.session.commit()
+        return jsonify({"results": results}), 200
+
+    except BatchValidationError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "errors": e.errors}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
 @logs_bp.route('/<log_type>/<int:log_id>', methods=['DELETE'])
 @firebase_required()
 def delete_log(log_type, log_id):
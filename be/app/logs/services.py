@@ -1,4 +1,5 @@
-from datetime import date, datetime, timedelta
+import heapq
+from datetime import date, timedelta
 from sqlalchemy import func
 from sqlalchemy.orm import aliased
 from extensions import db
@@ -6,6 +7,9 @@ from meal.models import MealEntry, Meal
 from exercise.models import ExerciseLog, ExerciseType
 from food.models import FoodItem
 from water.models  import  WaterLog
+from summary.services import refresh_daily_summary
+from day_window import as_aware, day_bounds, local_date, range_bounds, user_timezone
+from parallel_queries import fetch_all
 
 def get_recent_logs_for_user(user_id, target_date):
     """
@@ -13,6 +17,7 @@ def get_recent_logs_for_user(user_id, target_date):
     dựa trên bản ghi MealEntry gần nhất theo created_at.
     """
     start_date = target_date - timedelta(days=1)
+    start, end = range_bounds(start_date, target_date, user_timezone(user_id))
 
     subquery = (
         db.session.query(
@@ -22,8 +27,11 @@ def get_recent_logs_for_user(user_id, target_date):
         .join(Meal, MealEntry.meal_id == Meal.meal_id)
         .filter(
             Meal.user_id == user_id,
-            func.date(MealEntry.created_at) >= start_date,
-            func.date(MealEntry.created_at) <= target_date,
+            # meal.created_at == meal_entries.created_at, dùng được index (user_id, created_at)
+            Meal.created_at >= start,
+            Meal.created_at < end,
+            MealEntry.created_at >= start,
+            MealEntry.created_at < end,
         )
         .group_by(MealEntry.food_item_id)
         .subquery()
@@ -39,6 +47,7 @@ def get_recent_logs_for_user(user_id, target_date):
             MealEntryAlias.food_item_id == subquery.c.food_item_id,
             MealEntryAlias.created_at == subquery.c.latest_time
         ))
+        .filter(Meal.user_id == user_id)
         .order_by(subquery.c.latest_time.desc())
         .limit(6)
         .all()
@@ -65,17 +74,61 @@ def get_recent_logs_for_user(user_id, target_date):
     ]
 
     return meals_data
-def get_aggregated_logs(user_id: int, query_date: date) -> list[dict]:
-    """Trả về tất cả log trong ngày cụ thể: món ăn, nước, bài tập. Dùng để hiển thị Timeline trong JournalPage."""
-    start = datetime.combine(query_date, datetime.min.time())
-    end = datetime.combine(query_date, datetime.max.time())
 
-    meal_results = (
+def meal_log_item(entry, food) -> dict:
+    return {
+        'type': 'meal',
+        'timestamp': entry.created_at.isoformat(),
+        'logId': entry.entry_id,
+        'data': {
+            'food_item_id': food.food_item_id,
+            'name': food.name,
+            'calories': float(entry.calories),
+            'quantity': float(entry.quantity),
+            'unit': entry.unit,
+            'protein': float(entry.protein_g),
+            'carbs': float(entry.carbs_g),
+            'fat': float(entry.fat_g),
+            'image_url': food.image_url,
+        }
+    }
+
+def water_log_item(w) -> dict:
+    return {
+        'type': 'water',
+        'timestamp': w.logged_at.isoformat(),
+        'logId': w.water_id,
+        'data': {
+            'intake_ml': w.intake_ml,
+        }
+    }
+
+def exercise_log_item(log, ex_type) -> dict:
+    return {
+        'type': 'exercise',
+        'timestamp': log.logged_at.isoformat(),
+        'logId': log.exercise_id,
+        'data': {
+            'name': ex_type.name,
+            'duration_min': log.duration_min,
+            'calories_burned': float(log.calories_burned),
+        }
+    }
+
+def get_aggregated_logs(user_id: int, query_date: date, concurrent: bool = True) -> list[dict]:
+    """
+    Trả về tất cả log trong ngày cụ thể: món ăn, nước, bài tập. Dùng để hiển thị Timeline trong JournalPage.
+    3 truy vấn (đã ORDER BY theo thời gian) chạy song song rồi trộn k-way;
+    concurrent=False để chạy tuần tự trên session hiện tại.
+    """
+    start, end = day_bounds(query_date, user_timezone(user_id))
+
+    meals = (
         db.session.query(MealEntry, FoodItem)
         .join(Meal, MealEntry.meal_id == Meal.meal_id)
         .join(FoodItem, MealEntry.food_item_id == FoodItem.food_item_id)
         .filter(Meal.user_id == user_id, Meal.meal_date == query_date,)
-        .all()
+        .order_by(MealEntry.created_at, MealEntry.entry_id)
     )
 
     waters = (
@@ -83,9 +136,9 @@ def get_aggregated_logs(user_id: int, query_date: date) -> list[dict]:
         .filter(
             WaterLog.user_id == user_id,
             WaterLog.logged_at >= start,
-            WaterLog.logged_at <= end,
+            WaterLog.logged_at < end,
         )
-        .all()
+        .order_by(WaterLog.logged_at, WaterLog.water_id)
     )
 
     exercises = (
@@ -94,66 +147,32 @@ def get_aggregated_logs(user_id: int, query_date: date) -> list[dict]:
         .filter(
             ExerciseLog.user_id == user_id,
             ExerciseLog.logged_at >= start,
-            ExerciseLog.logged_at <= end,
+            ExerciseLog.logged_at < end,
         )
-        .order_by(ExerciseLog.logged_at)
-        .all()
+        .order_by(ExerciseLog.logged_at, ExerciseLog.exercise_id)
     )
 
-    logs: list[dict] = []
-
-    for entry, food in meal_results:
-        logs.append({
-            'type': 'meal',
-            'timestamp': entry.created_at.isoformat(),
-            'logId': entry.entry_id, 
-            'data': {
-                'food_item_id': food.food_item_id,
-                'name': food.name,
-                'calories': float(entry.calories),
-                'quantity': float(entry.quantity),
-                'unit': entry.unit,
-                'protein': float(entry.protein_g),
-                'carbs': float(entry.carbs_g),
-                'fat': float(entry.fat_g),
-                'image_url': food.image_url,
-            }
-        })
-
-    for w in waters:
-        logs.append({
-            'type': 'water',
-            'timestamp': w.logged_at.isoformat(),
-            'logId': w.water_id, 
-            'data': {
-                'intake_ml': w.intake_ml,
-            }
-        })
-
-    for log, ex_type in exercises:
-        logs.append({
-            'type': 'exercise',
-            'timestamp': log.logged_at.isoformat(),
-            'logId': log.exercise_id,
-            'data': {
-                'name': ex_type.name,
-                'duration_min': log.duration_min,
-                'calories_burned': float(log.calories_burned),
-            }
-        })
-
-    logs.sort(key=lambda x: x['timestamp'])
-    return logs
+    meal_rows, water_rows, exercise_rows = fetch_all(meals, waters, exercises, concurrent=concurrent)
+
+    streams = [
+        ((entry.created_at, meal_log_item(entry, food)) for entry, food in meal_rows),
+        ((w.logged_at, water_log_item(w)) for w in water_rows),
+        ((log.logged_at, exercise_log_item(log, ex_type)) for log, ex_type in exercise_rows),
+    ]
+    return [item for _, item in heapq.merge(*streams, key=lambda pair: pair[0])]
     """"Dùng để ghi log mới khi người dùng thêm món ăn/nước/tập luyện. Được gọi từ /api/v1/logs với method POST, ứng với hành vi trong AddEntryPage."""
 # Dùng để ghi log mới khi người dùng thêm món ăn/nước/tập luyện. Được gọi từ /api/v1/logs với method POST, ứng với hành vi trong AddEntryPage.
 
 def create_water_log(user_id: int, timestamp, data: dict):
+    tz = user_timezone(user_id)
+    timestamp = as_aware(timestamp, tz)
     log = WaterLog(
         user_id=user_id,
         intake_ml=data["intake_ml"],
         logged_at=timestamp,
     )
     db.session.add(log)
+    refresh_daily_summary(user_id, local_date(timestamp, tz))
 
 def create_meal_log(user_id: int, timestamp, data: dict):
     """
@@ -169,11 +188,13 @@ def create_meal_log(user_id: int, timestamp, data: dict):
         "fat": 11.0
     }
     """
+    tz = user_timezone(user_id)
+    timestamp = as_aware(timestamp, tz)
     # Tạo meal đại diện (vì có thể sau này mở rộng thêm entry vào cùng meal)
     meal = Meal(
         user_id=user_id,
         name=data.get("meal_name", "Meal"),  # Optional name
-        meal_date=timestamp.date(),
+        meal_date=local_date(timestamp, tz),
         created_at=timestamp,
     )
     db.session.add(meal)
@@ -192,9 +213,12 @@ def create_meal_log(user_id: int, timestamp, data: dict):
         created_at=timestamp,
     )
     db.session.add(entry)
+    refresh_daily_summary(user_id, meal.meal_date)
 
 
 def create_exercise_log(user_id: int, timestamp, data: dict):
+    tz = user_timezone(user_id)
+    timestamp = as_aware(timestamp, tz)
     log = ExerciseLog(
         user_id=user_id,
         exercise_type_id=data["exercise_type_id"],
@@ -202,28 +226,33 @@ def create_exercise_log(user_id: int, timestamp, data: dict):
         logged_at=timestamp,
     )
     db.session.add(log)
+    refresh_daily_summary(user_id, local_date(timestamp, tz))
 
 
 # Xoá log tương ứng khi người dùng vuốt xoá trong JournalPage
 def delete_meal_log(log_id: int, user_id: int):
-    entry = (
-        db.session.query(MealEntry)
+    row = (
+        db.session.query(MealEntry, Meal.meal_date)
         .join(Meal, MealEntry.meal_id == Meal.meal_id)
         .filter(MealEntry.entry_id == log_id, Meal.user_id == user_id)
         .first()
     )
-    if entry:
+    if row:
+        entry, meal_date = row
         meal_id = entry.meal_id
         db.session.delete(entry)
         # kiểm tra nếu meal không còn entry nào thì xoá luôn
         remaining = MealEntry.query.filter_by(meal_id=meal_id).count()
         if remaining == 0:
             Meal.query.filter_by(meal_id=meal_id, user_id=user_id).delete()
+        refresh_daily_summary(user_id, meal_date)
 
 def delete_water_log(log_id: int, user_id: int):
     log = WaterLog.query.filter_by(water_id=log_id, user_id=user_id).first()
     if log:
+        day = local_date(log.logged_at, user_timezone(user_id))
         db.session.delete(log)
+        refresh_daily_summary(user_id, day)
 def delete_exercise_log(log_id: int, user_id: int):
     log = (
         db.session.query(ExerciseLog)
@@ -231,16 +260,19 @@ def delete_exercise_log(log_id: int, user_id: int):
         .first()
     )
     if log:
+        day = local_date(log.logged_at, user_timezone(user_id))
         db.session.delete(log)
+        refresh_daily_summary(user_id, day)
 #Chỉ cập nhật lượng (quantity) và tính lại calories/macros trong MealEntry khi người dùng chỉnh sửa log từ FoodDetailPage.
 def update_meal_quantity(log_id: int, quantity: float, user_id: int):
-    entry = (
-        db.session.query(MealEntry)
+    row = (
+        db.session.query(MealEntry, Meal.meal_date)
         .join(Meal, MealEntry.meal_id == Meal.meal_id)
         .filter(MealEntry.entry_id == log_id, Meal.user_id == user_id)
         .first()
     )
-    if entry:
+    if row:
+        entry, meal_date = row
         food = FoodItem.query.get(entry.food_item_id)
         factor = float(quantity) / float(food.serving_size)
         entry.quantity = quantity
@@ -248,3 +280,4 @@ def update_meal_quantity(log_id: int, quantity: float, user_id: int):
         entry.protein_g = float(food.protein_g) * factor
         entry.carbs_g = float(food.carbs_g) * factor
         entry.fat_g = float(food.fat_g) * factor
+        refresh_daily_summary(user_id, meal_date)
@@ -0,0 +1,127 @@
+import heapq
+from datetime import datetime
+from sqlalchemy import and_, or_
+from extensions import db
+from meal.models import MealEntry, Meal
+from exercise.models import ExerciseLog, ExerciseType
+from food.models import FoodItem
+from water.models import WaterLog
+from day_window import range_bounds, user_timezone
+from pagination import decode_cursor, encode_cursor
+from logs.services import exercise_log_item, meal_log_item, water_log_item
+from parallel_queries import fetch_all
+
+# Số dòng mỗi lần lấy từ server-side cursor của từng luồng
+STREAM_BATCH_SIZE = 500
+
+
+def parse_timeline_cursor(cursor):
+    """Cursor -> (timestamp, type, logId)."""
+    ts, log_type, log_id = decode_cursor(cursor, 3)
+    try:
+        return datetime.fromisoformat(ts), str(log_type), int(log_id)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def iter_timeline(user_id, start_day, end_day, after=None):
+    """
+    Duyệt toàn bộ log (meal, water, exercise) của user từ start_day tới end_day (ngày địa phương),
+    sắp xếp theo (timestamp, type, logId).
+
+    Mỗi loại log là 1 truy vấn đã ORDER BY sẵn trong DB và được đọc dần (yield_per),
+    sau đó trộn k-way bằng heapq.merge -> bộ nhớ chỉ phụ thuộc batch size, không phụ thuộc khoảng ngày.
+    `after`: khoá (timestamp, type, logId) của phần tử cuối trang trước (keyset).
+    Sinh ra các tuple (key, item).
+    """
+    streams = [
+        _entries(query.yield_per(STREAM_BATCH_SIZE), log_type, to_entry)
+        for log_type, query, to_entry in _timeline_queries(user_id, start_day, end_day, after)
+    ]
+    return heapq.merge(*streams, key=lambda pair: pair[0])
+
+
+def _timeline_queries(user_id, start_day, end_day, after):
+    """3 truy vấn (type, query đã ORDER BY (ts, id) và lọc theo cursor, hàm chuyển dòng -> (ts, item))."""
+    start, end = range_bounds(start_day, end_day, user_timezone(user_id))
+
+    meals = (
+        db.session.query(MealEntry, FoodItem)
+        .join(Meal, MealEntry.meal_id == Meal.meal_id)
+        .join(FoodItem, MealEntry.food_item_id == FoodItem.food_item_id)
+        .filter(Meal.user_id == user_id, Meal.meal_date.between(start_day, end_day))
+    )
+    waters = (
+        WaterLog.query
+        .filter(
+            WaterLog.user_id == user_id,
+            WaterLog.logged_at >= start,
+            WaterLog.logged_at < end,
+        )
+    )
+    exercises = (
+        db.session.query(ExerciseLog, ExerciseType)
+        .join(ExerciseType, ExerciseLog.exercise_type_id == ExerciseType.exercise_type_id)
+        .filter(
+            ExerciseLog.user_id == user_id,
+            ExerciseLog.logged_at >= start,
+            ExerciseLog.logged_at < end,
+        )
+    )
+
+    return [
+        ('meal', _ordered(meals, 'meal', MealEntry.created_at, MealEntry.entry_id, after),
+         lambda row: (row[0].created_at, meal_log_item(*row))),
+        ('water', _ordered(waters, 'water', WaterLog.logged_at, WaterLog.water_id, after),
+         lambda w: (w.logged_at, water_log_item(w))),
+        ('exercise', _ordered(exercises, 'exercise', ExerciseLog.logged_at, ExerciseLog.exercise_id, after),
+         lambda row: (row[0].logged_at, exercise_log_item(*row))),
+    ]
+
+
+def get_timeline_page(user_id, start_day, end_day, cursor=None, limit=200, concurrent=True):
+    """
+    1 trang timeline. Trả về (items, next_cursor); next_cursor = None khi hết dữ liệu.
+    Mỗi luồng chỉ cần tối đa limit + 1 dòng, nên 3 truy vấn được chạy song song (LIMIT) rồi trộn k-way.
+    """
+    after = parse_timeline_cursor(cursor) if cursor else None
+    specs = _timeline_queries(user_id, start_day, end_day, after)
+    results = fetch_all(*(query.limit(limit + 1) for _, query, _ in specs), concurrent=concurrent)
+    streams = [
+        _entries(rows, log_type, to_entry)
+        for (log_type, _, to_entry), rows in zip(specs, results)
+    ]
+
+    items = []
+    last_key = None
+    for key, item in heapq.merge(*streams, key=lambda pair: pair[0]):
+        if len(items) == limit:
+            return items, encode_cursor(*last_key)
+        items.append(item)
+        last_key = key
+    return items, None
+
+
+def _ordered(query, log_type, ts_col, id_col, after):
+    """
+    Sắp xếp 1 luồng log theo (timestamp, id), bỏ qua các dòng <= cursor.
+    Vì type cố định trong 1 luồng nên so sánh (ts, type, id) với cursor rút về điều kiện trên (ts, id).
+    """
+    if after is not None:
+        after_ts, after_type, after_id = after
+        if log_type > after_type:
+            query = query.filter(ts_col >= after_ts)
+        elif log_type < after_type:
+            query = query.filter(ts_col > after_ts)
+        else:
+            query = query.filter(or_(
+                ts_col > after_ts,
+                and_(ts_col == after_ts, id_col > after_id),
+            ))
+    return query.order_by(ts_col, id_col)
+
+
+def _entries(rows, log_type, to_entry):
+    for row in rows:
+        ts, item = to_entry(row)
+        yield (ts, log_type, item['logId']), item
@@ -0,0 +1,29 @@
+import base64
+import json
+
+
+def encode_cursor(*values):
+    """
+    Mã hoá khoá keyset (vd: timestamp, type, id) thành chuỗi cursor mờ, an toàn cho URL.
+    datetime/date được ghi dạng isoformat.
+    """
+    raw = json.dumps(
+        [v.isoformat() if hasattr(v, 'isoformat') else v for v in values],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Giải mã cursor thành list `size` giá trị (caller tự parse kiểu dữ liệu).
+    Cursor sai định dạng -> ValueError.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
@@ -0,0 +1,87 @@
+"""
+Chạy các truy vấn độc lập của 1 request song song trên thread pool giới hạn.
+
+Mỗi thread dùng app context (và session / kết nối) riêng, nên số kết nối DB đồng thời
+của 1 process tăng thêm tối đa DB_QUERY_WORKERS. DB_QUERY_WORKERS <= 1 thì chạy tuần tự.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_app_context
+
+from extensions import db
+
+# Giá trị của request được truyền sang thread: cờ điều hướng primary / replica (db_routing.py)
+# và nhãn route cho số liệu SQL (instrumentation.py)
+_REQUEST_FLAGS = ('db_replica_read', 'db_wrote', 'metrics_route')
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def _executor(max_workers):
+    """Thread pool tạo lười theo từng process (an toàn khi server fork worker)."""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-query')
+            _pool_pid = os.getpid()
+    return _pool
+
+
+def _can_run_parallel():
+    if not has_app_context() or getattr(_local, 'in_worker', False):
+        return False
+    if current_app.config.get('DB_QUERY_WORKERS', 4) <= 1:
+        return False
+    # Thay đổi chưa commit của session hiện tại không nhìn thấy được từ kết nối khác
+    session = db.session()
+    return not (session.new or session.dirty or session.deleted or session.info.get('wrote'))
+
+
+def run_parallel(*calls, concurrent=True):
+    """
+    Gọi các hàm không tham số, trả về list kết quả theo đúng thứ tự.
+    Exception của hàm nào thì được raise lại ở đây.
+    """
+    if not concurrent or len(calls) < 2 or not _can_run_parallel():
+        return [call() for call in calls]
+    app = current_app._get_current_object()
+    flags = {name: g.get(name) for name in _REQUEST_FLAGS}
+    pool = _executor(app.config.get('DB_QUERY_WORKERS', 4))
+    futures = [pool.submit(_run_in_context, app, flags, call) for call in calls[1:]]
+    # Hàm đầu tiên chạy luôn ở thread hiện tại
+    results = [calls[0]()]
+    results.extend(f.result() for f in futures)
+    return results
+
+
+def _run_in_context(app, flags, call):
+    with app.app_context():
+        for name, value in flags.items():
+            if value is not None:
+                setattr(g, name, value)
+        _local.in_worker = True
+        try:
+            return call()
+        finally:
+            _local.in_worker = False
+            db.session.remove()
+
+
+def fetch_all(*queries, concurrent=True):
+    """
+    .all() cho nhiều Query cùng lúc. Query được dựng ở thread gọi,
+    khi chạy được gắn vào session của thread thực thi.
+    Object trả về đã detach: chỉ đọc các cột đã nạp, không lazy load quan hệ.
+    """
+    return run_parallel(*(_bind_all(q) for q in queries), concurrent=concurrent)
+
+
+def _bind_all(query):
+    return lambda: query.with_session(db.session()).all()
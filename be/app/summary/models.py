@@ -0,0 +1,17 @@
+from extensions import db
+
+class DailyUserSummary(db.Model):
+    __tablename__ = 'daily_user_summary'
+    user_id = db.Column(db.BigInteger, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    summary_date = db.Column(db.Date, primary_key=True)
+    calories = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    protein_g = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    carbs_g = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    fat_g = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    water_ml = db.Column(db.Integer, nullable=False, default=0)
+    exercise_min = db.Column(db.Integer, nullable=False, default=0)
+    exercise_count = db.Column(db.Integer, nullable=False, default=0)
+    met_minutes = db.Column(db.Numeric(12, 2), nullable=False, default=0)  # Σ MET × phút, nhân cân nặng / 60 ra kcal
+    calories_burned = db.Column(db.Numeric(10, 2), nullable=False, default=0)  # Σ exercise_log.calories_burned (trigger)
+    has_exercise = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
@@ -0,0 +1,49 @@
+"""
+Dựng lại / kiểm tra bảng daily_user_summary từ log gốc.
+
+    python summary/rebuild.py                # rebuild toàn bộ
+    python summary/rebuild.py --user-id 42   # rebuild 1 user
+    python summary/rebuild.py --verify       # chỉ liệt kê các ngày bị lệch
+    python summary/rebuild.py --verify --fix # tính lại các ngày bị lệch
+"""
+import argparse
+import os
+import sys
+
+# Cho phép import từ thư mục cha
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from extensions import db
+from summary.services import rebuild_daily_summaries, refresh_daily_summaries, verify_daily_summaries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--user-id', type=int, default=None)
+    parser.add_argument('--verify', action='store_true')
+    parser.add_argument('--fix', action='store_true', help='Dùng với --verify: tính lại các ngày bị lệch')
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if not args.verify:
+            rows = rebuild_daily_summaries(args.user_id)
+            print(f"✅ Đã dựng lại {rows} dòng daily_user_summary.")
+            return
+
+        mismatches = verify_daily_summaries(args.user_id, args.limit)
+        for user_id, day in mismatches:
+            print(f"❌ user_id={user_id} date={day.isoformat()}")
+        if mismatches and args.fix:
+            refresh_daily_summaries(mismatches)
+            db.session.commit()
+            print(f"✅ Đã tính lại {len(mismatches)} ngày.")
+        elif not mismatches:
+            print("✅ Rollup khớp với dữ liệu gốc.")
+        sys.exit(1 if mismatches and not args.fix else 0)
+
+
+if __name__ == "__main__":
+    main()
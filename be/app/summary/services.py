@@ -0,0 +1,214 @@
+from sqlalchemy import text
+from extensions import db
+from day_window import DEFAULT_TIMEZONE, user_timezone
+
+# Các cột tổng hợp của daily_user_summary (trừ khoá và updated_at)
+SUMMARY_COLUMNS = (
+    'calories', 'protein_g', 'carbs_g', 'fat_g', 'water_ml',
+    'exercise_min', 'exercise_count', 'met_minutes', 'calories_burned', 'has_exercise',
+)
+
+# Tính lại số liệu từ bảng gốc cho các bộ (user_id, day, tz) trong CTE `keys`.
+# `day` là ngày địa phương theo tz của user; nước/tập lọc theo khoảng [đầu ngày, đầu ngày sau)
+# để dùng index (user_id, logged_at).
+# Calories/macros tính theo FoodItem × quantity / serving_size như user.nutrition.
+_FRESH_CTES = """
+meals AS (
+    SELECT m.user_id, m.meal_date AS day,
+           SUM(CASE WHEN f.serving_size > 0 THEN me.quantity / f.serving_size ELSE 1 END * f.calories)  AS calories,
+           SUM(CASE WHEN f.serving_size > 0 THEN me.quantity / f.serving_size ELSE 1 END * f.protein_g) AS protein_g,
+           SUM(CASE WHEN f.serving_size > 0 THEN me.quantity / f.serving_size ELSE 1 END * f.carbs_g)   AS carbs_g,
+           SUM(CASE WHEN f.serving_size > 0 THEN me.quantity / f.serving_size ELSE 1 END * f.fat_g)     AS fat_g
+    FROM keys k
+    JOIN meal m ON m.user_id = k.user_id AND m.meal_date = k.day
+    JOIN meal_entries me ON me.meal_id = m.meal_id
+    JOIN food_items f ON f.food_item_id = me.food_item_id
+    GROUP BY m.user_id, m.meal_date
+),
+waters AS (
+    SELECT k.user_id, k.day, SUM(w.intake_ml) AS water_ml
+    FROM keys k
+    JOIN water_log w ON w.user_id = k.user_id
+     AND w.logged_at >= (k.day::timestamp AT TIME ZONE k.tz)
+     AND w.logged_at <  ((k.day + 1)::timestamp AT TIME ZONE k.tz)
+    GROUP BY k.user_id, k.day
+),
+exercises AS (
+    SELECT k.user_id, k.day,
+           SUM(e.duration_min) AS exercise_min,
+           COUNT(*) AS exercise_count,
+           SUM(COALESCE(t.mets, 1.0) * e.duration_min) AS met_minutes,
+           SUM(COALESCE(e.calories_burned, 0)) AS calories_burned
+    FROM keys k
+    JOIN exercise_log e ON e.user_id = k.user_id
+     AND e.logged_at >= (k.day::timestamp AT TIME ZONE k.tz)
+     AND e.logged_at <  ((k.day + 1)::timestamp AT TIME ZONE k.tz)
+    JOIN exercise_type t ON t.exercise_type_id = e.exercise_type_id
+    GROUP BY k.user_id, k.day
+),
+fresh AS (
+    SELECT k.user_id, k.day AS summary_date,
+           ROUND(COALESCE(meals.calories, 0), 2)  AS calories,
+           ROUND(COALESCE(meals.protein_g, 0), 2) AS protein_g,
+           ROUND(COALESCE(meals.carbs_g, 0), 2)   AS carbs_g,
+           ROUND(COALESCE(meals.fat_g, 0), 2)     AS fat_g,
+           COALESCE(waters.water_ml, 0)           AS water_ml,
+           COALESCE(exercises.exercise_min, 0)    AS exercise_min,
+           COALESCE(exercises.exercise_count, 0)  AS exercise_count,
+           ROUND(COALESCE(exercises.met_minutes, 0), 2)     AS met_minutes,
+           ROUND(COALESCE(exercises.calories_burned, 0), 2) AS calories_burned,
+           COALESCE(exercises.exercise_count, 0) > 0        AS has_exercise
+    FROM keys k
+    LEFT JOIN meals     ON meals.user_id = k.user_id     AND meals.day = k.day
+    LEFT JOIN waters    ON waters.user_id = k.user_id    AND waters.day = k.day
+    LEFT JOIN exercises ON exercises.user_id = k.user_id AND exercises.day = k.day
+)
+"""
+
+_UPSERT_FRESH = """
+INSERT INTO daily_user_summary (user_id, summary_date, {cols}, updated_at)
+SELECT user_id, summary_date, {cols}, now() FROM fresh
+ON CONFLICT (user_id, summary_date) DO UPDATE SET
+    {updates}, updated_at = now()
+""".format(
+    cols=', '.join(SUMMARY_COLUMNS),
+    updates=', '.join(f'{c} = EXCLUDED.{c}' for c in SUMMARY_COLUMNS),
+)
+
+# Khoá advisory (tới hết transaction) cho từng user-ngày trong CTE `keys`, lấy theo thứ tự cố định
+# để 2 transaction không deadlock. Phải chạy thành câu lệnh RIÊNG trước câu tính lại: ở READ COMMITTED
+# snapshot được lấy khi câu lệnh bắt đầu, nên câu tính lại chạy sau khi có khoá mới thấy log của
+# transaction vừa giữ khoá (đã commit). Không khoá thì 2 request ghi cùng ngày ghi đè kết quả của nhau.
+_LOCK_KEYS = """
+SELECT pg_advisory_xact_lock(lock_key)
+FROM (
+    SELECT DISTINCT hashtextextended('daily_user_summary:' || user_id || ':' || day, 0) AS lock_key
+    FROM keys
+) k
+ORDER BY lock_key
+"""
+
+_KEYS_FROM_PAIRS = """
+keys AS (
+    SELECT DISTINCT user_id, day, tz
+    FROM unnest(CAST(:user_ids AS BIGINT[]), CAST(:days AS DATE[]), CAST(:tzs AS TEXT[])) AS k(user_id, day, tz)
+)
+"""
+
+# Múi giờ hợp lệ của từng user (tên sai trong user_settings -> mặc định)
+_USER_ZONES = """
+user_zones AS (
+    SELECT u.user_id, COALESCE(z.name, '""" + DEFAULT_TIMEZONE + """') AS tz
+    FROM users u
+    LEFT JOIN user_settings us ON us.user_id = u.user_id
+    LEFT JOIN pg_timezone_names z ON z.name = us.timezone
+    WHERE (:user_id IS NULL OR u.user_id = :user_id)
+)
+"""
+
+_SOURCE_KEYS = """
+    SELECT m.user_id, m.meal_date AS day, uz.tz
+    FROM meal m JOIN user_zones uz ON uz.user_id = m.user_id
+    UNION
+    SELECT w.user_id, (w.logged_at AT TIME ZONE uz.tz)::date, uz.tz
+    FROM water_log w JOIN user_zones uz ON uz.user_id = w.user_id
+    UNION
+    SELECT e.user_id, (e.logged_at AT TIME ZONE uz.tz)::date, uz.tz
+    FROM exercise_log e JOIN user_zones uz ON uz.user_id = e.user_id
+"""
+
+_KEYS_FROM_SOURCES = _USER_ZONES + ', keys AS (' + _SOURCE_KEYS + ')'
+
+# Khi verify: gồm cả những ngày chỉ còn trong rollup (log gốc đã bị xoá)
+_KEYS_FROM_SOURCES_AND_SUMMARY = _USER_ZONES + """,
+keys AS (
+    SELECT s.user_id, s.summary_date AS day, uz.tz
+    FROM daily_user_summary s JOIN user_zones uz ON uz.user_id = s.user_id
+    UNION""" + _SOURCE_KEYS + ')'
+
+
+def refresh_daily_summaries(keys):
+    """
+    Tính lại các dòng daily_user_summary cho tập (user_id, ngày địa phương) bị ảnh hưởng.
+    Chạy trong transaction hiện tại (không commit) để rollup luôn khớp với log.
+    """
+    keys = {(int(user_id), day) for user_id, day in keys}
+    if not keys:
+        return
+    db.session.flush()
+    zones = {user_id: user_timezone(user_id).key for user_id, _ in keys}
+    user_ids, days = zip(*keys)
+    params = {'user_ids': list(user_ids), 'days': list(days), 'tzs': [zones[u] for u in user_ids]}
+    db.session.execute(text('WITH ' + _KEYS_FROM_PAIRS + _LOCK_KEYS), params)
+    db.session.execute(text('WITH ' + _KEYS_FROM_PAIRS + ',' + _FRESH_CTES + _UPSERT_FRESH), params)
+
+
+def refresh_daily_summary(user_id, day):
+    refresh_daily_summaries([(user_id, day)])
+
+
+# Các user-ngày có món ăn thuộc :food_ids (dùng khi dinh dưỡng của món bị sửa)
+_KEYS_FROM_FOODS = """
+keys AS (
+    SELECT DISTINCT m.user_id, m.meal_date AS day, COALESCE(z.name, '""" + DEFAULT_TIMEZONE + """') AS tz
+    FROM meal_entries me
+    JOIN meal m ON m.meal_id = me.meal_id
+    LEFT JOIN user_settings us ON us.user_id = m.user_id
+    LEFT JOIN pg_timezone_names z ON z.name = us.timezone
+    WHERE me.food_item_id = ANY(CAST(:food_ids AS BIGINT[]))
+)
+"""
+
+
+def refresh_daily_summaries_for_foods(food_ids):
+    """
+    Tính lại rollup của mọi ngày có log dùng các món trong food_ids
+    (calories/macros của rollup tính theo FoodItem hiện tại). Không commit.
+    """
+    food_ids = [int(i) for i in food_ids]
+    if not food_ids:
+        return
+    db.session.flush()
+    params = {'food_ids': food_ids}
+    db.session.execute(text('WITH ' + _KEYS_FROM_FOODS + _LOCK_KEYS), params)
+    db.session.execute(text('WITH ' + _KEYS_FROM_FOODS + ',' + _FRESH_CTES + _UPSERT_FRESH), params)
+
+
+def rebuild_daily_summaries(user_id=None):
+    """
+    Dựng lại toàn bộ rollup (hoặc của 1 user) từ bảng gốc. Trả về số dòng đã ghi.
+    """
+    db.session.execute(
+        text('DELETE FROM daily_user_summary WHERE (:user_id IS NULL OR user_id = :user_id)'),
+        {'user_id': user_id},
+    )
+    result = db.session.execute(
+        text('WITH ' + _KEYS_FROM_SOURCES + ',' + _FRESH_CTES + _UPSERT_FRESH),
+        {'user_id': user_id},
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def verify_daily_summaries(user_id=None, limit=100):
+    """
+    So sánh rollup với số liệu tính lại từ bảng gốc.
+    Trả về list các (user_id, summary_date) bị lệch (tối đa `limit`).
+    """
+    mismatch = ' OR '.join(f's.{c} IS DISTINCT FROM fresh.{c}' for c in SUMMARY_COLUMNS)
+    rows = db.session.execute(
+        text(
+            'WITH ' + _KEYS_FROM_SOURCES_AND_SUMMARY + ',' + _FRESH_CTES +
+            f"""
+            SELECT fresh.user_id, fresh.summary_date
+            FROM fresh
+            LEFT JOIN daily_user_summary s
+              ON s.user_id = fresh.user_id AND s.summary_date = fresh.summary_date
+            WHERE s.user_id IS NULL OR {mismatch}
+            ORDER BY fresh.user_id, fresh.summary_date
+            LIMIT :limit
+            """
+        ),
+        {'user_id': user_id, 'limit': limit},
+    ).all()
+    return [(row.user_id, row.summary_date) for row in rows]
@@ -0,0 +1,119 @@
+import importlib.util
+import os
+import sys
+import uuid
+from datetime import date
+
+import pytest
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Cho phép import module của app (import phẳng như khi chạy app.py)
+sys.path.insert(0, APP_DIR)
+
+pytest.importorskip('flask_sqlalchemy')
+pytest.importorskip('firebase_admin')
+
+from flask import Flask
+from sqlalchemy import Column, Integer, MetaData, String, Table
+
+from extensions import db
+
+# Bảng nhỏ có ở cả 2 DB, mỗi DB ghi tên của chính nó: đọc ra là biết câu lệnh chạy ở đâu
+ROUTING_METADATA = MetaData()
+routing_probe = Table(
+    'routing_probe', ROUTING_METADATA,
+    Column('id', Integer, primary_key=True),
+    Column('source', String(16), nullable=False),
+)
+
+
+@pytest.fixture
+def probe_table():
+    return routing_probe
+
+
+@pytest.fixture
+def routing_app(tmp_path):
+    """App tối giản với 2 DB SQLite cục bộ: primary và replica (bind 'replica')."""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+        SQLALCHEMY_BINDS={'replica': f"sqlite:///{tmp_path / 'replica.db'}"},
+        DB_QUERY_WORKERS=4,
+    )
+    db.init_app(app)
+    with app.app_context():
+        for engine, source in ((db.engines[None], 'primary'), (db.engines['replica'], 'replica')):
+            ROUTING_METADATA.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(routing_probe.insert().values(id=1, source=source))
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def pg_app():
+    """
+    App đầy đủ (create_app) trên PostgreSQL dành cho test: TEST_DATABASE_URL trỏ tới DB
+    đã chạy database.sql và migrations/. Firebase không được khởi tạo, test tự giả lập token đã verify.
+    """
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('Cần TEST_DATABASE_URL (PostgreSQL đã có schema của app)')
+    from config import Config
+
+    # be/app có __init__.py nên tên "app" có thể trỏ tới package thay vì app.py: nạp thẳng theo đường dẫn
+    spec = importlib.util.spec_from_file_location('food_nutri_app', os.path.join(APP_DIR, 'app.py'))
+    app_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app_module)
+
+    patcher = pytest.MonkeyPatch()
+    patcher.setattr(Config, 'SQLALCHEMY_DATABASE_URI', url)
+    patcher.setattr(Config, 'SQLALCHEMY_BINDS', {})
+    patcher.setattr(app_module, 'init_firebase', lambda _app: None)
+    app = app_module.create_app()
+    app.config['TESTING'] = True
+    yield app
+    patcher.undo()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def pg_user(pg_app):
+    """
+    User đã hoàn tất thiết lập ban đầu (profile, settings, goal, 1 lần cân) trên DB test.
+    Trả về claims của token đã verify tương ứng; dữ liệu bị xoá sau test.
+    """
+    from user.models import Goal, User, UserProfile, UserSettings, WeightLog
+
+    provider_id = f'pytest-{uuid.uuid4().hex}'
+    email = f'{provider_id}@example.test'
+    with pg_app.app_context():
+        user = User(provider='password', provider_id=provider_id, email=email, display_name='Pytest User')
+        db.session.add(user)
+        db.session.flush()
+        user_id = user.user_id
+        db.session.add_all([
+            UserProfile(user_id=user_id, gender='male', date_of_birth=date(1990, 1, 1), height_cm=175),
+            UserSettings(user_id=user_id, timezone='Asia/Bangkok'),
+            Goal(user_id=user_id, goal_type='weight', target_value=70, goal_direction='giảm cân',
+                 start_date=date.today(), duration_weeks=10, weekly_rate=0.5),
+            WeightLog(user_id=user_id, weight_kg=80),
+        ])
+        db.session.commit()
+    yield {
+        'uid': provider_id,
+        'user_id': user_id,
+        'firebase': {'sign_in_provider': 'password'},
+        'email': email,
+        'name': 'Pytest User',
+        'picture': None,
+    }
+    with pg_app.app_context():
+        db.session.execute(User.__table__.delete().where(User.__table__.c.user_id == user_id))
+        db.session.commit()
@@ -0,0 +1,50 @@
+"""
+2 transaction cùng ghi log cho 1 user-ngày: rollup daily_user_summary phải khớp tổng log
+sau khi cả 2 commit (không mất cập nhật do snapshot READ COMMITTED của câu tính lại).
+"""
+import threading
+import time
+
+from sqlalchemy import func
+
+from day_window import local_today, user_timezone
+from extensions import db
+from summary.models import DailyUserSummary
+from summary.services import refresh_daily_summary
+from water.models import WaterLog
+
+
+def test_concurrent_refresh_keeps_rollup_in_sync(pg_app, pg_user):
+    user_id = pg_user['user_id']
+    first_refreshed = threading.Event()
+    errors = []
+
+    def log_water(amount, wait_for=None, hold_after_refresh=0.0):
+        try:
+            with pg_app.app_context():
+                if wait_for is not None:
+                    wait_for.wait(5)
+                db.session.add(WaterLog(user_id=user_id, intake_ml=amount))
+                db.session.flush()
+                refresh_daily_summary(user_id, local_today(user_timezone(user_id)))
+                if wait_for is None:
+                    first_refreshed.set()
+                    # Giữ transaction mở để transaction kia ghi log và tính lại trong lúc này
+                    time.sleep(hold_after_refresh)
+                db.session.commit()
+        except Exception as e:  # pragma: no cover - báo lỗi của thread về test
+            errors.append(e)
+
+    first = threading.Thread(target=log_water, args=(100,), kwargs={'hold_after_refresh': 0.5})
+    second = threading.Thread(target=log_water, args=(200,), kwargs={'wait_for': first_refreshed})
+    first.start()
+    second.start()
+    first.join(10)
+    second.join(10)
+    assert not errors
+
+    with pg_app.app_context():
+        logged = db.session.query(func.sum(WaterLog.intake_ml)).filter_by(user_id=user_id).scalar()
+        summary = DailyUserSummary.query.filter_by(user_id=user_id).one()
+        assert logged == 300
+        assert summary.water_ml == 300
@@ -0,0 +1,76 @@
+"""
+EXPLAIN đúng các câu SQL mà service dựng ra (get_aggregated_logs, get_recent_logs_for_user,
+fetch_daily_inputs): predicate thời gian nằm trong Index Cond của index (user_id, thời điểm)
+ở migrations/003_log_time_indexes.sql (index range scan, không lọc sau).
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from logs.services import get_aggregated_logs, get_recent_logs_for_user
+from user.nutrition import fetch_daily_inputs
+
+DAY = date(2025, 6, 1)
+
+CASES = [
+    pytest.param(lambda uid: get_aggregated_logs(uid, DAY, concurrent=False),
+                 'idx_water_log_user_logged_at', 'logged_at', id='aggregated_logs-water'),
+    pytest.param(lambda uid: get_aggregated_logs(uid, DAY, concurrent=False),
+                 'idx_exercise_log_user_logged_at', 'logged_at', id='aggregated_logs-exercise'),
+    pytest.param(lambda uid: get_recent_logs_for_user(uid, DAY),
+                 'idx_meal_user_created_at', 'created_at', id='recent_logs-meal'),
+    pytest.param(lambda uid: fetch_daily_inputs(uid, DAY),
+                 'idx_weight_log_user_logged_at', 'logged_at', id='daily_inputs-weight'),
+]
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _plan_nodes(child)
+
+
+def _captured_selects(call):
+    """Chạy service, trả về (sql, params) của các câu SELECT nó gửi xuống DB."""
+    captured = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, _executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return captured
+
+
+def _explain(statement, parameters):
+    # Bảng test gần như rỗng: tắt seq scan để planner cho biết index có dùng được cho predicate không
+    conn = db.session.connection()
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    return conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()[0]['Plan']
+
+
+@pytest.mark.parametrize('call, index_name, column', CASES)
+def test_service_query_uses_index_range_scan(pg_app, pg_user, call, index_name, column):
+    user_id = pg_user['user_id']
+    with pg_app.app_context():
+        try:
+            statements = _captured_selects(lambda: call(user_id))
+            scans = [
+                node
+                for statement, parameters in statements
+                for node in _plan_nodes(_explain(statement, parameters))
+                if node.get('Index Name') == index_name
+            ]
+        finally:
+            db.session.rollback()
+
+    assert scans, f'{index_name} không được dùng: {[s for s, _ in statements]}'
+    # Câu lệnh có thể quét index nhiều lần (vd. join lại meal chỉ theo user_id): cần ít nhất 1 lần quét theo cửa sổ
+    index_conds = [node.get('Index Cond', '') for node in scans]
+    assert any('user_id' in cond and column in cond for cond in index_conds), index_conds
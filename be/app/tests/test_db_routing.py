@@ -0,0 +1,58 @@
+import pytest
+from flask import g
+from sqlalchemy import select, text
+
+from db_routing import _is_read_statement, replica_safe
+from extensions import db
+
+
+@pytest.fixture
+def source_query(probe_table):
+    return select(probe_table.c.source)
+
+
+def _source(statement):
+    return db.session.execute(statement).scalar_one()
+
+
+def test_select_runs_on_replica(routing_app, source_query):
+    with routing_app.test_request_context():
+        g.db_replica_read = True
+        assert _source(source_query) == 'replica'
+
+
+def test_without_replica_read_uses_primary(routing_app, source_query):
+    with routing_app.test_request_context():
+        assert _source(source_query) == 'primary'
+
+
+def test_select_for_update_runs_on_primary(routing_app, source_query):
+    with routing_app.test_request_context():
+        g.db_replica_read = True
+        assert _source(source_query.with_for_update()) == 'primary'
+        # Đã lấy khoá trên primary: phần còn lại của request cũng đọc primary
+        assert _source(source_query) == 'primary'
+
+
+def test_raw_sql_runs_on_primary_unless_marked_safe(routing_app):
+    with routing_app.test_request_context():
+        g.db_replica_read = True
+        assert _source(replica_safe(text('SELECT source FROM routing_probe'))) == 'replica'
+        assert _source(text('SELECT source FROM routing_probe')) == 'primary'
+
+
+def test_write_pins_rest_of_request_to_primary(routing_app, probe_table, source_query):
+    with routing_app.test_request_context():
+        g.db_replica_read = True
+        assert _source(source_query) == 'replica'
+        db.session.execute(probe_table.update().where(probe_table.c.id == 1).values(source='primary'))
+        assert _source(source_query) == 'primary'
+        db.session.rollback()
+
+
+def test_read_statement_classification(probe_table, source_query):
+    assert _is_read_statement(source_query)
+    assert not _is_read_statement(source_query.with_for_update(read=True))
+    assert not _is_read_statement(text("SELECT nextval('food_log_log_id_seq')"))
+    assert not _is_read_statement(probe_table.insert().values(id=2, source='x'))
+    assert not _is_read_statement(None)
@@ -0,0 +1,56 @@
+"""
+Xoá món đang là nguyên liệu: công thức dùng nó và rollup ngày có log công thức đó được tính lại
+trong cùng transaction (dòng food_item_ingredients bị xoá theo ON DELETE CASCADE).
+"""
+from datetime import date
+
+from extensions import db
+from food.models import FoodItem, FoodItemIngredient
+from meal.models import Meal, MealEntry
+from summary.models import DailyUserSummary
+from summary.services import refresh_daily_summaries_for_foods
+
+
+def _food(user_id, name, calories, **kwargs):
+    return FoodItem(name=name, name_unsigned=name, serving_size=100, serving_unit='g', calories=calories,
+                    protein_g=0, carbs_g=0, fat_g=0, is_custom=True, created_by=user_id, **kwargs)
+
+
+def test_deleting_ingredient_recomputes_recipe_and_summary(pg_app, pg_user, monkeypatch):
+    monkeypatch.setattr('auth.decorators.verify_firebase_token', lambda _t: pg_user)
+    user_id = pg_user['user_id']
+    today = date.today()
+    with pg_app.app_context():
+        removed, kept = _food(user_id, 'pytest removed', 100), _food(user_id, 'pytest kept', 50)
+        recipe = _food(user_id, 'pytest recipe', 150, is_recipe=True)
+        recipe.serving_size = 200
+        db.session.add_all([removed, kept, recipe])
+        db.session.flush()
+        db.session.add_all([
+            FoodItemIngredient(recipe_id=recipe.food_item_id, ingredient_id=removed.food_item_id, quantity=100, unit='g'),
+            FoodItemIngredient(recipe_id=recipe.food_item_id, ingredient_id=kept.food_item_id, quantity=100, unit='g'),
+        ])
+        meal = Meal(user_id=user_id, name='Bữa trưa', meal_date=today)
+        db.session.add(meal)
+        db.session.flush()
+        db.session.add(MealEntry(meal_id=meal.meal_id, food_item_id=recipe.food_item_id, quantity=200, unit='g',
+                                 calories=150, protein_g=0, carbs_g=0, fat_g=0))
+        refresh_daily_summaries_for_foods([recipe.food_item_id])
+        db.session.commit()
+        removed_id, kept_id, recipe_id, meal_id = removed.food_item_id, kept.food_item_id, recipe.food_item_id, meal.meal_id
+        assert float(db.session.get(DailyUserSummary, (user_id, today)).calories) == 150
+
+    try:
+        response = pg_app.test_client().delete(
+            f'/api/v1/foods/{removed_id}/delete', headers={'Authorization': 'Bearer test-token'},
+        )
+        assert response.status_code == 200, response.get_json()
+
+        with pg_app.app_context():
+            assert float(db.session.get(FoodItem, recipe_id).calories) == 50
+            assert float(db.session.get(DailyUserSummary, (user_id, today)).calories) == 50
+    finally:
+        with pg_app.app_context():
+            db.session.execute(Meal.__table__.delete().where(Meal.meal_id == meal_id))
+            db.session.execute(FoodItem.__table__.delete().where(FoodItem.food_item_id.in_([recipe_id, kept_id, removed_id])))
+            db.session.commit()
@@ -0,0 +1,55 @@
+"""
+FoodIndexSync gỡ món bị xoá ở process khác theo food_item_deletions (migrations/010),
+kể cả khi xoá 1 + thêm 1 trong cùng chu kỳ làm số dòng không đổi.
+"""
+import uuid
+
+from extensions import db
+from food.index_sync import food_index_sync
+from food.models import FoodItem
+from food.search_index import food_index
+
+
+def _food(name, user_id):
+    return FoodItem(name=name, name_unsigned=name, serving_size=100, serving_unit='g', calories=100,
+                    protein_g=1, carbs_g=1, fat_g=1, is_custom=True, created_by=user_id)
+
+
+def _sync():
+    food_index_sync._checked_at = 0.0
+    food_index_sync.check()
+
+
+def _no_rebuild(*_args, **_kwargs):
+    raise AssertionError('Không được dựng lại toàn bộ index trong request')
+
+
+def test_delete_plus_insert_in_one_window_removes_deleted_food(pg_app, pg_user, monkeypatch):
+    user_id = pg_user['user_id']
+    tag = uuid.uuid4().hex[:12]
+    with pg_app.test_request_context():
+        assert food_index.ready
+        deleted = _food(f'pytestdeleted{tag}', user_id)
+        db.session.add(deleted)
+        db.session.commit()
+        deleted_id = deleted.food_item_id
+        # Dựng như lúc khởi động: các lần check sau chỉ còn áp delta / món bị xoá
+        food_index.build()
+        food_index_sync.mark_built()
+        assert food_index.search(f'pytestdeleted{tag}', user_id) == [deleted_id]
+
+        # Như 1 process khác: xoá thẳng trong DB rồi thêm món mới, index của process này không được báo
+        db.session.execute(FoodItem.__table__.delete().where(FoodItem.food_item_id == deleted_id))
+        added = _food(f'pytestadded{tag}', user_id)
+        db.session.add(added)
+        db.session.commit()
+        monkeypatch.setattr(food_index, 'build', _no_rebuild)
+        try:
+            _sync()
+            # Tìm kiếm là fuzzy (món mới có chung tag): chỉ kiểm tra id có / không còn trong kết quả
+            assert deleted_id not in food_index.search(f'pytestdeleted{tag}', user_id)
+            assert added.food_item_id in food_index.search(f'pytestadded{tag}', user_id)
+        finally:
+            db.session.delete(added)
+            db.session.commit()
+            food_index.remove(added.food_item_id)
@@ -0,0 +1,37 @@
+from flask import jsonify
+from sqlalchemy import select
+
+from db_routing import replica_read
+from extensions import db
+from parallel_queries import run_parallel
+
+
+def _source_reader(table):
+    return lambda: db.session.execute(select(table.c.source)).scalar_one()
+
+
+def test_parallel_reads_on_replica_read_route_use_replica(routing_app, probe_table):
+    read_source = _source_reader(probe_table)
+
+    @routing_app.route('/probe')
+    @replica_read
+    def probe():
+        return jsonify(run_parallel(read_source, read_source, read_source))
+
+    response = routing_app.test_client().get('/probe')
+
+    assert response.status_code == 200
+    # Câu đầu chạy ở thread của request, 2 câu sau chạy trên thread pool
+    assert response.get_json() == ['replica', 'replica', 'replica']
+
+
+def test_parallel_reads_without_replica_read_use_primary(routing_app, probe_table):
+    read_source = _source_reader(probe_table)
+
+    @routing_app.route('/probe')
+    def probe():
+        return jsonify(run_parallel(read_source, read_source))
+
+    response = routing_app.test_client().get('/probe')
+
+    assert response.get_json() == ['primary', 'primary']
@@ -0,0 +1,50 @@
+"""
+Read-your-writes dùng chung giữa các worker: mốc sticky nằm trong bảng replica_sticky
+(migrations/009) chứ không trong RAM của process đã xử lý request ghi.
+"""
+from flask import g
+
+from db_routing import replica_read, sticky_writes
+from extensions import db
+from user.models import User
+from water.models import WaterLog
+
+
+def _reads_from_replica(app, user_id):
+    """1 request @replica_read mới (như ở 1 worker khác): có được đọc replica không."""
+    @replica_read
+    def view():
+        return bool(g.get('db_replica_read'))
+
+    with app.test_request_context():
+        g.current_user = db.session.get(User, user_id)
+        try:
+            return view()
+        finally:
+            db.session.rollback()
+
+
+def test_committed_write_pins_reads_to_primary(pg_app, pg_user, monkeypatch):
+    monkeypatch.setattr(sticky_writes, 'enabled', True)
+    user_id = pg_user['user_id']
+
+    assert _reads_from_replica(pg_app, user_id)
+
+    with pg_app.test_request_context():
+        g.current_user = db.session.get(User, user_id)
+        db.session.add(WaterLog(user_id=user_id, intake_ml=250))
+        db.session.commit()
+
+    assert not _reads_from_replica(pg_app, user_id)
+
+
+def test_read_only_request_does_not_pin(pg_app, pg_user, monkeypatch):
+    monkeypatch.setattr(sticky_writes, 'enabled', True)
+    user_id = pg_user['user_id']
+
+    with pg_app.test_request_context():
+        g.current_user = db.session.get(User, user_id)
+        db.session.query(WaterLog).filter_by(user_id=user_id).all()
+        db.session.commit()
+
+    assert _reads_from_replica(pg_app, user_id)
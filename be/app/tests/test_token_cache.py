@@ -0,0 +1,159 @@
+"""
+FirebaseTokenVerifier với "issuer" giả lập cục bộ: khoá RSA + chứng chỉ tự ký sinh trong test,
+bộ key được cấp qua hook fetch của FirebaseKeySet (không gọi mạng).
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('cryptography')
+pytest.importorskip('google.auth')
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt as google_jwt
+
+from auth import token_cache
+from auth.token_cache import FirebaseKeySet, FirebaseTokenVerifier, TokenCache
+
+PROJECT_ID = 'food-nutri-test'
+
+
+def _make_key_pair():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'securetoken.test')])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class LocalIssuer:
+    """Đóng vai securetoken: giữ khoá riêng để ký, công bố chứng chỉ của các kid đang dùng."""
+
+    def __init__(self):
+        self.private_keys = {}
+        self.published = {}
+        self.fetch_count = 0
+
+    def add_key(self, kid):
+        self.private_keys[kid], self.published[kid] = _make_key_pair()
+
+    def retire_key(self, kid):
+        self.published.pop(kid, None)
+
+    def fetch(self, _url):
+        self.fetch_count += 1
+        return dict(self.published), 3600
+
+    def sign(self, kid, uid='user-1', lifetime=3600, signing_kid=None):
+        now = int(time.time())
+        payload = {
+            'iss': f'https://securetoken.google.com/{PROJECT_ID}',
+            'aud': PROJECT_ID,
+            'sub': uid,
+            'iat': now,
+            'auth_time': now,
+            'exp': now + lifetime,
+        }
+        signer = crypt.RSASigner.from_string(self.private_keys[signing_kid or kid], key_id=kid)
+        return google_jwt.encode(signer, payload).decode('ascii')
+
+
+@pytest.fixture
+def issuer():
+    issuer = LocalIssuer()
+    issuer.add_key('key-a')
+    return issuer
+
+
+def _verifier(issuer, min_ttl=0):
+    keyset = FirebaseKeySet(fetch=issuer.fetch, min_ttl=min_ttl)
+    keyset.preload()
+    return FirebaseTokenVerifier(PROJECT_ID, keyset=keyset, cache=TokenCache(100), clock_skew_seconds=0)
+
+
+def test_second_verify_is_served_from_cache(issuer, monkeypatch):
+    verifier = _verifier(issuer)
+    token = issuer.sign('key-a')
+    decode_calls = []
+    real_decode = token_cache.google_jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decode_calls.append(1)
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(token_cache.google_jwt, 'decode', counting_decode)
+
+    first = verifier.verify(token)
+    second = verifier.verify(token)
+
+    assert first['uid'] == second['uid'] == 'user-1'
+    assert len(decode_calls) == 1
+
+
+def test_cache_entry_evicted_at_exp(issuer):
+    verifier = _verifier(issuer)
+    token = issuer.sign('key-a', lifetime=120)
+    claims = verifier.verify(token)
+
+    assert verifier.cache.get(token, now=claims['exp'] - 1) is not None
+    assert verifier.cache.get(token, now=claims['exp']) is None
+    # Entry hết hạn bị xoá hẳn, lần verify sau phải kiểm tra lại chữ ký
+    assert verifier.cache.get(token) is None
+
+
+def test_unknown_kid_triggers_refresh(issuer):
+    verifier = _verifier(issuer)
+    assert issuer.fetch_count == 1
+
+    issuer.add_key('key-b')
+    claims = verifier.verify(issuer.sign('key-b'))
+
+    assert claims['uid'] == 'user-1'
+    assert issuer.fetch_count == 2
+
+
+def test_unknown_kid_refresh_is_rate_limited(issuer):
+    verifier = _verifier(issuer, min_ttl=60)
+    issuer.add_key('key-b')
+
+    with pytest.raises(ValueError):
+        verifier.verify(issuer.sign('key-b'))
+    # Vừa tải key trong min_ttl giây: kid lạ không được ép tải lại
+    assert issuer.fetch_count == 1
+
+
+def test_rotated_out_key_is_rejected(issuer):
+    verifier = _verifier(issuer)
+    issuer.add_key('key-b')
+    issuer.retire_key('key-a')
+    verifier.keyset.refresh()
+
+    with pytest.raises(ValueError):
+        verifier.verify(issuer.sign('key-a'))
+    assert verifier.verify(issuer.sign('key-b'))['uid'] == 'user-1'
+
+
+def test_token_signed_with_wrong_key_is_rejected(issuer):
+    verifier = _verifier(issuer)
+    issuer.add_key('key-b')
+    verifier.keyset.refresh()
+
+    # Header ghi key-a nhưng chữ ký bằng key-b
+    with pytest.raises(ValueError):
+        verifier.verify(issuer.sign('key-a', signing_kid='key-b'))
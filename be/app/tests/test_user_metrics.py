@@ -0,0 +1,43 @@
+"""
+GET /api/v1/users/metrics đi qua đầy đủ firebase_required, user context và target_writer
+mà không phát sinh câu ghi nào (INSERT / UPDATE / DELETE).
+"""
+import re
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from user.target_writer import target_writer
+
+# Cả câu ghi nằm trong CTE (WITH ... INSERT) và SELECT ... FOR UPDATE
+_WRITE_RE = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE)\b', re.IGNORECASE)
+
+
+def test_get_metrics_performs_no_writes(pg_app, pg_user, monkeypatch):
+    monkeypatch.setattr('auth.decorators.verify_firebase_token', lambda _token: pg_user)
+    # Target lệch được xếp hàng cho thread ghi trễ; không cho thread đó chạy trong lúc đếm
+    scheduled = []
+    monkeypatch.setattr(target_writer, 'schedule', lambda user_id, target: scheduled.append(target))
+    monkeypatch.setattr(target_writer, 'flush', lambda: None)
+
+    writes = []
+
+    def record_writes(_conn, _cursor, statement, *_args):
+        if _WRITE_RE.search(statement):
+            writes.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record_writes)
+    try:
+        client = pg_app.test_client()
+        headers = {'Authorization': 'Bearer test-token'}
+        # Lần 1: user context chưa có trong cache; lần 2: lấy từ cache
+        first = client.get('/api/v1/users/metrics', headers=headers)
+        second = client.get('/api/v1/users/metrics', headers=headers)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record_writes)
+
+    assert first.status_code == 200, first.get_data(as_text=True)
+    assert second.status_code == 200
+    assert writes == []
+    # default_target_calories chưa có: giá trị mới chỉ được xếp hàng, không ghi trong request
+    assert scheduled
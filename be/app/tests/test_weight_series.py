@@ -0,0 +1,19 @@
+"""GET /api/v1/users/weight_logs/series với user đã có goal (goals.start_date là cột DATE)."""
+from datetime import date, timedelta
+
+
+def test_weight_series_with_goal(pg_app, pg_user, monkeypatch):
+    monkeypatch.setattr('auth.decorators.verify_firebase_token', lambda _token: pg_user)
+
+    response = pg_app.test_client().get(
+        '/api/v1/users/weight_logs/series', headers={'Authorization': 'Bearer test-token'},
+    )
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.get_json()
+    assert body['total_points'] == 1
+    assert body['points'][0]['weight_kg'] == 80.0
+    projection = body['projection']
+    assert projection['target_weight_kg'] == 70.0
+    # Goal bắt đầu hôm nay, kéo dài 10 tuần
+    assert projection['goal_end_date'] == (date.today() + timedelta(weeks=10)).isoformat()
@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from db_routing import replica_safe
+from extensions import db
+from user.models import Goal, User, UserProfile, UserSettings
+
+# Các claim trong Firebase token được đồng bộ xuống bảng users
+_CLAIM_FIELDS = (
+    ('email', 'email'),
+    ('display_name', 'name'),
+    ('avatar_url', 'picture'),
+)
+
+# Version dữ liệu của 1 user (users, user_profile, user_settings, goal mới nhất), tính ngay trong DB.
+# Dùng để phát hiện thay đổi do process khác ghi (invalidate chỉ xoá cache của process hiện tại).
+_VERSION_SQL = replica_safe(text("""
+SELECT md5(concat_ws('|', u.updated_at, p.updated_at, s::text, (
+    SELECT g::text FROM goals g WHERE g.user_id = u.user_id ORDER BY g.created_at DESC LIMIT 1
+)))
+FROM users u
+LEFT JOIN user_profile p ON p.user_id = u.user_id
+LEFT JOIN user_settings s ON s.user_id = u.user_id
+WHERE u.user_id = :user_id
+"""))
+
+
+class UserContext:
+    """
+    Ngữ cảnh người dùng của 1 request: User, UserProfile, UserSettings và Goal đang áp dụng.
+    """
+    __slots__ = ('user', 'profile', 'settings', 'goal')
+
+    def __init__(self, user, profile=None, settings=None, goal=None):
+        self.user = user
+        self.profile = profile
+        self.settings = settings
+        self.goal = goal
+
+
+class _Entry:
+    __slots__ = ('ctx', 'expires_at', 'version', 'checked_at')
+
+    def __init__(self, ctx, expires_at, version, checked_at):
+        self.ctx = ctx
+        self.expires_at = expires_at
+        self.version = version
+        self.checked_at = checked_at
+
+
+class UserContextCache:
+    """
+    Cache LRU (có TTL) theo Firebase uid, lưu bản sao detached của các row kèm version dữ liệu.
+    Mỗi request merge(load=False) bản sao vào session nên không tốn truy vấn nạp lại,
+    và UserProfile.query.get(...) trong request sẽ lấy từ identity map.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (uid, provider) -> _Entry
+        self._keys_by_user_id = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry.expires_at:
+                self._drop_locked(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, ctx, ttl, version=None):
+        with self._lock:
+            now = time.time()
+            self._entries[key] = _Entry(ctx, now + ttl, version, now)
+            self._entries.move_to_end(key)
+            self._keys_by_user_id[ctx.user.user_id] = key
+            while len(self._entries) > self.max_size:
+                oldest, _ = next(iter(self._entries.items()))
+                self._drop_locked(oldest)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            key = self._keys_by_user_id.get(user_id)
+            if key is not None:
+                self._drop_locked(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user_id.clear()
+
+    def _drop_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._keys_by_user_id.pop(entry.ctx.user.user_id, None)
+
+
+user_context_cache = UserContextCache()
+
+
+def get_user_context(decoded_token):
+    """
+    Trả về UserContext (các object đã gắn vào db.session) cho token đã verify.
+    Chỉ ghi DB khi user chưa tồn tại hoặc claim trong token khác với row đã lưu.
+    """
+    key = (decoded_token.get('uid'), decoded_token.get('firebase', {}).get('sign_in_provider'))
+    entry = user_context_cache.get(key)
+    if entry is not None and not _claims_changed(entry.ctx.user, decoded_token) and _is_current(entry):
+        return _bind(entry.ctx)
+
+    from user.services import upsert_user_from_firebase
+    user = upsert_user_from_firebase(decoded_token)
+    # Đọc version TRƯỚC khi nạp profile/settings/goal: có ghi xen giữa thì bản cache mang version cũ
+    # và bị nạp lại ở lần kiểm tra sau, thay vì dữ liệu cũ đi kèm version mới (không bao giờ bị phát hiện)
+    version = _read_version(user.user_id)
+    ctx = _load_related(user)
+    user_context_cache.set(key, _detach(ctx), current_app.config.get('USER_CONTEXT_TTL_SECONDS', 300), version)
+    return ctx
+
+
+def invalidate_user_context(user_id):
+    """
+    Xoá cache của user (gọi sau khi commit thay đổi profile / settings / goal).
+    """
+    user_context_cache.invalidate(user_id)
+    if getattr(g, 'user_context', None) is not None and g.user_context.user.user_id == user_id:
+        g.user_context = None
+
+
+def current_user_context():
+    """
+    UserContext của request hiện tại; nạp lại nếu đã bị invalidate trong request.
+    """
+    ctx = getattr(g, 'user_context', None)
+    if ctx is None:
+        ctx = _load_related(g.current_user)
+        g.user_context = ctx
+    return ctx
+
+
+# --- internal ---
+
+def _read_version(user_id):
+    return db.session.execute(_VERSION_SQL, {'user_id': user_id}).scalar()
+
+
+def _is_current(entry):
+    """
+    Bản cache còn khớp DB không. Tối đa mỗi USER_CONTEXT_CHECK_SECONDS giây so version 1 lần
+    (1 truy vấn 1 dòng thay vì nạp lại cả ngữ cảnh); các request dồn dập của cùng user dùng luôn bản cache.
+    """
+    now = time.time()
+    if now - entry.checked_at < current_app.config.get('USER_CONTEXT_CHECK_SECONDS', 2):
+        return True
+    if _read_version(entry.ctx.user.user_id) != entry.version:
+        return False
+    entry.checked_at = now
+    return True
+
+
+def _claims_changed(user, decoded_token):
+    return any(getattr(user, field) != decoded_token.get(claim) for field, claim in _CLAIM_FIELDS)
+
+
+def _load_related(user):
+    profile, settings = (
+        db.session.query(UserProfile, UserSettings)
+        .select_from(User)
+        .outerjoin(UserProfile, UserProfile.user_id == User.user_id)
+        .outerjoin(UserSettings, UserSettings.user_id == User.user_id)
+        .filter(User.user_id == user.user_id)
+        .one()
+    )
+    goal = (Goal.query
+            .filter_by(user_id=user.user_id)
+            .order_by(Goal.created_at.desc())
+            .first())
+    return UserContext(user, profile, settings, goal)
+
+
+def _detached_copy(obj):
+    if obj is None:
+        return None
+    mapper = inspect(obj).mapper
+    copy = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(copy, attr.key, getattr(obj, attr.key))
+    make_transient_to_detached(copy)
+    return copy
+
+
+def _detach(ctx):
+    return UserContext(*(_detached_copy(obj) for obj in (ctx.user, ctx.profile, ctx.settings, ctx.goal)))
+
+
+def _bind(cached):
+    return UserContext(*(
+        db.session.merge(obj, load=False) if obj is not None else None
+        for obj in (cached.user, cached.profile, cached.settings, cached.goal)
+    ))
@@ -0,0 +1,166 @@
+"""
+Chỉ số dinh dưỡng cho nhiều ngày (biểu đồ tuần / tháng): GET /api/v1/users/metrics/range.
+
+Cả khoảng chỉ tốn 2 câu SQL: các dòng rollup daily_user_summary của khoảng ngày
+(đã gom theo ngày từ meal / water / exercise) và các lần cân trong khoảng.
+Các chỉ số theo ngày được tính vector hoá bằng NumPy với cùng công thức như compute_user_metrics.
+"""
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func
+
+from extensions import db
+from summary.models import DailyUserSummary
+from user.models import WeightLog
+from user.nutrition import activity_factor_from_sessions, calorie_adjustment
+from day_window import day_bounds, range_bounds, user_timezone
+from parallel_queries import fetch_all
+
+MAX_RANGE_DAYS = 366
+WINDOW_DAYS = 7
+
+# Ngưỡng số buổi tập / tuần của activity_factor_from_sessions
+_SESSION_LEVELS = (0, 3, 5, 7)
+
+
+def compute_metrics_range(user_id, prof, goal, start_day, end_day):
+    """
+    Chỉ số theo từng ngày từ start_day tới end_day (giờ địa phương của user).
+    Trả về list dict theo ngày; ngày chưa có cân nặng nào trước đó có target / remaining = None.
+    """
+    if not prof or not prof.height_cm or not prof.date_of_birth:
+        raise ValueError("Thiếu chiều cao hoặc ngày sinh để tính chỉ số.")
+    if end_day < start_day:
+        raise ValueError('`to` must not be before `from`')
+    if (end_day - start_day).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f'Range must not exceed {MAX_RANGE_DAYS} days')
+
+    # Lấy thêm 6 ngày trước start_day cho số buổi tập / tuần và trung bình trượt
+    load_start = start_day - timedelta(days=WINDOW_DAYS - 1)
+    n_load = (end_day - load_start).days + 1
+    tz = user_timezone(user_id)
+    range_start, range_end = range_bounds(load_start, end_day, tz)
+
+    summaries = (
+        db.session.query(
+            DailyUserSummary.summary_date,
+            DailyUserSummary.calories,
+            DailyUserSummary.protein_g,
+            DailyUserSummary.carbs_g,
+            DailyUserSummary.fat_g,
+            DailyUserSummary.water_ml,
+            DailyUserSummary.met_minutes,
+            DailyUserSummary.has_exercise,
+        )
+        .filter(DailyUserSummary.user_id == user_id)
+        .filter(DailyUserSummary.summary_date.between(load_start, end_day))
+    )
+    # Lần cân cuối cùng trước khoảng + mọi lần cân trong khoảng
+    last_before = (
+        db.session.query(func.max(WeightLog.logged_at))
+        .filter(WeightLog.user_id == user_id, WeightLog.logged_at < range_start)
+        .scalar_subquery()
+    )
+    weights = (
+        db.session.query(WeightLog.logged_at, WeightLog.weight_kg)
+        .filter(WeightLog.user_id == user_id)
+        .filter(WeightLog.logged_at >= func.coalesce(last_before, range_start))
+        .filter(WeightLog.logged_at < range_end)
+        .order_by(WeightLog.logged_at)
+    )
+    summary_rows, weight_rows = fetch_all(summaries, weights)
+
+    # --- Chuỗi theo ngày (kể cả 6 ngày đệm) ---
+    consumed = np.zeros(n_load)
+    protein = np.zeros(n_load)
+    carbs = np.zeros(n_load)
+    fat = np.zeros(n_load)
+    water = np.zeros(n_load)
+    met_minutes = np.zeros(n_load)
+    exercised = np.zeros(n_load)
+    for row in summary_rows:
+        i = (row.summary_date - load_start).days
+        consumed[i] = float(row.calories)
+        protein[i] = float(row.protein_g)
+        carbs[i] = float(row.carbs_g)
+        fat[i] = float(row.fat_g)
+        water[i] = row.water_ml
+        met_minutes[i] = float(row.met_minutes)
+        exercised[i] = row.has_exercise
+
+    load_days = [load_start + timedelta(days=i) for i in range(n_load)]
+    view = slice(WINDOW_DAYS - 1, None)
+    days = load_days[view]
+
+    weight_all = _weight_as_of(weight_rows, load_days, tz)
+    burned_all = np.round(met_minutes * np.nan_to_num(weight_all) / 60, 2)
+    weight = weight_all[view]
+    burned = burned_all[view]
+    # Số ngày có tập trong 7 ngày tính tới mỗi ngày
+    sessions = np.rint(_rolling_sum(exercised)[view])
+
+    # --- BMR / TDEE / target (giống compute_user_metrics) ---
+    height = float(prof.height_cm)
+    age = np.array([(d - prof.date_of_birth).days // 365 for d in days])
+    gender = (prof.gender or 'male').lower()
+    bmr = np.round(10 * weight + 6.25 * height - 5 * age + (5 if gender == 'male' else -161))
+    factors = np.select(
+        [sessions <= level for level in _SESSION_LEVELS],
+        [activity_factor_from_sessions(level) for level in _SESSION_LEVELS],
+        default=activity_factor_from_sessions(WINDOW_DAYS + 1),
+    )
+    tdee = np.round(bmr * factors)
+    adjustment = calorie_adjustment(goal.goal_direction, goal.weekly_rate) if goal else 0
+    target = np.maximum(tdee + adjustment, np.maximum(1200, bmr * 1.1))
+    remaining = target - np.round(consumed[view], 2) + burned
+
+    series = {
+        'calories_consumed': consumed,
+        'calories_burned': burned_all,
+        'protein': protein,
+        'carbs': carbs,
+        'fat': fat,
+        'water_intake_ml': water,
+    }
+    averages = {key: np.round(_rolling_sum(values)[view] / WINDOW_DAYS, 1) for key, values in series.items()}
+
+    result = []
+    for i, day in enumerate(days):
+        j = i + WINDOW_DAYS - 1
+        has_weight = not np.isnan(weight[i])
+        result.append({
+            'date': day.isoformat(),
+            'calories_consumed': int(round(consumed[j])),
+            'macros_consumed': {
+                'protein': round(protein[j], 1),
+                'carbs': round(carbs[j], 1),
+                'fat': round(fat[j], 1),
+            },
+            'water_intake_ml': int(water[j]),
+            'calories_burned': int(round(burned[i])),
+            'sessions': int(sessions[i]),
+            'target_calories': int(round(target[i])) if has_weight else None,
+            'remaining_calories': int(round(remaining[i])) if has_weight else None,
+            'avg_7d': {key: float(values[i]) for key, values in averages.items()},
+        })
+    return result
+
+
+def _rolling_sum(values):
+    """Tổng trượt WINDOW_DAYS phần tử (tính tới và gồm phần tử hiện tại); các phần tử đầu cộng ít hơn."""
+    cumulative = np.cumsum(values)
+    shifted = np.concatenate([np.zeros(WINDOW_DAYS), cumulative[:-WINDOW_DAYS]])
+    return cumulative - shifted[:len(values)]
+
+
+def _weight_as_of(weight_rows, days, tz):
+    """Cân nặng gần nhất tính tới hết mỗi ngày (NaN nếu chưa từng cân)."""
+    if not weight_rows:
+        return np.full(len(days), np.nan)
+    logged = np.array([row.logged_at.timestamp() for row in weight_rows])
+    values = np.array([float(row.weight_kg) for row in weight_rows])
+    day_ends = np.array([day_bounds(day, tz)[1].timestamp() for day in days])
+    # Chỉ số lần cân cuối cùng có logged_at < cuối ngày
+    idx = np.searchsorted(logged, day_ends, side='left') - 1
+    return np.where(idx >= 0, values[np.clip(idx, 0, None)], np.nan)
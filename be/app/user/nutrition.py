@@ -1,11 +1,10 @@
 from datetime import date, timedelta
 from decimal import Decimal
-from sqlalchemy import func
+from sqlalchemy import and_, func
 from extensions import db
-from exercise.models import ExerciseLog, ExerciseType
-from meal.models import Meal, MealEntry
-from food.models import FoodItem
-from water.models import WaterLog
+from summary.models import DailyUserSummary
+from user.models import WeightLog
+from day_window import day_bounds, user_timezone
 
 def calculate_bmi(weight_kg: float, height_cm: float) -> float:
     h = height_cm / 100  # Convert cm to meters
@@ -38,6 +37,19 @@ def calculate_tdee(bmr: float, sessions_per_week: int) -> int:
     """Calculate Total Daily Energy Expenditure (TDEE)."""
     return round(bmr * activity_factor_from_sessions(sessions_per_week))
 
+def calorie_adjustment(goal_direction: str, weekly_rate: float) -> int:
+    """Mức kcal cộng / trừ mỗi ngày so với TDEE theo mục tiêu (7700 kcal ~ 1kg, tối đa 1200)."""
+    daily_adjustment = min(round((float(weekly_rate) * 7700) / 7), 1200)  # tránh mục tiêu nguy hiểm
+    if goal_direction == 'giảm cân':
+        return -daily_adjustment
+    if goal_direction == 'tăng cân':
+        return daily_adjustment
+    return 0
+
+def minimum_target_calories(bmr: float) -> float:
+    """Giới hạn target_calories tối thiểu."""
+    return max(1200, bmr * 1.1)
+
 def calculate_macros(calories: int, goal_direction: str, macro_style: str = 'default') -> dict:
     if macro_style == 'keto':
         protein_pct = 0.20
@@ -75,15 +87,21 @@ def calculate_macros(calories: int, goal_direction: str, macro_style: str = 'def
 
 
 
+def fetch_day_summary(user_id: int, for_date: date):
+    """Dòng rollup daily_user_summary của 1 user-ngày (None nếu chưa có log)."""
+    return DailyUserSummary.query.get((user_id, for_date))
+
+
 def fetch_exercise_sessions(user_id: int, for_date: date) -> int:
+    """Số ngày có tập luyện trong 7 ngày tính tới for_date (đọc tối đa 7 dòng rollup)."""
     week_ago = for_date - timedelta(days=6)
     days_with_session = (
-        db.session.query(func.date(ExerciseLog.logged_at))
-        .filter(ExerciseLog.user_id == user_id)
-        .filter(ExerciseLog.logged_at >= week_ago)
-        .filter(func.date(ExerciseLog.logged_at) <= for_date)
-        .group_by(func.date(ExerciseLog.logged_at))
-        .count()
+        db.session.query(func.count())
+        .select_from(DailyUserSummary)
+        .filter(DailyUserSummary.user_id == user_id)
+        .filter(DailyUserSummary.summary_date.between(week_ago, for_date))
+        .filter(DailyUserSummary.has_exercise == True)
+        .scalar()
     )
     return int(days_with_session or 0)
 
@@ -91,65 +109,34 @@ def fetch_exercise_sessions(user_id: int, for_date: date) -> int:
 def estimate_calories_burned(met: float, weight_kg: float, duration_min: int) -> float:
     return round(float(met) * float(weight_kg) * (duration_min / 60), 2)
 
-def fetch_exercise_burned(user_id: int, for_date: date, weight_kg: float) -> tuple[float, int]:
-    logs = (db.session.query(ExerciseLog, ExerciseType)
-            .join(ExerciseType, ExerciseLog.exercise_type_id == ExerciseType.exercise_type_id)
-            .filter(ExerciseLog.user_id == user_id)
-            .filter(func.date(ExerciseLog.logged_at) == for_date)
-            .all())
-
-    total_calories = 0
-    count = 0
+def burned_from_met_minutes(met_minutes, weight_kg: float) -> float:
+    """kcal tiêu hao = Σ(MET × phút) × cân nặng / 60."""
+    return round(float(met_minutes or 0) * float(weight_kg or 0) / 60, 2)
 
-    for log, ex_type in logs:
-        met = ex_type.mets or 1.0
-        calories = estimate_calories_burned(met, weight_kg, log.duration_min)
-        total_calories += calories
-        count += 1
-
-    return total_calories, count
+def fetch_exercise_burned(user_id: int, for_date: date, weight_kg: float) -> tuple[float, int]:
+    summary = fetch_day_summary(user_id, for_date)
+    if summary is None:
+        return 0, 0
+    return burned_from_met_minutes(summary.met_minutes, weight_kg), summary.exercise_count
 
 def fetch_calories_consumed(user_id: int, for_date: date) -> float:
-    entries = (
-        db.session.query(MealEntry, FoodItem)
-        .join(Meal, Meal.meal_id == MealEntry.meal_id)
-        .join(FoodItem, FoodItem.food_item_id == MealEntry.food_item_id)
-        .filter(Meal.user_id == user_id)
-        .filter(Meal.meal_date == for_date)
-        .all()
-    )
-
-    total = 0.0
-    for entry, food in entries:
-        ratio = float(entry.quantity) / float(food.serving_size) if food.serving_size else 1
-        total += ratio * float(food.calories)
-
-    return round(total, 2)
+    summary = fetch_day_summary(user_id, for_date)
+    return round(float(summary.calories), 2) if summary else 0.0
 def fetch_macros_consumed(user_id: int, for_date: date) -> dict:
     """
-    Sum protein, carbs, fat đã ăn trong ngày, dựa trên MealEntry × FoodItem.
+    Sum protein, carbs, fat đã ăn trong ngày (đọc từ rollup daily_user_summary).
     Trả về dict với keys: protein_g, carbs_g, fat_g (float, grams).
     """
-    entries = (
-        db.session.query(MealEntry, FoodItem)
-        .join(Meal, Meal.meal_id == MealEntry.meal_id)
-        .join(FoodItem, FoodItem.food_item_id == MealEntry.food_item_id)
-        .filter(Meal.user_id == user_id)
-        .filter(Meal.meal_date == for_date)
-        .all()
-    )
-
-    total_p, total_c, total_f = 0.0, 0.0, 0.0
-    for entry, food in entries:
-        ratio = float(entry.quantity) / float(food.serving_size) if food.serving_size else 1
-        total_p += ratio * float(food.protein_g)
-        total_c += ratio * float(food.carbs_g)
-        total_f += ratio * float(food.fat_g)
+    summary = fetch_day_summary(user_id, for_date)
+    return macros_from_summary(summary)
 
+def macros_from_summary(summary) -> dict:
+    if summary is None:
+        return {'protein_g': 0.0, 'carbs_g': 0.0, 'fat_g': 0.0}
     return {
-        'protein_g': round(total_p, 1),
-        'carbs_g':   round(total_c, 1),
-        'fat_g':     round(total_f, 1),
+        'protein_g': round(float(summary.protein_g), 1),
+        'carbs_g':   round(float(summary.carbs_g), 1),
+        'fat_g':     round(float(summary.fat_g), 1),
     }
 
     # --- Water ---
@@ -157,10 +144,54 @@ def fetch_macros_consumed(user_id: int, for_date: date) -> dict:
 
 def fetch_water_intake(user_id: int, for_date: date) -> int:
     """Tổng ml nước đã uống trong ngày."""
-    total_ml = (
-        db.session.query(func.sum(WaterLog.intake_ml))
-        .filter(WaterLog.user_id == user_id)
-        .filter(func.date(WaterLog.logged_at) == for_date)
-        .scalar()
-    ) or 0
-    return int(total_ml)
\ No newline at end of file
+    summary = fetch_day_summary(user_id, for_date)
+    return int(summary.water_ml) if summary else 0
+
+
+def fetch_daily_inputs(user_id: int, for_date: date) -> dict:
+    """
+    Lấy toàn bộ dữ liệu đầu vào của 1 user-ngày trong MỘT câu SQL:
+    cân nặng gần nhất, dòng rollup của ngày và số ngày có tập trong tuần.
+    """
+    week_ago = for_date - timedelta(days=6)
+    _, day_end = day_bounds(for_date, user_timezone(user_id))
+
+    weight_kg = (
+        db.session.query(WeightLog.weight_kg)
+        .filter(WeightLog.user_id == user_id)
+        .filter(WeightLog.logged_at < day_end)
+        .order_by(WeightLog.logged_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    sessions = (
+        db.session.query(func.count().label('sessions'))
+        .select_from(DailyUserSummary)
+        .filter(DailyUserSummary.user_id == user_id)
+        .filter(DailyUserSummary.summary_date.between(week_ago, for_date))
+        .filter(DailyUserSummary.has_exercise == True)
+        .cte('sessions')
+    )
+
+    row = (
+        db.session.query(weight_kg.label('weight_kg'), sessions.c.sessions, DailyUserSummary)
+        .select_from(sessions)
+        .outerjoin(DailyUserSummary, and_(
+            DailyUserSummary.user_id == user_id,
+            DailyUserSummary.summary_date == for_date,
+        ))
+        .one()
+    )
+    summary = row.DailyUserSummary
+    weight = row.weight_kg
+
+    return {
+        'current_weight_kg': weight,
+        'sessions': int(row.sessions),
+        'calories_consumed': round(float(summary.calories), 2) if summary else 0.0,
+        'macros_consumed': macros_from_summary(summary),
+        'calories_burned': burned_from_met_minutes(summary.met_minutes, weight) if summary else 0,
+        'exercise_count': summary.exercise_count if summary else 0,
+        'water_intake_ml': int(summary.water_ml) if summary else 0,
+    }
@@ -1,9 +1,15 @@
-from flask import Blueprint, json, request, jsonify, g
-from sqlalchemy import func
+from flask import Blueprint, request, jsonify, g
 from auth.decorators import firebase_required
-from user.services import complete_initial_setup, delete_user_account, get_weight_logs, log_weight, upsert_profile, upsert_settings, compute_user_metrics
-from user.models import User, UserProfile, UserSettings, WeightLog, Goal
-from datetime import datetime, date as DateType
+from db_routing import replica_read
+from user.services import complete_initial_setup, delete_user_account, get_weight_logs, log_weight, upsert_profile, upsert_settings, compute_user_metrics, get_metrics_goal
+from user.models import WeightLog
+from user.context import current_user_context
+from user.nutrition import fetch_daily_inputs
+from user.metrics_range import compute_metrics_range
+from user.weight_series import build_weight_series
+from user.target_writer import target_writer
+from day_window import day_bounds, local_today, user_timezone
+from datetime import datetime
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/v1/users')
 
@@ -12,8 +18,9 @@ user_bp = Blueprint('user', __name__, url_prefix='/api/v1/users')
 def profile():
     uid = g.current_user.user_id
     if request.method == 'GET':
-        user = User.query.get(uid)
-        prof = UserProfile.query.get(uid)
+        ctx = current_user_context()
+        user = ctx.user
+        prof = ctx.profile
         
         # Cân nặng bắt đầu: log sớm nhất
         start_weight = (WeightLog.query
@@ -22,10 +29,7 @@ def profile():
                         .first())
 
         # Cân nặng mục tiêu: từ goal hiện tại
-        goal = (Goal.query
-                .filter_by(user_id=uid)
-                .order_by(Goal.created_at.desc())
-                .first())
+        goal = ctx.goal
 
         return jsonify({
             'uid': uid,
@@ -62,7 +66,7 @@ def settings():
     """
     uid = g.current_user.user_id
     if request.method == 'GET':
-        sett = UserSettings.query.get(uid)
+        sett = current_user_context().settings
         return jsonify({ field: getattr(sett, field) for field in (
             'locale', 'timezone', 'weight_unit', 'energy_unit',
             'default_target_calories', 'drink_water_reminder', 'meal_reminder'
@@ -117,35 +121,39 @@ def setup():
 
 @user_bp.route('/metrics', methods=['GET'])
 @firebase_required()
+@replica_read
 def metrics():
     uid = g.current_user.user_id
-    prof = UserProfile.query.get(uid)
+    ctx = current_user_context()
+    prof = ctx.profile
 
     # 1) Parse ngày truyền lên (yyyy-MM-dd). Nếu không có, dùng hôm nay.
     date_str = request.args.get('date', None)
-    # Khởi trước for_date để chắc chắn nó luôn tồn tại
-    for_date = DateType.today()
+    # Khởi trước for_date để chắc chắn nó luôn tồn tại (hôm nay theo múi giờ của user)
+    for_date = local_today(user_timezone(uid))
     if date_str:
         try:
             for_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
 
-    # 3) Lấy log cân nặng gần nhất <= for_date
-    wl = (WeightLog.query
-          .filter_by(user_id=uid)
-          .filter(func.date(WeightLog.logged_at) <= for_date)
-          .order_by(WeightLog.logged_at.desc())
-          .first())
+    # 3) Lấy toàn bộ dữ liệu trong ngày (cân nặng gần nhất <= for_date, ăn, uống, tập) trong 1 câu SQL
+    inputs = fetch_daily_inputs(uid, for_date)
 
+    goal = get_metrics_goal(uid)
     data = {
-        'current_weight_kg': wl.weight_kg if wl else 0,
-        'goal_direction': Goal.query.filter_by(user_id=uid).first().goal_direction,
-        'weekly_rate': Goal.query.filter_by(user_id=uid).first().weekly_rate,
+        'current_weight_kg': inputs['current_weight_kg'] or 0,
+        'goal_direction': goal.goal_direction,
+        'weekly_rate': goal.weekly_rate,
     }
 
-    # 4) Tính metrics
-    raw = compute_user_metrics(uid, data, prof, for_date)
+    # 4) Tính metrics (chỉ đọc, không ghi DB)
+    raw = compute_user_metrics(uid, data, prof, for_date, inputs)
+
+    # Target hôm nay lệch so với đã lưu (vd. số buổi tập / tuần thay đổi): ghi trễ, gom theo lô
+    sett = ctx.settings
+    if sett and for_date == local_today(user_timezone(uid)) and sett.default_target_calories != raw['target_calories']:
+        target_writer.schedule(uid, raw['target_calories'])
 
     # 5) Normalize macros
     macros_raw = raw.get('macros', {})
@@ -175,14 +183,39 @@ def metrics():
     return jsonify(result), 200
 
 
+@user_bp.route('/metrics/range', methods=['GET'])
+@firebase_required()
+@replica_read
+def metrics_range():
+    """
+    Chỉ số theo từng ngày cho biểu đồ: GET /api/v1/users/metrics/range?from=YYYY-MM-DD&to=YYYY-MM-DD
+    Mỗi ngày kèm trung bình 7 ngày (avg_7d) của lượng ăn, macro, nước, calo tiêu hao.
+    """
+    uid = g.current_user.user_id
+    ctx = current_user_context()
+    try:
+        start_day = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+        to_str = request.args.get('to')
+        end_day = datetime.strptime(to_str, '%Y-%m-%d').date() if to_str else local_today(user_timezone(uid))
+    except KeyError:
+        return jsonify({'error': 'Missing from param'}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    try:
+        days = compute_metrics_range(uid, ctx.profile, get_metrics_goal(uid), start_day, end_day)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'from': start_day.isoformat(), 'to': end_day.isoformat(), 'days': days}), 200
+
+
 @user_bp.route('/goals', methods=['GET'])
 @firebase_required()
+@replica_read
 def goals():
     """
     GET: Lấy mục tiêu weight hiện tại của user
     """
-    uid = g.current_user.user_id
-    goal = Goal.query.filter_by(user_id=uid).order_by(Goal.created_at.desc()).first()
+    goal = current_user_context().goal
     if not goal:
         return jsonify({'error': 'Goal not found'}), 404
 
@@ -197,6 +230,7 @@ def goals():
 
 @user_bp.route('/weight_logs', methods=['GET'])
 @firebase_required()
+@replica_read
 def weight_logs():
     """
     GET: Lấy danh sách log cân nặng của user
@@ -211,6 +245,33 @@ def weight_logs():
         'logged_at': log.logged_at.isoformat()
     } for log in logs]), 200
 
+@user_bp.route('/weight_logs/series', methods=['GET'])
+@firebase_required()
+@replica_read
+def weight_series():
+    """
+    GET: Chuỗi cân nặng cho biểu đồ, rút gọn còn tối đa `points` điểm (LTTB),
+    kèm đường xu hướng (EMA) và dự báo ngày đạt mục tiêu.
+    Query: points (mặc định 200), start_date, end_date (YYYY-MM-DD), halflife_days (mặc định 7)
+    """
+    uid = g.current_user.user_id
+    ctx = current_user_context()
+    tz = user_timezone(uid)
+    try:
+        points = min(max(int(request.args.get('points', 200)), 3), 2000)
+        halflife_days = float(request.args.get('halflife_days', 7))
+        if halflife_days <= 0:
+            raise ValueError
+        start = end = None
+        if request.args.get('start_date'):
+            start, _ = day_bounds(datetime.strptime(request.args['start_date'], '%Y-%m-%d').date(), tz)
+        if request.args.get('end_date'):
+            _, end = day_bounds(datetime.strptime(request.args['end_date'], '%Y-%m-%d').date(), tz)
+    except ValueError:
+        return jsonify({'error': 'Invalid query parameters'}), 400
+    series = build_weight_series(uid, ctx.goal, tz, points, start, end, halflife_days)
+    return jsonify(series), 200
+
 @user_bp.route('/weight_logs', methods=['POST'])
 @firebase_required()
 def add_weight_log():
@@ -1,21 +1,27 @@
 from datetime import date, datetime
 from extensions import db
 from user.models import User, UserProfile, UserSettings, WeightLog, Goal
+from user.context import invalidate_user_context
+from user.target_writer import target_writer
+from summary.services import rebuild_daily_summaries
+from day_window import day_bounds, local_date, local_today, user_timezone
 from user.nutrition import (
     calculate_bmi,
     calculate_bmr,
-    fetch_calories_consumed,
-    fetch_exercise_burned,
     calculate_tdee,
     calculate_macros,
-    fetch_exercise_sessions,
-    fetch_macros_consumed,
-    fetch_water_intake
+    calorie_adjustment,
+    fetch_daily_inputs,
+    minimum_target_calories
 )
 
 # --- Upsert Helpers ---
 
 def upsert_user_from_firebase(decoded_token):
+    """
+    Tạo hoặc đồng bộ User từ claim của Firebase token.
+    Chỉ COMMIT khi tạo mới hoặc khi email/tên/avatar thực sự thay đổi.
+    """
     uid = decoded_token.get('uid')
     provider = decoded_token.get('firebase', {}).get('sign_in_provider')
     email = decoded_token.get('email')
@@ -32,10 +38,12 @@ def upsert_user_from_firebase(decoded_token):
             avatar_url=avatar
         )
         db.session.add(user)
-    else:
+    elif (user.email, user.display_name, user.avatar_url) != (email, display, avatar):
         user.email = email
         user.display_name = display
         user.avatar_url = avatar
+    else:
+        return user
     db.session.commit()
     return user
 
@@ -46,12 +54,15 @@ def upsert_profile(user_id, data):
         if field in data:
             setattr(prof, field, data[field])
     db.session.add(prof)
+    refresh_target_calories(user_id)
     db.session.commit()
+    invalidate_user_context(user_id)
     return prof
 
 
 def upsert_settings(user_id, data):
     sett = UserSettings.query.get(user_id) or UserSettings(user_id=user_id)
+    old_timezone = sett.timezone
     for field in (
         'locale', 'timezone', 'weight_unit', 'energy_unit',
         'default_target_calories', 'drink_water_reminder', 'meal_reminder'
@@ -60,46 +71,68 @@ def upsert_settings(user_id, data):
             setattr(sett, field, data[field])
     db.session.add(sett)
     db.session.commit()
+    invalidate_user_context(user_id)
+    if old_timezone is not None and sett.timezone != old_timezone:
+        # Ranh giới ngày thay đổi: chia lại rollup theo múi giờ mới
+        rebuild_daily_summaries(user_id)
     return sett
 
 # --- Weight Log ---
 def get_weight_logs(user_id, start_date=None, end_date=None):
     """
-    Fetch weight logs for a user within an optional date range.
+    Fetch weight logs for a user within an optional date range
+    (YYYY-MM-DD, inclusive, in the user's timezone).
     Returns a list of WeightLog objects.
     """
+    tz = user_timezone(user_id)
     query = WeightLog.query.filter_by(user_id=user_id)
     if start_date:
-        query = query.filter(WeightLog.logged_at >= start_date)
+        start, _ = day_bounds(_parse_date(start_date), tz)
+        query = query.filter(WeightLog.logged_at >= start)
     if end_date:
-        query = query.filter(WeightLog.logged_at <= end_date)
+        _, end = day_bounds(_parse_date(end_date), tz)
+        query = query.filter(WeightLog.logged_at < end)
     return query.order_by(WeightLog.logged_at.desc()).all()
 
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value[:10], "%Y-%m-%d").date()
+
 def log_weight(user_id, weight_kg, logged_at=None):
     """
-    Ghi lại log cân nặng cho user. Nếu cùng ngày thì ghi đè.
+    Ghi lại log cân nặng cho user. Nếu cùng ngày (theo múi giờ của user) thì ghi đè.
     logged_at: string (YYYY-MM-DD) hoặc None
     """
-    # Convert logged_at sang date nếu là string
+    tz = user_timezone(user_id)
+    # Convert logged_at sang date (ngày địa phương) nếu là string / datetime
     if logged_at is None:
-        logged_at = date.today()
+        logged_at = local_today(tz)
     elif isinstance(logged_at, str):
         logged_at = datetime.strptime(logged_at, "%Y-%m-%d").date()
     elif isinstance(logged_at, datetime):
-        logged_at = logged_at.date()
+        logged_at = local_date(logged_at, tz)
+    start, end = day_bounds(logged_at, tz)
 
     # Kiểm tra trùng ngày
-    log = WeightLog.query.filter_by(user_id=user_id, logged_at=logged_at).first()
+    log = (WeightLog.query
+           .filter(WeightLog.user_id == user_id)
+           .filter(WeightLog.logged_at >= start, WeightLog.logged_at < end)
+           .first())
     if log:
         log.weight_kg = weight_kg
     else:
         log = WeightLog(
             user_id=user_id,
             weight_kg=weight_kg,
-            logged_at=logged_at
+            logged_at=start
         )
         db.session.add(log)
+    refresh_target_calories(user_id)
     db.session.commit()
+    invalidate_user_context(user_id)
     return log
 
 
@@ -111,14 +144,19 @@ def delete_weight_log(weight_id):
     if not log:
         raise ValueError(f"Weight log ID {weight_id} không tồn tại.")
 
+    user_id = log.user_id
     db.session.delete(log)
+    refresh_target_calories(user_id)
     db.session.commit()
+    invalidate_user_context(user_id)
 
 # --- Nutrition & Metrics Calculation ---
 
-def compute_user_metrics(user_id, data, prof, for_date):
+def compute_user_metrics(user_id, data, prof, for_date, inputs=None):
     """
     Compute BMI, BMR, TDEE and macro targets for the user on a specific date.
+    `inputs` is the result of fetch_daily_inputs (fetched here when omitted).
+    Read-only: the target is persisted by refresh_target_calories when its inputs change.
     Returns a dict with keys: bmi, bmr, tdee, macros, and more.
     """
     # --- Kiểm tra dữ liệu đầu vào ---
@@ -136,32 +174,22 @@ def compute_user_metrics(user_id, data, prof, for_date):
     bmi = calculate_bmi(weight, height)
     bmr = calculate_bmr(weight, height, age, gender)
 
-    # --- Tính dữ liệu luyện tập ---
-    sessions = fetch_exercise_sessions(user_id, for_date)
-    calories_consumed = fetch_calories_consumed(user_id, for_date)
-    calories_burned, count = fetch_exercise_burned(user_id, for_date, weight)
+    # --- Tính dữ liệu luyện tập (1 round-trip cho cả ngày) ---
+    if inputs is None:
+        inputs = fetch_daily_inputs(user_id, for_date)
+    sessions = inputs['sessions']
+    calories_consumed = inputs['calories_consumed']
+    calories_burned = inputs['calories_burned']
 
     tdee = calculate_tdee(bmr, sessions)
 
     # --- Tính mức điều chỉnh calo ---
     weekly_rate = float(data.get('weekly_rate', 0.25))
-    daily_adjustment = round((weekly_rate * 7700) / 7)
-
-    # Giới hạn daily_adjustment nếu quá lớn
-    if daily_adjustment > 1200:
-        daily_adjustment = 1200  # tránh mục tiêu nguy hiểm
-
     goal_direction = data.get('goal_direction', 'giữ nguyên')
-    if goal_direction == 'giảm cân':
-        target_calories = tdee - daily_adjustment
-    elif goal_direction == 'tăng cân':
-        target_calories = tdee + daily_adjustment
-    else:
-        target_calories = tdee
+    target_calories = tdee + calorie_adjustment(goal_direction, weekly_rate)
 
     # Giới hạn target_calories tối thiểu
-    min_cal = max(1200, bmr * 1.1)
-    target_calories = max(target_calories, min_cal)
+    target_calories = max(target_calories, minimum_target_calories(bmr))
 
     # Tính remaining
     remaining_calories = target_calories - calories_consumed + calories_burned
@@ -169,10 +197,10 @@ def compute_user_metrics(user_id, data, prof, for_date):
     # --- Macro style ---
     macro_style = data.get('macro_style', 'default')  # optional field
     macros = calculate_macros(target_calories, goal_direction, macro_style)
-    macros_consumed = fetch_macros_consumed(user_id, for_date)
+    macros_consumed = inputs['macros_consumed']
 
     # --- Nước uống ---
-    water_intake_ml = fetch_water_intake(user_id, for_date)
+    water_intake_ml = inputs['water_intake_ml']
 
     # Làm tròn các chỉ số cần hiển thị
     target_calories    = int(round(target_calories))
@@ -180,13 +208,6 @@ def compute_user_metrics(user_id, data, prof, for_date):
     calories_burned    = int(round(calories_burned))
     calories_consumed  = int(round(calories_consumed))
 
-    # --- lưu lại target_calories vào settings ---
-    user_settings = UserSettings.query.get(user_id)
-    if user_settings:
-        user_settings.default_target_calories = target_calories
-        db.session.add(user_settings)
-        db.session.commit()
-
     return {
         'bmi': bmi,
         'bmr': bmr,
@@ -200,6 +221,42 @@ def compute_user_metrics(user_id, data, prof, for_date):
         'water_intake_ml': water_intake_ml
     }
 
+def get_metrics_goal(user_id):
+    """
+    Goal dùng để tính target calo (GET /metrics và target lưu trong settings).
+    Giữ đúng cách chọn từ trước: goal đầu tiên Postgres trả về, không sắp xếp
+    (khác UserContext.goal là goal mới nhất); user có nhiều goal vẫn nhận cùng kết quả như cũ.
+    """
+    return Goal.query.filter_by(user_id=user_id).first()
+
+
+def refresh_target_calories(user_id, for_date=None):
+    """
+    Tính lại target_calories (hôm nay) và gán vào UserSettings.default_target_calories nếu khác.
+    Gọi trong cùng transaction với thay đổi đầu vào (cân nặng, goal, profile); người gọi commit.
+    Trả về target mới hoặc None nếu chưa đủ dữ liệu để tính.
+    """
+    sett = UserSettings.query.get(user_id)
+    prof = UserProfile.query.get(user_id)
+    goal = get_metrics_goal(user_id)
+    if not sett or not prof or not goal:
+        return None
+    for_date = for_date or local_today(user_timezone(user_id))
+    inputs = fetch_daily_inputs(user_id, for_date)
+    data = {
+        'current_weight_kg': inputs['current_weight_kg'] or 0,
+        'goal_direction': goal.goal_direction,
+        'weekly_rate': goal.weekly_rate,
+    }
+    try:
+        target = compute_user_metrics(user_id, data, prof, for_date, inputs)['target_calories']
+    except ValueError:
+        return None
+    if sett.default_target_calories != target:
+        sett.default_target_calories = target
+    target_writer.forget(user_id)
+    return target
+
 # --- Main Setup Flow ---
 
 def complete_initial_setup(user_id, data):
@@ -233,9 +290,11 @@ def complete_initial_setup(user_id, data):
         weekly_rate=data.get('weekly_rate', 0.75)
     )
     db.session.add(goal)
+    refresh_target_calories(user_id)
 
     # Commit so we have IDs and can compute metrics
     db.session.commit()
+    invalidate_user_context(user_id)
 
     return prof, wl, goal, sett
 
@@ -248,6 +307,7 @@ def delete_user_account(user_id):
 
     db.session.delete(user)
     db.session.commit()
+    invalidate_user_context(user_id)
 
 
 
@@ -0,0 +1,98 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import bindparam, update
+
+from extensions import db
+from user.context import invalidate_user_context
+from user.models import UserSettings
+
+logger = logging.getLogger(__name__)
+
+
+class TargetCaloriesWriter:
+    """
+    Ghi trễ (write-behind) user_settings.default_target_calories cho luồng đọc GET /metrics.
+
+    schedule() chỉ ghi vào dict trong RAM (user_id -> target, giá trị sau đè giá trị trước);
+    1 thread nền mỗi `flush_interval` giây UPDATE hàng loạt trong 1 câu lệnh,
+    chỉ những dòng thực sự khác giá trị mới bị ghi.
+    """
+
+    def __init__(self, flush_interval=5.0, max_remembered=100000):
+        self.flush_interval = flush_interval
+        self.max_remembered = max_remembered
+        self._app = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._written = {}     # user_id -> target đã ghi gần nhất (tránh xếp hàng lại cùng giá trị)
+        self._worker_pid = None
+
+    def init_app(self, app):
+        self._app = app
+        self.flush_interval = app.config.get('TARGET_CALORIES_FLUSH_SECONDS', self.flush_interval)
+
+    def schedule(self, user_id, target_calories):
+        if self._written.get(user_id) == target_calories:
+            return
+        self._ensure_worker()
+        with self._lock:
+            self._pending[user_id] = target_calories
+
+    def forget(self, user_id):
+        """Bỏ giá trị đang chờ (target vừa được tính lại và ghi trực tiếp)."""
+        with self._lock:
+            self._pending.pop(user_id, None)
+            self._written.pop(user_id, None)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self._app is None:
+            return
+        stmt = (
+            update(UserSettings.__table__)
+            .where(UserSettings.__table__.c.user_id == bindparam('b_user_id'))
+            .where(UserSettings.__table__.c.default_target_calories.is_distinct_from(bindparam('b_target')))
+            .values(default_target_calories=bindparam('b_target'))
+        )
+        rows = [{'b_user_id': user_id, 'b_target': target} for user_id, target in pending.items()]
+        with self._app.app_context():
+            try:
+                db.session.execute(stmt, rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error('Ghi default_target_calories cho %d user thất bại: %s', len(rows), e)
+                return
+            finally:
+                db.session.remove()
+            for user_id in pending:
+                invalidate_user_context(user_id)
+        with self._lock:
+            if len(self._written) >= self.max_remembered:
+                self._written.clear()
+            self._written.update(pending)
+
+    def _ensure_worker(self):
+        # Thread nền tạo lười theo từng process (an toàn khi server fork worker)
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._pending = {}
+            self._worker_pid = os.getpid()
+            threading.Thread(target=self._run, name='target-calories-writer', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+target_writer = TargetCaloriesWriter()
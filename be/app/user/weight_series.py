@@ -0,0 +1,156 @@
+"""
+Chuỗi cân nặng cho biểu đồ: GET /api/v1/users/weight_logs/series.
+
+Đọc weight_log theo server-side cursor thẳng vào mảng NumPy (epoch giây, kg),
+rút gọn còn `points` điểm bằng LTTB (Largest-Triangle-Three-Buckets, giữ dáng đường),
+kèm đường xu hướng EMA theo thời gian và dự báo tuyến tính so với mục tiêu (Goal).
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select
+
+from extensions import db
+from user.models import WeightLog
+
+STREAM_BATCH_SIZE = 5000
+DAY_SECONDS = 86400.0
+# Số ngày gần nhất dùng để ước lượng tốc độ thay đổi cân nặng
+PROJECTION_WINDOW_DAYS = 28
+MAX_PROJECTION_DAYS = 3 * 365
+# EMA được tính theo từng khối thời gian dài tối đa chừng này lần tau (tránh tràn số exp)
+_EMA_BLOCK_TAUS = 300.0
+
+
+def load_weight_series(user_id, start=None, end=None):
+    """(timestamps, weights): 2 mảng float64 sắp xếp theo thời gian tăng dần."""
+    stmt = (
+        select(cast(func.extract('epoch', WeightLog.logged_at), Float), cast(WeightLog.weight_kg, Float))
+        .where(WeightLog.user_id == user_id)
+        .order_by(WeightLog.logged_at)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    if start is not None:
+        stmt = stmt.where(WeightLog.logged_at >= start)
+    if end is not None:
+        stmt = stmt.where(WeightLog.logged_at < end)
+
+    chunks = [np.array(part, dtype=np.float64) for part in db.session.execute(stmt).partitions()]
+    if not chunks:
+        return np.empty(0), np.empty(0)
+    data = np.concatenate(chunks)
+    return data[:, 0], data[:, 1]
+
+
+def lttb_indices(x, y, n_out):
+    """Chỉ số các điểm được giữ lại theo LTTB (luôn giữ điểm đầu và cuối)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    # Biên các bucket ở giữa: bucket i = [edges[i], edges[i + 1])
+    edges = np.minimum((np.arange(n_out - 1) * every).astype(np.int64) + 1, n - 1)
+    edges[-1] = n - 1
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Điểm C: trung bình bucket kế tiếp (bucket cuối dùng điểm cuối cùng)
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        next_hi = max(next_hi, next_lo + 1)
+        cx, cy = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def ema_trend(t, y, halflife_days):
+    """
+    EMA theo thời gian (các lần cân không đều nhau), chuẩn hoá theo tổng trọng số:
+    trend[n] = Σ w_k·y_k / Σ w_k với w_k = exp(-(t[n] - t[k]) / tau), k <= n.
+    Tính bằng cumsum theo từng khối thời gian, trạng thái được chuyển tiếp giữa các khối.
+    """
+    n = len(t)
+    trend = np.empty(n)
+    if n == 0:
+        return trend
+    tau = halflife_days * DAY_SECONDS / np.log(2)
+    blocks = np.floor((t - t[0]) / (_EMA_BLOCK_TAUS * tau)).astype(np.int64)
+    bounds = np.flatnonzero(np.diff(blocks)) + 1
+    num = den = 0.0
+    ref = t[0]
+    for lo, hi in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [n]])):
+        new_ref = t[lo]
+        decay = np.exp((ref - new_ref) / tau)
+        num, den, ref = num * decay, den * decay, new_ref
+        w = np.exp((t[lo:hi] - ref) / tau)
+        cum_num = num + np.cumsum(w * y[lo:hi])
+        cum_den = den + np.cumsum(w)
+        trend[lo:hi] = cum_num / cum_den
+        num, den = cum_num[-1], cum_den[-1]
+    return trend
+
+
+def project_goal(t, trend, goal, tz=None):
+    """
+    Hồi quy tuyến tính trên đường xu hướng của PROJECTION_WINDOW_DAYS ngày gần nhất,
+    ước lượng ngày đạt cân nặng mục tiêu. Trả về None nếu không có goal / dữ liệu.
+    """
+    if goal is None or goal.target_value is None or len(t) == 0:
+        return None
+    target = float(goal.target_value)
+    current = float(trend[-1])
+    recent = t >= t[-1] - PROJECTION_WINDOW_DAYS * DAY_SECONDS
+    slope_per_day = 0.0
+    if np.count_nonzero(recent) >= 2 and np.ptp(t[recent]) > 0:
+        slope_per_day = float(np.polyfit(t[recent] / DAY_SECONDS, trend[recent], 1)[0])
+
+    projected_date = None
+    remaining = target - current
+    if abs(remaining) < 0.05:
+        projected_date = datetime.fromtimestamp(t[-1], tz).date()
+    elif slope_per_day != 0 and np.sign(slope_per_day) == np.sign(remaining):
+        days_needed = remaining / slope_per_day
+        # Tốc độ quá chậm: coi như không đạt được trong khoảng dự báo
+        if days_needed <= MAX_PROJECTION_DAYS:
+            projected_date = (datetime.fromtimestamp(t[-1], tz) + timedelta(days=days_needed)).date()
+
+    goal_end = None
+    if goal.start_date and goal.duration_weeks:
+        # Cột goals.start_date trong DB là DATE (driver trả về date) dù model khai báo DateTime
+        start_day = goal.start_date.date() if isinstance(goal.start_date, datetime) else goal.start_date
+        goal_end = start_day + timedelta(weeks=goal.duration_weeks)
+
+    return {
+        'target_weight_kg': target,
+        'current_trend_kg': round(current, 2),
+        'remaining_kg': round(remaining, 2),
+        'rate_kg_per_week': round(slope_per_day * 7, 3),
+        'planned_rate_kg_per_week': float(goal.weekly_rate) if goal.weekly_rate is not None else None,
+        'projected_date': projected_date.isoformat() if projected_date else None,
+        'goal_end_date': goal_end.isoformat() if goal_end else None,
+        'on_track': bool(projected_date and goal_end and projected_date <= goal_end),
+    }
+
+
+def build_weight_series(user_id, goal, tz, points=200, start=None, end=None, halflife_days=7.0):
+    t, y = load_weight_series(user_id, start, end)
+    trend = ema_trend(t, y, halflife_days)
+    keep = lttb_indices(t, y, points)
+    return {
+        'total_points': int(len(t)),
+        'points': [
+            {
+                'logged_at': datetime.fromtimestamp(t[i], tz).isoformat(),
+                'weight_kg': round(float(y[i]), 2),
+                'trend_kg': round(float(trend[i]), 2),
+            }
+            for i in keep
+        ],
+        'projection': project_goal(t, trend, goal, tz),
+    }
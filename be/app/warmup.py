@@ -0,0 +1,46 @@
+"""
+Khởi tạo "nặng" chạy 1 lần trước khi phục vụ request.
+
+Với gunicorn preload_app, warm_up() chạy trong process master trước khi fork:
+worker dùng chung (copy-on-write) index món ăn, index barcode, catalog bài tập,
+mapper SQLAlchemy và Firebase app đã khởi tạo. after_fork() bỏ các kết nối DB
+thừa kế từ master để mỗi worker tự mở pool riêng.
+
+Chỉ nạp sẵn dữ liệu có kiểm tra version: index món ăn / barcode (food/index_sync.py) và
+catalog bài tập (md5 nội dung bảng) tự bắt kịp DB, kể cả ở worker fork muộn từ bản chụp cũ.
+"""
+import gc
+import threading
+
+from sqlalchemy.orm import configure_mappers
+
+from extensions import db
+from exercise.catalog import exercise_catalog
+
+_ready = threading.Event()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def warm_up(app):
+    # create_app() đã init Firebase, dựng index món ăn / barcode; ở đây nạp nốt phần còn lại
+    configure_mappers()
+    with app.app_context():
+        exercise_catalog.snapshot()
+        db.session.remove()
+        # Không để socket DB mở trong master (sẽ bị chia sẻ giữa các worker)
+        for engine in db.engines.values():
+            engine.dispose()
+    # Đưa các object đã tạo ra khỏi GC để GC của worker không ghi lên (và copy) các trang nhớ chung
+    gc.collect()
+    gc.freeze()
+    _ready.set()
+
+
+def after_fork(app):
+    """Gọi trong worker ngay sau khi fork."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,10 @@
+"""
+Entry point cho production:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import create_app
+from warmup import warm_up
+
+app = create_app()
+warm_up(app)
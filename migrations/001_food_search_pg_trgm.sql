@@ -0,0 +1,13 @@
+-- Tìm kiếm món ăn phía Postgres bằng pg_trgm (FOOD_SEARCH_BACKEND=pg_trgm)
+
+-- Các cột đã có trong model nhưng chưa có trong database.sql
+ALTER TABLE food_items ADD COLUMN IF NOT EXISTS name_unsigned VARCHAR(255);
+ALTER TABLE food_items ADD COLUMN IF NOT EXISTS is_recipe BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- GIN trigram index: phục vụ cả toán tử similarity (%, <%) và ILIKE '%q%'
+CREATE INDEX IF NOT EXISTS idx_food_items_name_trgm
+  ON food_items USING gin (lower(name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_food_items_name_unsigned_trgm
+  ON food_items USING gin (lower(name_unsigned) gin_trgm_ops);
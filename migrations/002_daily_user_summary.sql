@@ -0,0 +1,18 @@
+-- Bảng tổng hợp dinh dưỡng theo user-ngày, được cập nhật cùng transaction với các log.
+-- Sau khi tạo bảng, chạy: python summary/rebuild.py  (backfill từ dữ liệu cũ)
+CREATE TABLE IF NOT EXISTS daily_user_summary (
+  user_id          BIGINT      NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  summary_date     DATE        NOT NULL,
+  calories         NUMERIC(10,2) NOT NULL DEFAULT 0,
+  protein_g        NUMERIC(10,2) NOT NULL DEFAULT 0,
+  carbs_g          NUMERIC(10,2) NOT NULL DEFAULT 0,
+  fat_g            NUMERIC(10,2) NOT NULL DEFAULT 0,
+  water_ml         INTEGER     NOT NULL DEFAULT 0,
+  exercise_min     INTEGER     NOT NULL DEFAULT 0,
+  exercise_count   INTEGER     NOT NULL DEFAULT 0,
+  met_minutes      NUMERIC(12,2) NOT NULL DEFAULT 0,  -- Σ MET × phút
+  calories_burned  NUMERIC(10,2) NOT NULL DEFAULT 0,  -- Σ exercise_log.calories_burned
+  has_exercise     BOOLEAN     NOT NULL DEFAULT FALSE,
+  updated_at       TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, summary_date)
+);
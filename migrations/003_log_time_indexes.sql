@@ -0,0 +1,10 @@
+-- Index (user_id, thời điểm) cho các truy vấn theo khoảng [start, end) của ngày địa phương.
+-- Thay thế các index chỉ có user_id (là tiền tố của index mới).
+CREATE INDEX IF NOT EXISTS idx_water_log_user_logged_at    ON water_log(user_id, logged_at);
+CREATE INDEX IF NOT EXISTS idx_exercise_log_user_logged_at ON exercise_log(user_id, logged_at);
+CREATE INDEX IF NOT EXISTS idx_weight_log_user_logged_at   ON weight_log(user_id, logged_at);
+CREATE INDEX IF NOT EXISTS idx_meal_user_created_at        ON meal(user_id, created_at);
+
+DROP INDEX IF EXISTS idx_water_log_user;
+DROP INDEX IF EXISTS idx_exercise_log_user;
+DROP INDEX IF EXISTS idx_weight_log_user;
@@ -0,0 +1,6 @@
+-- Chỉ mục ngược nguyên liệu -> công thức: tìm các công thức cần tính lại khi 1 món bị sửa.
+CREATE INDEX IF NOT EXISTS idx_food_item_ingredients_ingredient
+    ON food_item_ingredients(ingredient_id, recipe_id);
+-- Đọc / tính tổng nguyên liệu của 1 công thức
+CREATE INDEX IF NOT EXISTS idx_food_item_ingredients_recipe
+    ON food_item_ingredients(recipe_id);
@@ -0,0 +1,10 @@
+-- Danh sách "món của tôi": 1 truy vấn theo index (created_by, is_custom, created_at DESC).
+-- food_item_id để thứ tự keyset (created_at, id) ổn định khi trùng created_at.
+CREATE INDEX IF NOT EXISTS idx_food_items_owner_created
+    ON food_items(created_by, is_custom, created_at DESC, food_item_id DESC);
+
+-- get_my_foods không còn suy ra is_recipe từ food_item_ingredients: đồng bộ cờ 1 lần cho dữ liệu cũ
+UPDATE food_items f
+SET is_recipe = TRUE
+WHERE NOT f.is_recipe
+  AND EXISTS (SELECT 1 FROM food_item_ingredients fi WHERE fi.recipe_id = f.food_item_id);
@@ -0,0 +1,5 @@
+-- food/image_gc.py đọc đường dẫn ảnh đang được tham chiếu theo thứ tự byte (COLLATE "C");
+-- index biểu thức giúp đọc tuần tự thay vì sort toàn bảng.
+CREATE INDEX IF NOT EXISTS idx_food_items_image_path
+    ON food_items ((substring(image_url from '/static/uploads/(.*)$') COLLATE "C"))
+    WHERE image_url IS NOT NULL;
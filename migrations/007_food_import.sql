@@ -0,0 +1,35 @@
+-- Import danh mục món ăn bằng COPY (food/importer.py)
+
+-- Bảng tạm nhận COPY; UNLOGGED vì có thể nạp lại từ file bất cứ lúc nào
+CREATE UNLOGGED TABLE IF NOT EXISTS food_import_staging (
+  import_id     TEXT         NOT NULL,
+  row_no        BIGINT       NOT NULL,
+  name          VARCHAR(255) NOT NULL,
+  name_unsigned VARCHAR(255) NOT NULL,
+  name_key      VARCHAR(255) NOT NULL,
+  brand         VARCHAR(255),
+  barcode       VARCHAR(50),
+  serving_size  NUMERIC(8,2) NOT NULL,
+  serving_unit  VARCHAR(50)  NOT NULL,
+  calories      NUMERIC(8,2) NOT NULL,
+  protein_g     NUMERIC(8,2) NOT NULL,
+  carbs_g       NUMERIC(8,2) NOT NULL,
+  fat_g         NUMERIC(8,2) NOT NULL,
+  image_url     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_food_import_staging_row ON food_import_staging(import_id, row_no);
+
+-- Tiến độ theo từng file (import_id = sha256 nội dung file) để chạy lại / tiếp tục được
+CREATE TABLE IF NOT EXISTS food_import_progress (
+  import_id  TEXT PRIMARY KEY,
+  source     TEXT        NOT NULL,
+  rows_done  BIGINT      NOT NULL DEFAULT 0,
+  inserted   BIGINT      NOT NULL DEFAULT 0,
+  updated    BIGINT      NOT NULL DEFAULT 0,
+  finished   BOOLEAN     NOT NULL DEFAULT FALSE,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Khớp món dùng chung theo tên đã chuẩn hoá khi dòng import không có barcode
+CREATE INDEX IF NOT EXISTS idx_food_items_global_name_key
+  ON food_items (lower(name_unsigned)) WHERE NOT is_custom;
@@ -0,0 +1,3 @@
+-- food/index_sync.py đọc max(updated_at) và các dòng mới sửa định kỳ ở mỗi process;
+-- index giúp 2 truy vấn này không phải quét toàn bảng.
+CREATE INDEX IF NOT EXISTS idx_food_items_updated_at ON food_items (updated_at);
@@ -0,0 +1,7 @@
+-- Read-your-writes khi có replica (db_routing.py): sau khi user commit thay đổi, các request đọc
+-- của user đó dùng primary tới `until`. Bảng dùng chung cho mọi worker, chỉ đọc / ghi trên primary;
+-- UNLOGGED vì mất dữ liệu khi crash chỉ làm vài request đọc replica sớm hơn.
+CREATE UNLOGGED TABLE IF NOT EXISTS replica_sticky (
+    user_id BIGINT PRIMARY KEY,
+    until   TIMESTAMPTZ NOT NULL
+);
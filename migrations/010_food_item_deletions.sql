@@ -0,0 +1,23 @@
+-- food/index_sync.py: index trong RAM của mỗi process gỡ món bị xoá theo bảng này
+-- (đếm số dòng không phân biệt được "xoá 1 + thêm 1", và dựng lại toàn bộ index thì quá đắt).
+-- Trigger ghi lại id của mỗi món bị xoá; dòng cũ hơn 1 ngày được dọn ngay trong trigger,
+-- process không đồng bộ lâu hơn khoảng đó sẽ dựng lại index (FOOD_DELETION_RETENTION).
+CREATE TABLE IF NOT EXISTS food_item_deletions (
+    food_item_id BIGINT      NOT NULL,
+    deleted_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_food_item_deletions_deleted_at ON food_item_deletions (deleted_at);
+
+CREATE OR REPLACE FUNCTION record_food_item_deletion() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM food_item_deletions WHERE deleted_at < now() - interval '1 day';
+    INSERT INTO food_item_deletions (food_item_id) SELECT food_item_id FROM deleted_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_food_item_deletions ON food_items;
+CREATE TRIGGER trg_food_item_deletions
+    AFTER DELETE ON food_items
+    REFERENCING OLD TABLE AS deleted_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_food_item_deletion();